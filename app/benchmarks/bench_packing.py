@@ -0,0 +1,79 @@
+"""
+Compare one-page-per-request extraction with multi-page packed requests.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_packing --pages 40 --pack-sizes 1,2,4,8 --latency 1.5
+
+Blank page images sized like a 200 DPI letter page are sent through
+extract_pages_with_vision against the local fake chat-completions server. For each
+pack size the benchmark reports requests made, request bytes, estimated prompt tokens
+(text tokens approximated as characters / 4, plus the image tile estimate) and wall time.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from modules import cache_utils, openai_utils
+from modules.openai_utils import estimate_image_tokens, extract_pages_with_vision
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+def prompt_tokens(pages, pack_size, size):
+    """Estimated prompt tokens for all requests at a given pack size"""
+    requests = -(-pages // pack_size)
+    if pack_size == 1:
+        text = len(openai_utils.SYSTEM_PROMPT) + len(openai_utils.USER_PROMPT)
+        return requests * (text // 4) + pages * estimate_image_tokens(*size)
+    text = len(openai_utils.PACKED_SYSTEM_PROMPT) + len(openai_utils.PACKED_USER_PROMPT)
+    return requests * (text // 4) + pages * (2 + estimate_image_tokens(*size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=40, help='Pages in the synthetic statement')
+    parser.add_argument('--pack-sizes', default='1,2,4,8', help='Comma-separated pack sizes to compare')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated API latency per request (s)')
+    parser.add_argument('--workers', type=int, default=openai_utils.VISION_MAX_CONCURRENCY, help='Requests in flight')
+    args = parser.parse_args()
+
+    size = (1700, 2200)
+    work_dir = tempfile.mkdtemp(prefix="bench_packing_")
+    pages = []
+    for page_number in range(1, args.pages + 1):
+        path = os.path.join(work_dir, f"p{page_number:05d}.png")
+        Image.new('L', size, 255).save(path)
+        pages.append((page_number, path))
+
+    # Every run must reach the API, so never answer from the vision cache
+    cache_utils.VISION_CACHE_ENABLED = False
+    server = FakeOpenAIServer(latency=args.latency).start()
+    openai_utils.OPENAI_API_URL = server.url
+    try:
+        print(f"{args.pages} pages, {args.workers} workers, {args.latency:.1f}s simulated latency")
+        print(f"{'pack':>5} {'requests':>9} {'sent KB':>9} {'prompt tok':>11} {'wall s':>8}")
+        for pack_size in [int(p) for p in args.pack_sizes.split(',') if p.strip()]:
+            server.reset_stats()
+            start = time.perf_counter()
+            # A budget this large leaves the pack size as the only limit
+            extracted, errors = extract_pages_with_vision(
+                pages, max_workers=args.workers, pack_size=pack_size, token_budget=10 ** 9
+            )
+            elapsed = time.perf_counter() - start
+            stats = server.stats()
+            if errors or len(extracted) != args.pages:
+                print(f"pack {pack_size}: {len(errors)} pages failed")
+            print(f"{pack_size:>5} {stats['requests']:>9} {stats['bytes_received'] / 1024:>9.0f} "
+                  f"{prompt_tokens(args.pages, pack_size, size):>11} {elapsed:>8.2f}")
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+End-to-end pipeline benchmark on synthetic statements, with stored results for
+regression comparison.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --sizes 1,10,40 --kinds text,image --repeat 5 --latency 1.5
+    python -m benchmarks.bench_pipeline --label v2 --compare benchmarks/results/v1.json
+
+For every kind (text layer / image only) and page count a fresh synthetic statement
+is generated per run and driven through the Flask app in-process: /upload,
+/get_page_count and /process, with the per-stage breakdown /process returns when asked
+for timings (render, encode, vision request, parsing, mapping, CSV, ...). Vision calls
+go to a local FakeOpenAIServer that returns the values printed on the image pages, so
+results are deterministic and checked for correctness.
+
+Medians are written to benchmarks/results/<label>.json. With --compare, stages that got
+slower than the baseline by more than --tolerance (and by more than --min-delta seconds,
+to ignore noise in very fast stages) are reported and the exit status is 1.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.synthetic import IMAGE_PAGE_VALUES, make_statement
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def default_label():
+    """Short git commit of the working tree, or a timestamp outside a checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return datetime.now().strftime('%Y%m%d_%H%M%S')
+
+
+def run_document(client, pdf_path, expected):
+    """
+    Drive one statement through the app
+
+    Returns:
+        dict: 'stages' (stage -> seconds), 'pages' and 'correct' (fraction of expected values extracted)
+    """
+    stages = {}
+
+    start = time.perf_counter()
+    with open(pdf_path, 'rb') as f:
+        response = client.post('/upload', data={'file': (f, os.path.basename(pdf_path))},
+                               content_type='multipart/form-data')
+    stages['upload'] = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"/upload failed: {response.json}")
+    upload = response.json
+
+    start = time.perf_counter()
+    response = client.post('/get_page_count', json={'filepath': upload['filepath']})
+    stages['page_count'] = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"/get_page_count failed: {response.json}")
+    page_count = response.json['pageCount']
+
+    start = time.perf_counter()
+    response = client.post('/process', json={
+        'filepath': upload['filepath'],
+        'filetype': upload['filetype'],
+        'pages': list(range(1, page_count + 1)),
+        'timings': True
+    })
+    stages['process'] = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"/process failed: {response.json}")
+    result = response.json
+    stages['e2e'] = stages['upload'] + stages['page_count'] + stages['process']
+    for stage, entry in result['timings'].items():
+        if stage != 'total':
+            stages[stage] = entry['seconds']
+
+    extracted = {}
+    for page_data in result['extracted_data'].values():
+        for code, value in page_data.items():
+            extracted.setdefault(code, value)
+    correct = sum(1 for code, value in expected.items() if extracted.get(code) == value) / max(1, len(expected))
+    os.remove(result['csv_path'])
+    return {'stages': stages, 'pages': page_count, 'correct': correct}
+
+
+def run_scenario(client, kind, pages, repeat, work_dir):
+    """Benchmark one kind and size; each run uses a new statement so no cache is warm"""
+    runs = []
+    for seed in range(repeat):
+        pdf_path = os.path.join(work_dir, f"{kind}_{pages}p_{seed}.pdf")
+        expected = make_statement(pdf_path, kind, pages, seed)
+        runs.append(run_document(client, pdf_path, expected))
+    stage_names = sorted({stage for run in runs for stage in run['stages']})
+    return {
+        'kind': kind,
+        'pages': pages,
+        'runs': repeat,
+        'correct': min(run['correct'] for run in runs),
+        'stages': {
+            stage: round(statistics.median(run['stages'].get(stage, 0.0) for run in runs), 4)
+            for stage in stage_names
+        }
+    }
+
+
+def compare(current, baseline, tolerance, min_delta):
+    """
+    Returns:
+        list: (scenario, stage, baseline seconds, current seconds) for every regression
+    """
+    regressions = []
+    for name, scenario in current['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        for stage, seconds in scenario['stages'].items():
+            before = base['stages'].get(stage)
+            if before is None:
+                continue
+            if seconds > before * (1 + tolerance) and seconds - before > min_delta:
+                regressions.append((name, stage, before, seconds))
+    return regressions
+
+
+def print_report(results, baseline=None):
+    for name, scenario in results['scenarios'].items():
+        base = (baseline or {}).get('scenarios', {}).get(name, {}).get('stages', {})
+        print(f"\n{name}: {scenario['pages']} pages, {scenario['runs']} runs, "
+              f"{scenario['correct']:.0%} of expected values extracted")
+        print(f"  {'stage':<16} {'median s':>10} {'baseline':>10} {'change':>8}")
+        for stage, seconds in sorted(scenario['stages'].items(), key=lambda item: -item[1]):
+            if stage in base and base[stage] > 0:
+                print(f"  {stage:<16} {seconds:10.4f} {base[stage]:10.4f} {seconds / base[stage] - 1:+8.0%}")
+            else:
+                print(f"  {stage:<16} {seconds:10.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,5,20', help='Comma-separated page counts')
+    parser.add_argument('--kinds', default='text,image', help="Statement kinds: 'text', 'image' or both")
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated vision API latency (s)')
+    parser.add_argument('--label', default=None, help='Name for the stored results (default: git commit)')
+    parser.add_argument('--output-dir', default=RESULTS_DIR, help='Where results are stored')
+    parser.add_argument('--compare', help='Results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before a stage is flagged')
+    parser.add_argument('--min-delta', type=float, default=0.01, help='Ignore slowdowns smaller than this (s)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    kinds = [kind.strip() for kind in args.kinds.split(',') if kind.strip()]
+    label = args.label or default_label()
+
+    # Every run must reach the (fake) API, so never answer from the vision cache or page checkpoints
+    from modules import cache_utils, checkpoint_utils, openai_utils
+    cache_utils.VISION_CACHE_ENABLED = False
+    checkpoint_utils.PAGE_CHECKPOINT_ENABLED = False
+    server = FakeOpenAIServer(latency=args.latency, response=IMAGE_PAGE_VALUES).start()
+    openai_utils.OPENAI_API_URL = server.url
+
+    import main as app_main  # Import here so the overrides above are in place first
+    logging.disable(logging.INFO)  # Per-page logging would dominate the output and the timings
+    client = app_main.app.test_client()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    try:
+        results = {
+            'label': label,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'settings': {
+                'repeat': args.repeat,
+                'latency': args.latency,
+                'vision_max_concurrency': app_main.app.config['VISION_MAX_CONCURRENCY'],
+                'vision_pack_size': app_main.app.config['VISION_PACK_SIZE'],
+                'render_profile': app_main.app.config['RENDER_PROFILE'],
+                'roi_crop': app_main.app.config['ROI_CROP_ENABLED'],
+            },
+            'scenarios': {}
+        }
+        for kind in kinds:
+            for pages in sizes:
+                name = f"{kind}_{pages}p"
+                print(f"Running {name} x{args.repeat}...", flush=True)
+                results['scenarios'][name] = run_scenario(client, kind, pages, args.repeat, work_dir)
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"{label}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than {baseline.get('label', args.compare)} "
+                  f"by more than {args.tolerance:.0%}:")
+            for name, stage, before, after in regressions:
+                print(f"  {name} {stage}: {before:.4f}s -> {after:.4f}s")
+            sys.exit(1)
+        print(f"\nNo regressions against {baseline.get('label', args.compare)}")
+
+
+if __name__ == '__main__':
+    main()
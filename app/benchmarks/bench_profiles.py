@@ -0,0 +1,107 @@
+"""
+Compare rasterization profiles by payload size, latency and extraction agreement.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_profiles path/to/corpus --max-pages 3
+    python -m benchmarks.bench_profiles path/to/corpus --profiles standard,compact --latency 2.5
+
+Every PDF in the corpus directory is rendered with each profile and sent through
+extract_data_with_vision. By default requests go to a local fake chat-completions
+server, so bytes sent and render/encode latency are measured without API spend;
+agreement against the baseline profile then only confirms the pipeline ran. Pass
+--api-url https://api.openai.com/v1/chat/completions (with OPENAI_API_KEY set) to
+measure real extraction agreement on the same corpus.
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import cache_utils, openai_utils
+from modules.pdf_utils import RENDER_PROFILES, convert_pdf_to_images, get_pdf_page_count
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+def agreement(baseline, candidate):
+    """Fraction of baseline (code, value) pairs reproduced exactly by the candidate"""
+    if not baseline:
+        return 1.0 if not candidate else 0.0
+    matches = sum(1 for code, value in baseline.items() if candidate.get(code) == value)
+    return matches / len(baseline)
+
+
+def run_profile(profile, documents, server):
+    """Render and extract every document page with one profile"""
+    results = {}
+    image_bytes = 0
+    page_latencies = []
+    if server:
+        server.reset_stats()
+    for pdf_path, pages in documents:
+        start = time.perf_counter()
+        images = convert_pdf_to_images(pdf_path, pages, profile=profile)
+        render_time = (time.perf_counter() - start) / max(1, len(images))
+        for page_num, page_image in zip(pages, images):
+            with page_image:
+                image_bytes += page_image.nbytes
+                page_start = time.perf_counter()
+                results[(pdf_path, page_num)] = openai_utils.extract_data_with_vision(page_image)
+                page_latencies.append(render_time + time.perf_counter() - page_start)
+    return {
+        'results': results,
+        'image_bytes': image_bytes,
+        'bytes_sent': server.stats()['bytes_received'] if server else None,
+        'p50_latency': statistics.median(page_latencies) if page_latencies else 0.0,
+        'max_latency': max(page_latencies) if page_latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus', help='Directory of sample PDF statements')
+    parser.add_argument('--profiles', default=','.join(RENDER_PROFILES),
+                        help='Comma-separated profiles; the first is the agreement baseline')
+    parser.add_argument('--max-pages', type=int, default=3, help='Pages per document to benchmark')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated API latency for the fake server (s)')
+    parser.add_argument('--api-url', help='Use a real chat completions endpoint instead of the fake server')
+    args = parser.parse_args()
+
+    profiles = [p.strip() for p in args.profiles.split(',') if p.strip()]
+    pdfs = sorted(glob.glob(os.path.join(args.corpus, '*.pdf')))
+    if not pdfs:
+        parser.error(f"No PDFs found in {args.corpus}")
+    documents = [(pdf, list(range(1, min(args.max_pages, get_pdf_page_count(pdf)) + 1))) for pdf in pdfs]
+
+    # Every profile must reach the API, so never answer from the vision cache
+    cache_utils.VISION_CACHE_ENABLED = False
+    server = None
+    if args.api_url:
+        openai_utils.OPENAI_API_URL = args.api_url
+    else:
+        server = FakeOpenAIServer(latency=args.latency).start()
+        openai_utils.OPENAI_API_URL = server.url
+
+    try:
+        print(f"Corpus: {len(pdfs)} PDFs, {sum(len(p) for _, p in documents)} pages; "
+              f"endpoint: {openai_utils.OPENAI_API_URL}")
+        print(f"{'profile':<10} {'image KB':>10} {'sent KB':>10} {'p50 s/page':>11} {'max s/page':>11} {'agreement':>10}")
+        baseline = None
+        for profile in profiles:
+            stats = run_profile(profile, documents, server)
+            if baseline is None:
+                baseline = stats['results']
+            scores = [agreement(baseline[key], stats['results'].get(key, {})) for key in baseline]
+            sent = f"{stats['bytes_sent'] / 1024:10.0f}" if stats['bytes_sent'] is not None else f"{'n/a':>10}"
+            print(f"{profile:<10} {stats['image_bytes'] / 1024:10.0f} {sent} "
+                  f"{stats['p50_latency']:11.2f} {stats['max_latency']:11.2f} {statistics.mean(scores):10.1%}")
+    finally:
+        if server:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
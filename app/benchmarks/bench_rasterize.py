@@ -0,0 +1,123 @@
+"""
+Compare batched, in-memory rasterization against the original one-poppler-run-per-page
+loop that wrote PNGs to a temp directory.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_rasterize statement.pdf --min-pages 60 --pages 1-60 --repeat 3
+
+If the PDF has fewer than --min-pages pages it is padded by repeating its pages, so
+the benchmark always runs against a statement of realistic length.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf2image import convert_from_path
+from PyPDF2 import PdfReader, PdfWriter
+from modules.pdf_utils import convert_pdf_to_images, get_poppler_path
+
+
+def legacy_convert_pdf_to_images(pdf_path, pages, output_dir, poppler_path):
+    """The pre-batching implementation: one pdftocairo run per selected page"""
+    images = []
+    for page_num in pages:
+        images.extend(convert_from_path(
+            pdf_path,
+            dpi=300,
+            fmt="png",
+            output_folder=output_dir,
+            paths_only=True,
+            thread_count=2,
+            use_pdftocairo=True,
+            grayscale=False,
+            first_page=page_num,
+            last_page=page_num,
+            poppler_path=poppler_path
+        ))
+    return images
+
+
+def pad_pdf(pdf_path, min_pages, output_path):
+    """Write a copy of pdf_path repeated until it has at least min_pages pages"""
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    while len(writer.pages) < min_pages:
+        for page in reader.pages:
+            writer.add_page(page)
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+    return output_path
+
+
+def parse_pages(spec, page_count):
+    """Parse a page spec like '1,2,5-7' (the same format as the UI)"""
+    if not spec:
+        return list(range(1, page_count + 1))
+    pages = []
+    for part in spec.split(','):
+        if '-' in part:
+            start, end = (int(x) for x in part.split('-'))
+            pages.extend(range(start, end + 1))
+        else:
+            pages.append(int(part))
+    return [p for p in pages if 1 <= p <= page_count]
+
+
+def time_run(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output_dir = func()
+        timings.append(time.perf_counter() - start)
+        if output_dir:
+            shutil.rmtree(output_dir, ignore_errors=True)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', help='Sample financial statement PDF')
+    parser.add_argument('--min-pages', type=int, default=50, help='Pad the PDF to at least this many pages')
+    parser.add_argument('--pages', help="Pages to render, e.g. '1-20,25,30-50' (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_rasterize_')
+    try:
+        pdf_path = args.pdf
+        page_count = len(PdfReader(pdf_path).pages)
+        if page_count < args.min_pages:
+            pdf_path = pad_pdf(pdf_path, args.min_pages, os.path.join(work_dir, 'padded.pdf'))
+            page_count = len(PdfReader(pdf_path).pages)
+        pages = parse_pages(args.pages, page_count)
+        poppler_path = get_poppler_path()
+
+        def run_legacy():
+            output_dir = tempfile.mkdtemp(dir=work_dir)
+            legacy_convert_pdf_to_images(pdf_path, pages, output_dir, poppler_path)
+            return output_dir
+
+        def run_batched():
+            for page_image in convert_pdf_to_images(pdf_path, pages):
+                page_image.close()
+            return None
+
+        print(f"PDF: {args.pdf} ({page_count} pages), rendering {len(pages)} pages, {args.repeat} runs each")
+        results = {'per-page loop': time_run(run_legacy, args.repeat), 'batched': time_run(run_batched, args.repeat)}
+        for name, timings in results.items():
+            print(f"{name:>14}: median {statistics.median(timings):7.2f}s  "
+                  f"min {min(timings):7.2f}s  ({len(pages) / statistics.median(timings):5.1f} pages/s)")
+        speedup = statistics.median(results['per-page loop']) / statistics.median(results['batched'])
+        print(f"{'speedup':>14}: {speedup:.2f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
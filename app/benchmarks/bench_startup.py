@@ -0,0 +1,95 @@
+"""
+Cold-start benchmark: how long a fresh worker takes to import the app.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 10 --budget 0.4
+
+Each run imports main in a new interpreter, so nothing is warm except the OS file
+cache. The median import time is checked against --budget, and the run also fails if
+any of the heavy libraries that are meant to load on first use (pandas, numpy,
+pdf2image, PyPDF2, pdfplumber, python-docx, Pillow) were imported at startup. The
+slowest imports from `python -X importtime` are listed to show where the time goes.
+Exits with status 1 when the budget is exceeded or a heavy library was loaded eagerly.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that must not be imported by `import main`
+LAZY_MODULES = ['pandas', 'numpy', 'pdf2image', 'PyPDF2', 'pdfplumber', 'docx', 'PIL', 'openpyxl']
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def run_python(args, work_dir):
+    # Run from a scratch directory so the app's log file does not land in the source tree
+    env = {**os.environ, 'PYTHONPATH': APP_DIR + os.pathsep + os.environ.get('PYTHONPATH', '')}
+    return subprocess.run([sys.executable, *args], cwd=work_dir, env=env, capture_output=True, text=True, check=True)
+
+
+def slowest_imports(work_dir, count):
+    """
+    Returns:
+        list: (cumulative seconds, module) for the slowest top-level imports under main
+    """
+    stderr = run_python(['-X', 'importtime', '-c', 'import main'], work_dir).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Direct dependencies of main are indented two spaces past the separator in importtime output
+        if name.startswith('   ') and not name.startswith('    '):
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to time')
+    parser.add_argument('--budget', type=float, default=0.5, help='Maximum median import time for main (s)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_startup_') as work_dir:
+        runs = [json.loads(run_python(['-c', PROBE], work_dir).stdout.strip().splitlines()[-1])
+                for _ in range(args.repeat)]
+        imports = slowest_imports(work_dir, args.top)
+
+    timings = [run['seconds'] for run in runs]
+    loaded = sorted({module for run in runs for module in run['loaded']})
+    median = statistics.median(timings)
+
+    print(f"import main: median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s "
+          f"over {args.repeat} runs (budget {args.budget:.3f}s)")
+    print("\nSlowest imports:")
+    for seconds, name in imports:
+        print(f"  {seconds:7.3f}s  {name}")
+
+    failed = False
+    if loaded:
+        print(f"\nFAIL: loaded at startup but should load on first use: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print(f"\nFAIL: median import time {median:.3f}s is over the {args.budget:.3f}s budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\nOK: startup within budget and heavy libraries load lazily")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Used by the benchmarks and tests so that rendering and request-building costs can be
+measured without network access or API spend, and so that throttling (429), server
+errors and slow responses can be injected. Point openai_utils at it with OPENAI_API_URL.
+"""
+import re
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = {
+    "1000": "125000",
+    "1060": "48210",
+    "2599": "0",
+    "3600": "91250",
+    "8299": "410275",
+    "9367": "318900"
+}
+
+PAGE_LABEL = re.compile(r'page_\d+')
+
+
+class FakeOpenAIServer:
+    """
+    Threaded HTTP server that answers chat completion requests with canned JSON.
+
+    Args:
+        latency (float): Seconds to wait before answering each request
+        jitter (float): Extra random delay of up to this many seconds
+        response (dict or callable): GIFI payload to return, or a function taking the
+            parsed request body and returning the payload
+        port (int): Port to bind on localhost (0 picks a free port)
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, response=None, port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.response = response if response is not None else DEFAULT_RESPONSE
+        self.requests = 0
+        self.bytes_received = 0
+        self.connections = set()
+        self._errors = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'bytes_received': self.bytes_received, 'connections': len(self.connections)}
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_received = 0
+            self.connections = set()
+
+    def inject_errors(self, status, count=1, retry_after=None):
+        """
+        Answer the next `count` requests with an error status instead of a completion
+
+        Args:
+            status (int): HTTP status to return (e.g. 429 or 503)
+            count (int): Number of requests to fail
+            retry_after (str, optional): Value for the Retry-After header
+        """
+        with self._lock:
+            self._errors.extend([(status, retry_after)] * count)
+
+    def build_payload(self, body):
+        """
+        Return the GIFI payload for a parsed request body
+
+        Packed multi-page requests (page images preceded by 'page_<n>' labels) get one
+        payload per label, keyed the way the packed prompt asks for.
+        """
+        payload = self.response(body) if callable(self.response) else self.response
+        labels = [
+            part.get('text') for message in body.get('messages', []) if isinstance(message.get('content'), list)
+            for part in message['content'] if part.get('type') == 'text' and PAGE_LABEL.fullmatch(part.get('text', ''))
+        ]
+        return {label: payload for label in labels} if labels else payload
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output clean
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                raw = self.rfile.read(length)
+                with fake._lock:
+                    fake.requests += 1
+                    fake.bytes_received += len(raw)
+                    fake.connections.add(self.client_address)
+                    error = fake._errors.pop(0) if fake._errors else None
+                if error:
+                    status, retry_after = error
+                    headers = {'Retry-After': retry_after} if retry_after is not None else {}
+                    self._send(status, {'error': {'message': f'Injected {status}', 'type': 'fake_error'}}, headers)
+                    return
+                delay = fake.latency + (random.uniform(0, fake.jitter) if fake.jitter else 0)
+                if delay:
+                    time.sleep(delay)
+                try:
+                    body = json.loads(raw or b'{}')
+                except ValueError:
+                    self._send(400, {'error': {'message': 'Invalid JSON body'}})
+                    return
+                payload = fake.build_payload(body)
+                self._send(200, {
+                    'id': 'chatcmpl-fake',
+                    'object': 'chat.completion',
+                    'model': body.get('model', 'fake'),
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': json.dumps(payload)},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': {'prompt_tokens': len(raw) // 4, 'completion_tokens': 50, 'total_tokens': len(raw) // 4 + 50}
+                })
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,353 @@
+"""
+Concurrent load test against a running instance of the app.
+
+Usage (from the app directory):
+    python -m benchmarks.load_test --users 8 --iterations 5 --latency 1.5
+    python -m benchmarks.load_test --users 16 --mix text:3:2,image:5:1 --output load.json
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --pid 12345
+
+Each simulated preparer repeatedly uploads a statement, asks for its page count,
+processes it and downloads the CSV, as the UI does. Documents come from the --mix of
+synthetic statements (kind:pages:weight); every iteration gets a distinct file so the
+upload, document and vision caches do not flatter the results.
+
+By default the app is started in a child process (threaded development server) with
+OPENAI_API_URL pointed at a local FakeOpenAIServer with the given --latency, and the
+child's peak memory is reported. Pass --url to test an instance you started yourself
+(point its OPENAI_API_URL at a fake or real endpoint); give --pid to sample its memory.
+
+Reports throughput, p50/p95/p99 latency and error rate per endpoint and end to end,
+and peak resident memory of the app process.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import requests
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.synthetic import IMAGE_PAGE_VALUES, make_statement
+
+ENDPOINTS = ['upload', 'get_page_count', 'process', 'download', 'document']
+
+
+def parse_mix(spec):
+    """Parse 'text:3:2,image:5:1' into [(kind, pages, weight), ...]"""
+    mix = []
+    for part in spec.split(','):
+        fields = part.strip().split(':')
+        if len(fields) not in (2, 3) or fields[0] not in ('text', 'image'):
+            raise ValueError(f"Invalid mix entry '{part}'; expected kind:pages[:weight]")
+        mix.append((fields[0], int(fields[1]), float(fields[2]) if len(fields) == 3 else 1.0))
+    return mix
+
+
+def percentile(values, q):
+    """Linearly interpolated percentile (q in 0-100) of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class MemorySampler:
+    """
+    Track the peak resident memory of a process by polling /proc (Linux)
+
+    Uses the kernel's high-water mark (VmHWM) when available, so short spikes between
+    samples are not missed.
+    """
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _read(self):
+        try:
+            with open(f'/proc/{self.pid}/status', 'r') as f:
+                fields = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            return None
+        value = fields.get('VmHWM') or fields.get('VmRSS')
+        return int(value.split()[0]) if value else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            kb = self._read()
+            if kb is not None:
+                self.peak_kb = max(self.peak_kb or 0, kb)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        kb = self._read()
+        if kb is not None:
+            self.peak_kb = max(self.peak_kb or 0, kb)
+        self._stop.set()
+        self._thread.join()
+        return self.peak_kb
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(port, api_url, work_dir):
+    """Start the app in a child process and wait until /health answers"""
+    env = {
+        **os.environ,
+        'PYTHONPATH': APP_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''),
+        'OPENAI_API_URL': api_url,
+        'OPENAI_API_KEY': os.environ.get('OPENAI_API_KEY', 'load-test'),
+        'VISION_CACHE_ENABLED': 'false',
+        'PAGE_CHECKPOINT_ENABLED': 'false',
+    }
+    # Run from the work directory so the app's log file does not land in the source tree
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.load_test', '--serve', str(port)],
+        cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited during startup with status {process.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("App did not start within 60s")
+
+
+def serve(port):
+    """Child process entry point: run the app on a threaded development server"""
+    import logging
+    import main as app_main
+    logging.disable(logging.INFO)
+    app_main.app.run(host='127.0.0.1', port=port, threaded=True, debug=False, use_reloader=False)
+
+
+class LoadTest:
+    """
+    Simulated preparers working through a queue of documents
+
+    Args:
+        url (str): Base URL of the app
+        documents (list): (pdf_path, kind, pages) for every iteration, in the order they are taken
+        users (int): Concurrent preparers
+        timeout (float): Per-request timeout in seconds
+    """
+
+    def __init__(self, url, documents, users, timeout=300):
+        self.url = url.rstrip('/')
+        self.documents = documents
+        self.users = users
+        self.timeout = timeout
+        self.latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        self.errors = {endpoint: {} for endpoint in ENDPOINTS}
+        self.pages = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _take(self):
+        with self._lock:
+            if self._next >= len(self.documents):
+                return None
+            self._next += 1
+            return self.documents[self._next - 1]
+
+    def _record(self, endpoint, seconds, error=None):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if error:
+                self.errors[endpoint][error] = self.errors[endpoint].get(error, 0) + 1
+
+    def _call(self, session, endpoint, method, path, **kwargs):
+        """Make one request; returns the response, or None if it failed"""
+        start = time.perf_counter()
+        try:
+            response = session.request(method, f"{self.url}{path}", timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            self._record(endpoint, time.perf_counter() - start, type(e).__name__)
+            return None
+        error = None if response.ok else f"HTTP {response.status_code}"
+        self._record(endpoint, time.perf_counter() - start, error)
+        return response if response.ok else None
+
+    def _document(self, session, pdf_path):
+        with open(pdf_path, 'rb') as f:
+            response = self._call(session, 'upload', 'POST', '/upload',
+                                  files={'file': (os.path.basename(pdf_path), f, 'application/pdf')})
+        if response is None:
+            return False
+        upload = response.json()
+        response = self._call(session, 'get_page_count', 'POST', '/get_page_count',
+                              json={'filepath': upload['filepath']})
+        if response is None:
+            return False
+        page_count = response.json()['pageCount']
+        response = self._call(session, 'process', 'POST', '/process', json={
+            'filepath': upload['filepath'],
+            'filetype': upload['filetype'],
+            'pages': list(range(1, page_count + 1))
+        })
+        if response is None:
+            return False
+        with self._lock:
+            self.pages += page_count
+        return self._call(session, 'download', 'GET', f"/download/{response.json()['csv_filename']}") is not None
+
+    def _user(self):
+        with requests.Session() as session:
+            while True:
+                document = self._take()
+                if document is None:
+                    return
+                start = time.perf_counter()
+                ok = self._document(session, document[0])
+                self._record('document', time.perf_counter() - start, None if ok else 'failed')
+
+    def run(self):
+        """
+        Returns:
+            float: Wall-clock seconds for the whole test
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.users, thread_name_prefix="user") as executor:
+            for future in [executor.submit(self._user) for _ in range(self.users)]:
+                future.result()
+        return time.perf_counter() - start
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            latencies = self.latencies[endpoint]
+            failed = sum(self.errors[endpoint].values())
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                'errors': failed,
+                'error_rate': round(failed / len(latencies), 4) if latencies else 0.0,
+                'error_types': self.errors[endpoint],
+                'throughput_per_s': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+                **{f'p{q}': round(percentile(latencies, q), 4) if latencies else None for q in (50, 95, 99)},
+            }
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'documents_per_s': endpoints['document']['throughput_per_s'],
+            'pages_per_s': round(self.pages / elapsed, 3) if elapsed else 0.0,
+            'endpoints': endpoints
+        }
+
+
+def print_summary(summary, peak_kb):
+    print(f"\nElapsed {summary['elapsed_s']:.1f}s: {summary['documents_per_s']:.2f} documents/s, "
+          f"{summary['pages_per_s']:.2f} pages/s")
+    print(f"{'endpoint':<16} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 s':>9} {'p95 s':>9} {'p99 s':>9}")
+    for endpoint, stats in summary['endpoints'].items():
+        if not stats['requests']:
+            continue
+        print(f"{endpoint:<16} {stats['requests']:9d} {stats['error_rate']:7.1%} {stats['throughput_per_s']:8.2f} "
+              f"{stats['p50']:9.3f} {stats['p95']:9.3f} {stats['p99']:9.3f}")
+        for error, count in stats['error_types'].items():
+            print(f"{'':<16}   {count} x {error}")
+    print(f"Peak app memory: {peak_kb / 1024:.0f} MB" if peak_kb else "Peak app memory: not measured")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=4, help='Concurrent simulated preparers')
+    parser.add_argument('--iterations', type=int, default=5, help='Documents each preparer processes')
+    parser.add_argument('--mix', default='text:3:1,image:3:1',
+                        help='Document mix as kind:pages:weight entries (kind is text or image)')
+    parser.add_argument('--latency', type=float, default=1.0, help='Fake vision API latency (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Extra random fake API latency (s)')
+    parser.add_argument('--url', help='Test an already running instance instead of starting one')
+    parser.add_argument('--pid', type=int, help='Process ID of the --url instance, to sample its memory')
+    parser.add_argument('--timeout', type=float, default=300, help='Per-request timeout (s)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the document mix')
+    parser.add_argument('--output', help='Write the summary as JSON to this file')
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(prefix='load_test_')
+    server = process = sampler = None
+    try:
+        total = args.users * args.iterations
+        print(f"Generating {total} synthetic statements ({args.mix})...", flush=True)
+        documents = []
+        for i, (kind, pages, _) in enumerate(rng.choices(mix, weights=[m[2] for m in mix], k=total)):
+            pdf_path = os.path.join(work_dir, f"{kind}_{pages}p_{i}.pdf")
+            make_statement(pdf_path, kind, pages, seed=args.seed * 100000 + i)
+            documents.append((pdf_path, kind, pages))
+
+        url = args.url
+        pid = args.pid
+        if not url:
+            server = FakeOpenAIServer(latency=args.latency, jitter=args.jitter, response=IMAGE_PAGE_VALUES).start()
+            process, url = start_app(free_port(), server.url, work_dir)
+            pid = process.pid
+        if pid:
+            sampler = MemorySampler(pid).start()
+
+        print(f"Running {args.users} users x {args.iterations} documents against {url}...", flush=True)
+        test = LoadTest(url, documents, args.users, timeout=args.timeout)
+        elapsed = test.run()
+        summary = test.summary(elapsed)
+        peak_kb = sampler.stop() if sampler else None
+        sampler = None
+        summary.update({
+            'users': args.users,
+            'iterations': args.iterations,
+            'mix': args.mix,
+            'latency': args.latency if not args.url else None,
+            'peak_memory_mb': round(peak_kb / 1024, 1) if peak_kb else None
+        })
+        print_summary(summary, peak_kb)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+            print(f"Summary saved to {args.output}")
+    finally:
+        if sampler:
+            sampler.stop()
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        if server:
+            server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Synthetic GIFI statements for benchmarks and tests.
+
+Statements are laid out like the balance sheets and income statements the app is fed:
+a title, a "Current Year / Prior Year" heading and one line per GIFI code. They come in
+two kinds:
+
+    text   a digital PDF with a text layer, read without the vision API
+    image  a scanned-style PDF with no text layer, so every page goes through vision
+
+Every image page prints the same rows (IMAGE_PAGE_VALUES), which is also the payload a
+FakeOpenAIServer should return, so vision extraction is deterministic and its output
+can be checked against the page. Text pages use seeded random codes and amounts.
+
+Usage (from the app directory):
+    python -m benchmarks.synthetic out.pdf --kind image --pages 10
+"""
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Letter size in points
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+ROWS_PER_PAGE = 30
+
+# Rows printed on every image page, and the vision response that matches them
+IMAGE_PAGE_VALUES = {
+    "1000": "125000",
+    "1060": "48210",
+    "1120": "17325",
+    "1480": "9800",
+    "2620": "31400",
+    "2680": "6150",
+    "3500": "100",
+    "3600": "91250",
+    "8000": "410275",
+    "8299": "410275",
+    "9367": "318900",
+    "9999": "91375"
+}
+
+# Used when the GIFI mapping cannot be loaded
+FALLBACK_CODES = sorted(IMAGE_PAGE_VALUES)
+
+DESCRIPTIONS = [
+    "Cash and deposits", "Accounts receivable", "Inventories", "Prepaid expenses",
+    "Land", "Buildings", "Machinery and equipment", "Accumulated amortization",
+    "Accounts payable", "Accrued liabilities", "Due to shareholders", "Long-term debt",
+    "Common shares", "Retained earnings", "Sales of goods", "Cost of sales",
+    "Advertising", "Bank charges", "Insurance", "Professional fees", "Rent", "Salaries and wages"
+]
+
+
+def gifi_codes():
+    """Codes from the GIFI mapping, so synthetic rows exercise the mapping stage"""
+    try:
+        from modules.mapping_utils import load_mapping  # Import here so the generator works without the mapping file
+        return sorted(load_mapping('GIFI'))
+    except Exception:
+        return FALLBACK_CODES
+
+
+def format_amount(value):
+    """Print an amount the way statements do: thousands separators, negatives in parentheses"""
+    text = f"{abs(value):,}"
+    return f"({text})" if value < 0 else text
+
+
+def statement_rows(page_count, seed=0):
+    """
+    Seeded rows for a text statement
+
+    Args:
+        page_count (int): Number of pages
+        seed (int): Random seed; the same seed gives the same statement
+
+    Returns:
+        list: One list of (code, description, current, prior) tuples per page
+    """
+    rng = random.Random(seed)
+    codes = gifi_codes()
+    pages = []
+    for _ in range(page_count):
+        page_codes = sorted(rng.sample(codes, min(ROWS_PER_PAGE, len(codes))))
+        pages.append([
+            (code, rng.choice(DESCRIPTIONS), rng.randint(-50000, 900000), rng.randint(-50000, 900000))
+            for code in page_codes
+        ])
+    return pages
+
+
+def expected_values(pages):
+    """
+    Returns:
+        dict: GIFI code -> value the pipeline should return for the current year column,
+              signed the way post-processing signs amounts shown in parentheses
+    """
+    from modules.openai_utils import post_process_gifi_values  # Import here to keep the generator light
+
+    values = {}
+    parenthetical_values = {}
+    for rows in pages:
+        for code, _, current, _ in rows:
+            if code not in values:
+                values[code] = str(abs(current))
+                if current < 0:
+                    parenthetical_values[code] = True
+    return post_process_gifi_values(values, parenthetical_values)
+
+
+def _page_lines(title, rows):
+    """Yield (x, y, text, right_aligned) placements for one statement page, y from the top"""
+    yield 72, 60, title, False
+    yield 400, 100, "Current Year", True
+    yield 500, 100, "Prior Year", True
+    for i, (code, description, current, prior) in enumerate(rows):
+        y = 130 + i * 20
+        yield 72, y, code, False
+        yield 110, y, description, False
+        yield 400, y, format_amount(current), True
+        yield 500, y, format_amount(prior), True
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_text_pdf(path, pages, title="Synthetic Holdings Ltd."):
+    """
+    Write a PDF with a real text layer (Helvetica, one content stream per page)
+
+    Right-aligned amounts are positioned using the font's average digit width, which is
+    close enough for the text-layer parser's column matching.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for number, rows in enumerate(pages, start=1):
+        commands = []
+        for x, y, text, right in _page_lines(f"{title} - page {number}", rows):
+            if right:
+                x = x + 60 - len(text) * 5.0  # Helvetica 9pt digits are 5pt wide
+            commands.append(f"BT /F1 9 Tf {x:.1f} {PAGE_HEIGHT - y:.1f} Td ({_pdf_escape(text)}) Tj ET")
+        stream = "\n".join(commands).encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode('latin-1')
+        )
+        page_ids.append(len(objects))
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode('latin-1')
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return path
+
+
+def write_image_pdf(path, page_count, seed=0, dpi=150, title="Synthetic Holdings Ltd."):
+    """
+    Write a scanned-style PDF: each page is a raster image with no text layer
+
+    Every page prints IMAGE_PAGE_VALUES; the seed only varies the title line so that
+    repeated runs produce distinct files (and so miss the upload and document caches).
+    """
+    from PIL import Image, ImageDraw, ImageFont  # Pillow is installed with pdf2image
+
+    scale = dpi / 72
+    font = ImageFont.load_default(size=round(9 * scale))
+    rows = [
+        (code, DESCRIPTIONS[i % len(DESCRIPTIONS)], int(value), int(value) - 1000)
+        for i, (code, value) in enumerate(IMAGE_PAGE_VALUES.items())
+    ]
+    images = []
+    for number in range(1, page_count + 1):
+        image = Image.new('L', (round(PAGE_WIDTH * scale), round(PAGE_HEIGHT * scale)), 255)
+        draw = ImageDraw.Draw(image)
+        for x, y, text, right in _page_lines(f"{title} #{seed} - page {number}", rows):
+            anchor = 'rs' if right else 'ls'
+            if right:
+                x += 60
+            draw.text((x * scale, y * scale), text, fill=0, font=font, anchor=anchor)
+        images.append(image)
+    try:
+        images[0].save(path, 'PDF', resolution=dpi, save_all=True, append_images=images[1:])
+    finally:
+        for image in images:
+            image.close()
+    return path
+
+
+def make_statement(path, kind, page_count, seed=0):
+    """
+    Write a synthetic statement
+
+    Args:
+        path (str): Output PDF path
+        kind (str): 'text' or 'image'
+        page_count (int): Number of pages
+        seed (int): Seed for the statement's contents
+
+    Returns:
+        dict: GIFI code -> value the pipeline should extract
+    """
+    if kind == 'text':
+        pages = statement_rows(page_count, seed)
+        write_text_pdf(path, pages, title=f"Synthetic Holdings Ltd. #{seed}")
+        return expected_values(pages)
+    if kind == 'image':
+        write_image_pdf(path, page_count, seed)
+        return dict(IMAGE_PAGE_VALUES)
+    raise ValueError(f"Unknown statement kind '{kind}'. Use 'text' or 'image'.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help='PDF to write')
+    parser.add_argument('--kind', choices=['text', 'image'], default='text')
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    values = make_statement(args.output, args.kind, args.pages, args.seed)
+    print(f"Wrote {args.output}: {args.pages} {args.kind} pages, {len(values)} distinct GIFI codes")
+
+
+if __name__ == '__main__':
+    main()
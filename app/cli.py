@@ -0,0 +1,282 @@
+"""
+Headless batch processing of tax return documents.
+
+Usage (from the app directory):
+    python cli.py /path/to/returns --output /path/to/results
+    python cli.py "/data/2024/**/*.pdf" --output results --dictionary GIFI --workers 8
+    python cli.py returns --output results --force          # ignore the manifest, redo everything
+
+Every PDF or Word document found in the given directories, files or glob patterns is
+run through the same extract -> map -> CSV pipeline as /process, fanned out across a
+pool of worker processes. Each document gets its own CSV in the output directory.
+
+Progress is checkpointed in <output>/manifest.jsonl: one line is appended as each
+document finishes. Re-running the same command after a crash or interruption skips
+documents already completed (same content, same dictionary, CSV still present) and
+retries those that failed or had failed pages. When the run ends, summary.csv (one row
+per document) and summary.json (totals) are written from the manifest.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from modules.document_utils import hash_file
+
+logger = logging.getLogger('cli')
+
+SUPPORTED_EXTENSIONS = {'.pdf': 'pdf', '.docx': 'docx', '.doc': 'doc'}
+MANIFEST_FILENAME = 'manifest.jsonl'
+
+
+def find_documents(inputs, recursive=False):
+    """
+    Expand directories, files and glob patterns into supported documents
+
+    Args:
+        inputs (list): Paths or glob patterns
+        recursive (bool): Descend into subdirectories of directory inputs
+
+    Returns:
+        list: Absolute paths, sorted and without duplicates
+    """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                paths = [os.path.join(root, name) for root, _, names in os.walk(item) for name in names]
+            else:
+                paths = [os.path.join(item, name) for name in os.listdir(item)]
+        elif os.path.exists(item):
+            paths = [item]
+        else:
+            paths = glob.glob(item, recursive=True)
+            if not paths:
+                logger.warning(f"No files match {item}")
+        for path in paths:
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS:
+                found.add(os.path.abspath(path))
+    return sorted(found)
+
+
+class Manifest:
+    """
+    Append-only checkpoint of finished documents
+
+    Each finished document appends one JSON line, flushed to disk before the next is
+    recorded, so a crash loses at most the document in progress. When the file is read
+    back the last record for each source wins.
+
+    Args:
+        path (str): Path to the manifest file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Partially written line from a crash
+                    self.records[record['source']] = record
+
+    def is_complete(self, source, sha256, dictionary):
+        """True if this exact content was already processed with this dictionary, without failures"""
+        record = self.records.get(source)
+        return bool(
+            record and record['status'] == 'done' and record['sha256'] == sha256
+            and record['dictionary'] == dictionary and record.get('csv_path') and os.path.exists(record['csv_path'])
+        )
+
+    def append(self, record):
+        self.records[record['source']] = record
+        with open(self.path, 'a+b') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')  # End a line torn by a crash, or this record would be lost with it
+            f.write((json.dumps(record) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _init_worker(log_level):
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s')
+
+
+def process_document(source, sha256, output_dir, options):
+    """
+    Run the pipeline for one document in a worker process
+
+    Args:
+        source (str): Path to the document
+        sha256 (str): Hex digest of its contents (computed by the parent)
+        output_dir (str): Directory for the document's CSV
+        options (dict): dictionary, render_profile, max_workers, use_text_layer, pack_size, crop_roi
+
+    Returns:
+        dict: Manifest record for the document
+    """
+    # Imported in the worker so the parent process stays light
+    from modules.document_utils import register_file_hash
+    from modules.pipeline_utils import run_pipeline, ExtractionFailedError
+
+    start = time.perf_counter()
+    record = {
+        'source': source,
+        'sha256': sha256,
+        'dictionary': options['dictionary'],
+        'status': 'failed',
+        'pages': 0,
+        'pages_failed': 0,
+        'page_errors': {},
+        'mapped_items': 0,
+        'mapping_warnings': 0,
+        'csv_path': None,
+        'error': None
+    }
+    try:
+        register_file_hash(source, sha256)
+        result = run_pipeline(
+            source,
+            SUPPORTED_EXTENSIONS[os.path.splitext(source)[1].lower()],
+            dictionary_name=options['dictionary'],
+            save_directory=output_dir,
+            render_profile=options['render_profile'],
+            max_workers=options['max_workers'],
+            use_text_layer=options['use_text_layer'],
+            pack_size=options['pack_size'],
+            crop_roi=options['crop_roi']
+        )
+        # Name the CSV after the document; the hash prefix keeps same-named files apart
+        stem = os.path.splitext(os.path.basename(source))[0]
+        csv_path = os.path.join(output_dir, f"{stem}-{sha256[:8]}-{options['dictionary']}.csv")
+        os.replace(result['csv_path'], csv_path)
+        record.update({
+            'status': 'partial' if result['page_errors'] else 'done',
+            'pages': len(result['extracted_data']) + len(result['page_errors']),
+            'pages_failed': len(result['page_errors']),
+            'page_errors': result['page_errors'],
+            'mapped_items': len(result['mapped_data']),
+            'mapping_warnings': len(result['mapping_warnings']),
+            'csv_path': csv_path
+        })
+    except ExtractionFailedError as e:
+        record.update({'error': str(e), 'page_errors': e.page_errors,
+                       'pages': len(e.page_errors), 'pages_failed': len(e.page_errors)})
+    except Exception as e:
+        logging.getLogger('cli').exception(f"Failed to process {source}")
+        record['error'] = f"{type(e).__name__}: {str(e)}"
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    record['finished_at'] = datetime.now().isoformat(timespec='seconds')
+    return record
+
+
+def write_summary(manifest, sources, output_dir):
+    """Write summary.csv and summary.json for the documents in this run"""
+    from modules.csv_utils import generate_summary_csv
+
+    records = [manifest.records[source] for source in sources if source in manifest.records]
+    generate_summary_csv(records, os.path.join(output_dir, 'summary.csv'))
+    totals = {
+        'documents': len(sources),
+        'done': sum(record['status'] == 'done' for record in records),
+        'partial': sum(record['status'] == 'partial' for record in records),
+        'failed': sum(record['status'] == 'failed' for record in records),
+        'not_run': len(sources) - len(records),
+        'pages': sum(record['pages'] for record in records),
+        'pages_failed': sum(record['pages_failed'] for record in records),
+        'mapped_items': sum(record['mapped_items'] for record in records),
+        'generated_at': datetime.now().isoformat(timespec='seconds')
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(totals, f, indent=2)
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='Directories, files or glob patterns (quote globs)')
+    parser.add_argument('--output', '-o', required=True, help='Directory for CSVs, the manifest and the summary')
+    parser.add_argument('--dictionary', default='GIFI', help='Mapping dictionary (default: GIFI)')
+    parser.add_argument('--recursive', '-r', action='store_true', help='Search directories recursively')
+    parser.add_argument('--workers', type=int, default=max(1, min(4, os.cpu_count() or 1)),
+                        help='Documents processed in parallel (worker processes)')
+    parser.add_argument('--vision-concurrency', type=int, default=None,
+                        help='Vision requests in flight per document (default: VISION_MAX_CONCURRENCY)')
+    parser.add_argument('--render-profile', default=None, help='Rasterization profile for vision pages')
+    parser.add_argument('--pack-size', type=int, default=None, help='Pages per vision request')
+    parser.add_argument('--no-text-layer', action='store_true', help='Send every page to the vision API')
+    parser.add_argument('--no-crop', action='store_true', help='Send full pages instead of cropped regions')
+    parser.add_argument('--force', action='store_true', help='Reprocess documents already in the manifest')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Log pipeline progress')
+    args = parser.parse_args(argv)
+
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    _init_worker(log_level)
+
+    sources = find_documents(args.inputs, args.recursive)
+    if not sources:
+        parser.error('No PDF or Word documents found')
+    os.makedirs(args.output, exist_ok=True)
+    output_dir = os.path.abspath(args.output)
+    manifest = Manifest(os.path.join(output_dir, MANIFEST_FILENAME))
+
+    pending = []
+    for source in sources:
+        sha256 = hash_file(source)
+        if not args.force and manifest.is_complete(source, sha256, args.dictionary):
+            continue
+        pending.append((source, sha256))
+    print(f"{len(sources)} documents found, {len(sources) - len(pending)} already complete, "
+          f"{len(pending)} to process with {args.workers} workers", flush=True)
+
+    options = {
+        'dictionary': args.dictionary,
+        'render_profile': args.render_profile,
+        'max_workers': args.vision_concurrency,
+        'use_text_layer': False if args.no_text_layer else None,
+        'pack_size': args.pack_size,
+        'crop_roi': False if args.no_crop else None
+    }
+    completed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(log_level,)) as executor:
+            futures = {
+                executor.submit(process_document, source, sha256, output_dir, options): source
+                for source, sha256 in pending
+            }
+            try:
+                for future in as_completed(futures):
+                    record = future.result()
+                    manifest.append(record)
+                    completed += 1
+                    detail = record['error'] or f"{record['pages']} pages, {record['mapped_items']} items"
+                    print(f"[{completed}/{len(pending)}] {record['status']:<7} {os.path.basename(record['source'])} "
+                          f"({detail}, {record['seconds']:.1f}s)", flush=True)
+            except KeyboardInterrupt:
+                print("Interrupted; finished documents are saved in the manifest", flush=True)
+                for future in futures:
+                    future.cancel()
+                raise
+    except BrokenProcessPool as e:
+        print(f"A worker process died ({str(e)}); re-run the same command to resume", flush=True)
+
+    totals = write_summary(manifest, sources, output_dir)
+    print(f"Done: {totals['done']} complete, {totals['partial']} with failed pages, {totals['failed']} failed, "
+          f"{totals['not_run']} not run. Summary: {os.path.join(output_dir, 'summary.csv')}")
+    return 0 if totals['done'] == totals['documents'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,15 @@
 import os
 import logging
 import sys
-from flask import Flask, render_template, request, jsonify, send_file
+import time
+import threading
+from contextlib import nullcontext
+from flask import Flask, Response, g, render_template, request, jsonify, send_file, stream_with_context
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 import tempfile
-from datetime import datetime
-import PyPDF2
 import traceback
+import zipfile
 
 # Configure logging
 logging.basicConfig(
@@ -19,35 +22,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Add Poppler to PATH and DLL search paths
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-poppler_path = os.path.join(project_root, "poppler", "poppler-23.11.0", "Library", "bin")
-os.environ["PATH"] = poppler_path + os.pathsep + os.environ["PATH"]
-if hasattr(os, 'add_dll_directory'):  # Windows-specific DLL directory handling
-    os.add_dll_directory(poppler_path)
-print(f"\nAdded Poppler to PATH: {poppler_path}")
-logger.info(f"Added Poppler to PATH: {poppler_path}")
-logger.info(f"Current PATH: {os.environ['PATH']}")
-
-# Import utility modules
-from modules.pdf_utils import convert_pdf_to_images
-from modules.docx_utils import extract_text_from_docx
-from modules.openai_utils import extract_data_with_vision
-from modules.csv_utils import generate_csv
-from modules.mapping_utils import map_extracted_data_to_cell_ids, list_available_mappings
+# Import utility modules (heavy libraries such as pandas, pdf2image and python-docx load on first use)
+from modules.pdf_utils import get_render_profile, get_poppler_path, RENDER_PROFILES, DEFAULT_RENDER_PROFILE
+from modules.openai_utils import VISION_MAX_CONCURRENCY, VISION_PACK_SIZE
+from modules.extraction_utils import TEXT_LAYER_ENABLED
+from modules.image_utils import ROI_CROP_ENABLED
+from modules.mapping_utils import list_available_mappings, get_mapping_description
+from modules.pipeline_utils import run_pipeline, remap_document, ExtractionFailedError, ExtractionNotStoredError
+from modules.job_utils import JobManager, JOB_WORKERS
+from modules.cache_utils import get_vision_cache
+from modules.document_utils import get_document_session, get_file_hash, register_file_hash
+from modules.profile_utils import get_document_profiler
+from modules.upload_utils import (UploadStore, ResumableUploads, UploadOffsetError, UploadVerificationError,
+                                  RESUMABLE_CHUNK_SIZE)
+from modules.checkpoint_utils import get_page_checkpoints
+from modules.results_utils import get_results_db
+from modules.batch_utils import (store_archive, store_document, run_batch, BatchLimitError, BATCH_WORKERS,
+                                 BATCH_MAX_UPLOAD_MB, BATCH_MAX_FILES)
+from modules.metrics_utils import collect_timings, render_metrics, HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT
+
+# Add the bundled Poppler, if installed, to PATH and DLL search paths
+poppler_path = get_poppler_path()
+if poppler_path:
+    os.environ["PATH"] = poppler_path + os.pathsep + os.environ["PATH"]
+    if hasattr(os, 'add_dll_directory'):  # Windows-specific DLL directory handling
+        os.add_dll_directory(poppler_path)
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 app.config['UPLOAD_FOLDER'] = os.path.join(tempfile.gettempdir(), 'tax_form_uploads')
 app.config['ALLOWED_EXTENSIONS'] = {'pdf', 'docx', 'doc'}
+app.config['VISION_MAX_CONCURRENCY'] = VISION_MAX_CONCURRENCY  # Max vision requests in flight per document
+app.config['VISION_PACK_SIZE'] = VISION_PACK_SIZE  # Pages sent together in one vision request
+app.config['RENDER_PROFILE'] = DEFAULT_RENDER_PROFILE  # Rasterization profile when a request doesn't pick one
+app.config['TEXT_LAYER_ENABLED'] = TEXT_LAYER_ENABLED  # Read digital PDFs from their text layer when possible
+app.config['ROI_CROP_ENABLED'] = ROI_CROP_ENABLED  # Crop page images to the code and value columns before vision
+
+app.config['JOB_WORKERS'] = JOB_WORKERS  # Background pipeline workers for /jobs
+app.config['BATCH_WORKERS'] = BATCH_WORKERS  # Documents processed in parallel per /batch request
+app.config['BATCH_MAX_CONTENT_LENGTH'] = int(BATCH_MAX_UPLOAD_MB * 1024 * 1024)  # Upload size limit for /batch only
+app.config['BATCH_MAX_FILES'] = BATCH_MAX_FILES  # Documents accepted per /batch request
 
 # Create upload folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Uploads are stored under their content hash, so identical files are kept and processed once
+upload_store = UploadStore(app.config['UPLOAD_FOLDER'])
+
+# Chunked uploads in progress live under the upload folder so finished files can be moved into the store
+resumable_uploads = ResumableUploads(os.path.join(app.config['UPLOAD_FOLDER'], '.resumable'))
+resumable_uploads.sweep()
+
+# Background workers for queued processing jobs
+job_manager = JobManager(max_workers=app.config['JOB_WORKERS'])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_latency(response):
+    if 'request_started' in g:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - g.request_started,
+            endpoint=request.endpoint or 'unmatched',
+            method=request.method,
+            status=str(response.status_code)
+        )
+    return response
+
+@app.teardown_request
+def end_request_timer(exc):
+    if g.pop('request_started', None) is not None:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+def _upload_filetype(filename):
+    """Returns 'pdf', 'docx' (also for .doc) or None for unsupported files"""
+    return 'pdf' if filename.lower().endswith('.pdf') else 'docx' if filename.lower().endswith(('.docx', '.doc')) else None
+
 @app.route('/')
 def index():
     """Render the main application page"""
@@ -70,26 +127,28 @@ def upload_file():
             filename = secure_filename(file.filename)
             logger.info(f"Processing uploaded file: {filename}")
             
-            # Create upload directory if it doesn't exist
-            if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                os.makedirs(app.config['UPLOAD_FOLDER'])
-                logger.info(f"Created upload directory: {app.config['UPLOAD_FOLDER']}")
-            
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            logger.info(f"Saved file to: {filepath}")
-            
             # Determine file type
-            filetype = 'pdf' if filename.lower().endswith('.pdf') else 'docx' if filename.lower().endswith(('.docx', '.doc')) else None
+            filetype = _upload_filetype(filename)
             if not filetype:
                 logger.error(f"Unsupported file type: {filename}")
                 return jsonify({'error': 'Unsupported file type'}), 400
             
+            # Stream to disk while hashing; identical content is stored once
+            stored = upload_store.save(file.stream, filename)
+            filepath = stored['path']
+            register_file_hash(filepath, stored['sha256'])
+            logger.info(f"Saved file to: {filepath}")
+            if filetype == 'pdf':
+                _start_profiling(filepath, stored['sha256'])
+            
             logger.info(f"File type determined: {filetype}")
             return jsonify({
                 'filepath': filepath,
                 'filename': filename,
-                'filetype': filetype
+                'filetype': filetype,
+                'document_id': stored['sha256'],
+                'duplicate': stored['duplicate'],
+                'size': stored['size']
             })
     
     except Exception as e:
@@ -97,6 +156,114 @@ def upload_file():
         logger.error(traceback.format_exc())
         return jsonify({'error': f'Error uploading file: {str(e)}'}), 500
 
+def _start_profiling(filepath, file_hash):
+    """Profile a newly uploaded PDF in the background (page count, text layer, thumbnails)"""
+    profiler = get_document_profiler()
+    if profiler:
+        profiler.submit(filepath, file_hash)
+    else:
+        _prefetch_page_count(filepath)
+
+def _prefetch_page_count(filepath):
+    """Open a finished PDF upload in the background so /get_page_count finds it parsed"""
+    def load():
+        try:
+            get_document_session(filepath).page_count
+        except Exception as e:
+            logger.warning(f"Could not read page count for {filepath}: {str(e)}")
+    threading.Thread(target=load, name='page-count', daemon=True).start()
+
+@app.route('/uploads', methods=['POST'])
+def start_resumable_upload():
+    """
+    Start a chunked, resumable upload for files too large for /upload.
+    Body: {"filename", "size", "sha256" (optional, checked on completion)}.
+    Send chunks with PUT /uploads/<id> and an Upload-Offset header, then POST /uploads/<id>/complete.
+    """
+    data = request.json or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not _upload_filetype(filename):
+        return jsonify({'error': 'Unsupported file type'}), 400
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'size must be an integer'}), 400
+    if size <= 0:
+        return jsonify({'error': 'size must be positive'}), 400
+    
+    status = resumable_uploads.create(filename, size, data.get('sha256'))
+    return jsonify({**status, 'chunk_size': RESUMABLE_CHUNK_SIZE, 'upload_url': f"/uploads/{status['upload_id']}"}), 201
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def resumable_upload_status(upload_id):
+    """Return the confirmed offset of an upload, to resume it after an interruption"""
+    try:
+        return jsonify(resumable_uploads.status(upload_id))
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def append_resumable_upload(upload_id):
+    """Append the request body at the Upload-Offset header; X-Chunk-SHA256 optionally verifies the chunk"""
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+    try:
+        # Read the body as a stream so the chunk is never held in memory
+        return jsonify(resumable_uploads.append(upload_id, offset, request.stream,
+                                                request.headers.get('X-Chunk-SHA256')))
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+    except UploadOffsetError as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), 409
+    except UploadVerificationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error receiving chunk for upload {upload_id}: {str(e)}")
+        return jsonify({'error': f'Error receiving chunk: {str(e)}'}), 500
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_resumable_upload(upload_id):
+    """Discard an upload in progress"""
+    try:
+        resumable_uploads.abort(upload_id)
+        return jsonify({'success': True})
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_resumable_upload(upload_id):
+    """Verify a fully received upload and store it; returns the same fields as /upload"""
+    try:
+        filename = resumable_uploads.status(upload_id)['filename']
+        stored = resumable_uploads.complete(upload_id, upload_store)
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+    except UploadOffsetError as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), 409
+    except UploadVerificationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error completing upload {upload_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': f'Error completing upload: {str(e)}'}), 500
+    
+    filepath = stored['path']
+    register_file_hash(filepath, stored['sha256'])
+    filetype = _upload_filetype(filename)
+    if filetype == 'pdf':
+        _start_profiling(filepath, stored['sha256'])
+    logger.info(f"Completed resumable upload {upload_id} as {filepath}")
+    return jsonify({
+        'filepath': filepath,
+        'filename': filename,
+        'filetype': filetype,
+        'document_id': stored['sha256'],
+        'duplicate': stored['duplicate'],
+        'size': stored['size']
+    })
+
 @app.route('/get_page_count', methods=['POST'])
 def get_page_count():
     """Get the number of pages in a PDF file"""
@@ -112,10 +279,20 @@ def get_page_count():
         if not filepath.lower().endswith('.pdf'):
             return jsonify({'error': 'File is not a PDF'}), 400
         
-        # Get page count
-        with open(filepath, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            page_count = len(pdf_reader.pages)
+        # The upload-time profile usually has the page count already
+        profiler = get_document_profiler()
+        profile = profiler.get(get_file_hash(filepath)) if profiler else None
+        if profile and profile.get('page_count'):
+            return jsonify({
+                'success': True,
+                'pageCount': profile['page_count'],
+                'profileStatus': profile['status'],
+                'textLayerPages': profile.get('text_layer_pages'),
+                'blankPages': profile.get('blank_pages')
+            })
+        
+        # Get page count (parses the document once for the later pipeline stages)
+        page_count = get_document_session(filepath).page_count
         
         logger.info(f"PDF page count: {page_count} for file: {filepath}")
         
@@ -134,76 +311,244 @@ def available_mappings():
     """Return a list of available mapping dictionaries (for UI dropdown), with descriptions."""
     try:
         mappings = list_available_mappings()
-        # Attempt to read a description from a companion file (e.g., GIFI_map.txt)
-        result = []
-        for name, path in mappings.items():
-            desc_path = path.with_suffix('.txt')
-            desc = ''
-            if desc_path.exists():
-                with open(desc_path, 'r', encoding='utf-8') as f:
-                    desc = f.read().strip()
-            result.append({'name': name, 'description': desc})
+        # Descriptions come from companion files (e.g., GIFI_map.txt), cached in the mapping registry
+        result = [{'name': name, 'description': get_mapping_description(name)} for name in mappings]
         return jsonify({'mappings': result})
     except Exception as e:
         logger.error(f"Error listing mappings: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/render_profiles', methods=['GET'])
+def render_profiles():
+    """Return the available rasterization profiles and the default (for UI dropdown)"""
+    return jsonify({
+        'profiles': [{'name': name, **settings} for name, settings in RENDER_PROFILES.items()],
+        'default': app.config['RENDER_PROFILE']
+    })
+
+def _pipeline_kwargs(data):
+    """
+    Validate a /process or /jobs request body and build run_pipeline arguments
+    
+    Returns:
+        tuple: (kwargs, None) on success, or (None, (response, status)) on a bad request
+    """
+    filepath = data.get('filepath')
+    if not filepath or not os.path.exists(filepath):
+        logger.error(f"File not found: {filepath}")
+        return None, (jsonify({'error': 'File not found'}), 404)
+    
+    options, error_response = _pipeline_options(data)
+    if error_response:
+        return None, error_response
+    return {
+        'filepath': filepath,
+        'filetype': data.get('filetype'),
+        'pages': data.get('pages', []),
+        'save_directory': data.get('save_directory'),
+        **options
+    }, None
+
+def _pipeline_options(data):
+    """
+    Validate the extraction and mapping options shared by /process, /jobs and /batch
+    
+    Returns:
+        tuple: (run_pipeline keyword arguments, None), or (None, (response, status)) on a bad request
+    """
+    # Clients choose a named profile; custom settings could ask for arbitrarily large renders
+    if not isinstance(data.get('render_profile') or '', str):
+        return None, (jsonify({'error': f"render_profile must be one of: {', '.join(RENDER_PROFILES)}"}), 400)
+    try:
+        render_profile = get_render_profile(data.get('render_profile') or app.config['RENDER_PROFILE'])
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    
+    try:
+        pack_size = int(data.get('pack_size') or app.config['VISION_PACK_SIZE'])
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'pack_size must be an integer'}), 400)
+    
+    return {
+        'dictionary_name': data.get('dictionary', 'GIFI'),
+        'render_profile': render_profile,
+        'max_workers': app.config['VISION_MAX_CONCURRENCY'],
+        'use_text_layer': data.get('use_text_layer', app.config['TEXT_LAYER_ENABLED']),
+        'pack_size': max(1, pack_size),
+        'crop_roi': data.get('crop_roi', app.config['ROI_CROP_ENABLED']),
+        'resume': data.get('resume', True)  # False re-extracts every page instead of reusing checkpoints
+    }, None
+
 @app.route('/process', methods=['POST'])
 def process_file():
     """Process the uploaded file and extract data (multi-dictionary support, mapping warnings)"""
     try:
-        data = request.json
-        filepath = data.get('filepath')
-        filetype = data.get('filetype')
-        pages = data.get('pages', [])
-        save_directory = data.get('save_directory')
-        dictionary_name = data.get('dictionary', 'GIFI')
-
-        if not filepath or not os.path.exists(filepath):
-            logger.error(f"File not found: {filepath}")
-            return jsonify({'error': 'File not found'}), 404
-
-        extracted_data = {}
-        mapping_warnings = []
-        if filetype == 'pdf':
-            logger.info(f"Processing PDF with selected pages: {pages}")
-            image_paths = convert_pdf_to_images(filepath, pages)
-            for i, img_path in enumerate(image_paths):
-                page_num = pages[i] if i < len(pages) else i + 1
-                extracted_data[f'page_{page_num}'] = extract_data_with_vision(img_path)
-        elif filetype in ['docx', 'doc']:
-            text = extract_text_from_docx(filepath)
-            extracted_data['text'] = text
-        else:
-            return jsonify({'error': 'Unsupported file type'}), 400
-
-        # Map extracted data to cell IDs using selected dictionary
-        # (mapping_utils.map_extracted_data_to_cell_ids now returns both mapped and warnings)
-        combined_data = {k: v for page_data in extracted_data.values() for k, v in page_data.items()}
-        mapped_data, mapping_warnings = map_extracted_data_to_cell_ids(combined_data, dictionary_name)
-
-        logger.info(f"Mapped {len(mapped_data)} items to cell IDs using {dictionary_name}")
-
-        # Determine save directory
-        if not save_directory:
-            save_directory = os.path.dirname(filepath)
-
-        csv_filename = f"tax_form_data_{dictionary_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        csv_path = os.path.join(save_directory, csv_filename)
-        generate_csv(mapped_data, csv_path)
-        logger.info(f"Processing complete. CSV saved to {csv_path}")
-
+        kwargs, error_response = _pipeline_kwargs(request.json)
+        if error_response:
+            return error_response
+        
+        # Optional per-stage timing breakdown of this request
+        with (collect_timings() if request.json.get('timings') else nullcontext()) as timings:
+            result = run_pipeline(**kwargs)
+        if timings is not None:
+            result['timings'] = {
+                stage: {'count': entry['count'], 'seconds': round(entry['seconds'], 4)}
+                for stage, entry in timings.items()
+            }
         return jsonify({
             'success': True,
             'message': 'File processed successfully',
-            'csv_filename': csv_filename,
-            'csv_path': csv_path,
-            'mapping_warnings': mapping_warnings
+            **result
         })
+    except ExtractionFailedError as e:
+        return jsonify({'error': str(e), 'page_errors': e.page_errors}), 500
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
         return jsonify({'error': f'Error processing file: {str(e)}'}), 500
 
+@app.route('/batch', methods=['POST'])
+def process_batch():
+    """
+    Upload several documents (repeated 'files' fields) and/or ZIP archives of them and queue
+    them as one background job. The job's result (see /jobs/<job_id>) is one combined CSV plus
+    the status of each document; its events stream a 'document_done' event per document.
+    Options (dictionary, render_profile, pack_size, use_text_layer, crop_roi, resume) are form fields.
+    """
+    # Batches are far larger than single uploads; only this endpoint gets the higher limit
+    request.max_content_length = app.config['BATCH_MAX_CONTENT_LENGTH']
+    try:
+        files = [file for file in request.files.getlist('files') + request.files.getlist('file') if file.filename]
+        if not files:
+            return jsonify({'error': 'No files in request'}), 400
+        
+        form = request.form.to_dict()
+        for name in ('use_text_layer', 'crop_roi', 'resume'):
+            if name in form:
+                form[name] = form[name].lower() in ('1', 'true', 'yes')
+        options, error_response = _pipeline_options(form)
+        if error_response:
+            return error_response
+        
+        entries = []
+        for file in files:
+            remaining = app.config['BATCH_MAX_FILES'] - sum(entry['status'] == 'stored' for entry in entries)
+            if remaining <= 0:
+                raise BatchLimitError(f"A batch can hold at most {app.config['BATCH_MAX_FILES']} documents")
+            filename = secure_filename(file.filename)
+            if filename.lower().endswith('.zip'):
+                # Werkzeug has already spooled the part to a temporary file, so the archive is read from disk
+                entries.extend(store_archive(file.stream, upload_store, max_files=remaining))
+            else:
+                entries.append(store_document(upload_store, file.stream, filename or 'upload'))
+        for entry in entries:
+            if entry['status'] == 'stored':
+                register_file_hash(entry['path'], entry['document_id'])
+        logger.info(f"Batch of {len(entries)} files received")
+        
+        # Extracting a whole batch takes far longer than a proxy will hold the request open
+        job = job_manager.submit(
+            run_batch,
+            params={'batch': True, 'files': len(entries)},
+            entries=entries,
+            save_directory=app.config['UPLOAD_FOLDER'],
+            document_workers=app.config['BATCH_WORKERS'],
+            **options
+        )
+        return jsonify({
+            'job_id': job.id,
+            'state': job.state,
+            'documents': [{key: value for key, value in entry.items() if key != 'path'} for entry in entries],
+            'status_url': f'/jobs/{job.id}',
+            'events_url': f'/jobs/{job.id}/events'
+        }), 202
+    except (BatchLimitError, zipfile.BadZipFile) as e:
+        return jsonify({'error': str(e)}), 400
+    except RequestEntityTooLarge:
+        return jsonify({'error': f"Batch is larger than {app.config['BATCH_MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB"}), 413
+    except Exception as e:
+        logger.error(f"Error processing batch: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': f'Error processing batch: {str(e)}'}), 500
+
+@app.route('/remap', methods=['POST'])
+def remap_file():
+    """Map a processed document's stored page results with one or more dictionaries, without extracting again"""
+    try:
+        data = request.json
+        document_id = str(data.get('document_id') or '')
+        if not document_id.isalnum():
+            return jsonify({'error': 'document_id is required'}), 400
+        
+        dictionaries = data.get('dictionaries') or [data.get('dictionary', 'GIFI')]
+        if isinstance(dictionaries, str):
+            dictionaries = [dictionaries]
+        available = {name.upper() for name in list_available_mappings()}
+        unknown = [name for name in dictionaries if str(name).upper() not in available]
+        if unknown:
+            return jsonify({'error': f"Unknown dictionaries: {', '.join(map(str, unknown))}"}), 400
+        
+        result = remap_document(
+            document_id,
+            dictionaries,
+            data.get('save_directory') or app.config['UPLOAD_FOLDER'],
+            pages=data.get('pages', [])
+        )
+        return jsonify({'success': True, **result})
+    except ExtractionNotStoredError as e:
+        return jsonify({'error': str(e), 'missing_pages': e.missing_pages}), 409
+    except Exception as e:
+        logger.error(f"Error remapping document: {str(e)}")
+        return jsonify({'error': f'Error remapping document: {str(e)}'}), 500
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue the uploaded file for background processing and return a job ID immediately"""
+    try:
+        data = request.json
+        kwargs, error_response = _pipeline_kwargs(data)
+        if error_response:
+            return error_response
+        if kwargs['filetype'] not in ('pdf', 'docx', 'doc'):
+            return jsonify({'error': 'Unsupported file type'}), 400
+        
+        job = job_manager.submit(run_pipeline, params={'filetype': kwargs['filetype']}, **kwargs)
+        return jsonify({
+            'job_id': job.id,
+            'state': job.state,
+            'status_url': f'/jobs/{job.id}',
+            'events_url': f'/jobs/{job.id}/events'
+        }), 202
+    except Exception as e:
+        logger.error(f"Error submitting job: {str(e)}")
+        return jsonify({'error': f'Error submitting job: {str(e)}'}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Return the state, progress and (when done) result of a background job"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream a job's progress and per-page results as Server-Sent Events"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    # Resume after the last event the browser saw if it reconnects
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', '0'))
+    after = int(last_event_id) if str(last_event_id).isdigit() else 0
+    
+    return Response(
+        stream_with_context(job.stream_events(after)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/download/<filename>', methods=['GET'])
 def download_file(filename):
     """Download the generated CSV file"""
@@ -220,6 +565,135 @@ def download_file(filename):
         logger.error(traceback.format_exc())
         return jsonify({'error': f'Error downloading file: {str(e)}'}), 500
 
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Return vision cache hit/miss counters and size"""
+    cache = get_vision_cache()
+    if not cache:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.stats()})
+
+@app.route('/documents/<document_id>/pages', methods=['GET'])
+def document_pages(document_id):
+    """Return the checkpointed status of each page of a document, so failed pages can be retried"""
+    checkpoints = get_page_checkpoints()
+    if not checkpoints:
+        return jsonify({'enabled': False})
+    if not document_id.isalnum():
+        return jsonify({'error': 'Invalid document ID'}), 400
+    pages = checkpoints.document_status(document_id)
+    return jsonify({
+        'enabled': True,
+        'document_id': document_id,
+        'pages': pages,
+        'failed_pages': [int(key[len('page_'):]) for key, page in pages.items() if page['status'] == 'failed']
+    })
+
+def _results_query_args(table):
+    """
+    Read the filters, amount range and paging shared by the /results query endpoints
+    
+    Returns:
+        dict: filters, min_value, max_value, limit and offset keyword arguments
+    
+    Raises:
+        ValueError: If a numeric parameter is not a number
+    """
+    args = request.args
+    filters = {
+        'document_hash': args.get('document_id'),
+        'gifi_code': args.get('gifi_code'),
+        'page': int(args['page']) if args.get('page') else None,
+        'source': args.get('source') if table == 'extracted_values' else None,
+        'dictionary': args.get('dictionary') if table == 'mapped_values' else None,
+        'cell_id': args.get('cell_id') if table == 'mapped_values' else None
+    }
+    return {
+        'filters': filters,
+        'min_value': float(args['min_value']) if args.get('min_value') else None,
+        'max_value': float(args['max_value']) if args.get('max_value') else None,
+        'limit': int(args.get('limit', 100)),
+        'offset': int(args.get('offset', 0))
+    }
+
+@app.route('/results/documents', methods=['GET'])
+def results_documents():
+    """List processed documents in the results database, most recent first"""
+    results_db = get_results_db()
+    if not results_db:
+        return jsonify({'enabled': False})
+    try:
+        page = results_db.documents(limit=int(request.args.get('limit', 100)), offset=int(request.args.get('offset', 0)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Web uploads are stored under their hash, so add the names they were uploaded as
+    for document in page['rows']:
+        upload = upload_store.get(document['document_hash'])
+        document['filenames'] = upload['filenames'] if upload else [document['filename']]
+    return jsonify(page)
+
+@app.route('/results/<kind>', methods=['GET'])
+def results_query(kind):
+    """
+    Page through stored values: /results/values (extracted GIFI values) or /results/cells (mapped cells).
+    Filter with document_id, page, gifi_code, source, dictionary, cell_id, min_value and max_value.
+    """
+    table = {'values': 'extracted_values', 'cells': 'mapped_values'}.get(kind)
+    if not table:
+        return jsonify({'error': 'Not found'}), 404
+    results_db = get_results_db()
+    if not results_db:
+        return jsonify({'enabled': False})
+    try:
+        return jsonify(results_db.query(table, **_results_query_args(table)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/results/<kind>/aggregate', methods=['GET'])
+def results_aggregate(kind):
+    """Count, sum, min, max and average of stored amounts grouped by group_by (same filters as /results/<kind>)"""
+    table = {'values': 'extracted_values', 'cells': 'mapped_values'}.get(kind)
+    if not table:
+        return jsonify({'error': 'Not found'}), 404
+    results_db = get_results_db()
+    if not results_db:
+        return jsonify({'enabled': False})
+    default_group = 'gifi_code' if table == 'extracted_values' else 'cell_id'
+    try:
+        return jsonify(results_db.aggregate(table, request.args.get('group_by', default_group),
+                                            **_results_query_args(table)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/documents/<document_id>/profile', methods=['GET'])
+def document_profile(document_id):
+    """Return a PDF's upload-time profile (202 while it is still being computed)"""
+    profiler = get_document_profiler()
+    if not profiler:
+        return jsonify({'enabled': False})
+    if not document_id.isalnum():
+        return jsonify({'error': 'Invalid document ID'}), 400
+    profile = profiler.get(document_id)
+    if not profile:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(profile), 202 if profile['status'] == 'profiling' else 200
+
+@app.route('/documents/<document_id>/pages/<int:page_number>/thumbnail', methods=['GET'])
+def page_thumbnail(document_id, page_number):
+    """Return a page's low-resolution thumbnail from the document profile"""
+    profiler = get_document_profiler()
+    if not profiler or not document_id.isalnum():
+        return jsonify({'error': 'Thumbnail not found'}), 404
+    path = profiler.thumbnail_path(document_id, page_number)
+    if not path:
+        return jsonify({'error': 'Thumbnail not found'}), 404
+    return send_file(path, mimetype='image/jpeg', max_age=3600)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latencies, page and API counters and in-flight gauges in the Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Simple health check endpoint"""
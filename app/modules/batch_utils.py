@@ -0,0 +1,201 @@
+import os
+import logging
+import zipfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from werkzeug.utils import secure_filename
+from modules.pipeline_utils import run_pipeline, ExtractionFailedError
+from modules.csv_utils import generate_batch_csv
+
+logger = logging.getLogger(__name__)
+
+# Documents processed in parallel for one batch request (override in .env)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+
+# Largest batch request body, replacing MAX_CONTENT_LENGTH for /batch only (override in .env)
+BATCH_MAX_UPLOAD_MB = float(os.getenv("BATCH_MAX_UPLOAD_MB", "512"))
+
+# Documents accepted in one batch, counting archive members (override in .env)
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "200"))
+
+# Total uncompressed size of an archive's documents, so a small ZIP cannot fill the disk (override in .env)
+BATCH_MAX_UNCOMPRESSED_MB = float(os.getenv("BATCH_MAX_UNCOMPRESSED_MB", "2048"))
+
+
+class BatchLimitError(ValueError):
+    """Raised when a batch has too many documents or an archive expands past its size limit"""
+
+
+class _LimitedReader:
+    """Read-only wrapper that raises once more than `limit` bytes have been read"""
+
+    def __init__(self, stream, limit):
+        self._stream = stream
+        self._limit = limit
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = self._stream.read(size)
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self._limit:
+            raise BatchLimitError('Archive expands past the uncompressed size limit')
+        return chunk
+
+
+def document_filetype(filename):
+    """
+    Returns:
+        str: 'pdf' or 'docx' (also for .doc) as run_pipeline expects, or None if unsupported
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return 'pdf' if extension == 'pdf' else 'docx' if extension in ('docx', 'doc') else None
+
+
+def store_document(upload_store, stream, filename):
+    """
+    Stream one document into the upload store
+
+    Returns:
+        dict: Batch entry with filename, filetype, status ('stored' or 'skipped'), document_id and path
+    """
+    filetype = document_filetype(filename)
+    if not filetype:
+        return {'filename': filename, 'filetype': None, 'status': 'skipped', 'error': 'Unsupported file type'}
+    stored = upload_store.save(stream, filename)
+    return {'filename': filename, 'filetype': filetype, 'status': 'stored',
+            'document_id': stored['sha256'], 'path': stored['path']}
+
+
+def store_archive(archive, upload_store, max_files=None, max_uncompressed_bytes=None):
+    """
+    Store the documents in a ZIP archive one member at a time
+
+    Members are decompressed straight into the upload store, so neither the archive nor a
+    member is ever held in memory. Folders inside the archive are flattened; unsupported
+    files and members that cannot be read (e.g. encrypted) are listed as skipped.
+
+    Args:
+        archive (str or file-like): Path to the archive, or a seekable binary stream
+        upload_store (UploadStore): Where to store the documents
+        max_files (int, optional): Most documents to accept (default: BATCH_MAX_FILES)
+        max_uncompressed_bytes (int, optional): Budget for the documents' total uncompressed size
+            (default: BATCH_MAX_UNCOMPRESSED_MB)
+
+    Returns:
+        list: Batch entries (see store_document), in archive order
+
+    Raises:
+        zipfile.BadZipFile: If the file is not a ZIP archive
+        BatchLimitError: If the archive holds too many documents or expands past the size budget
+    """
+    max_files = max_files or BATCH_MAX_FILES
+    budget = max_uncompressed_bytes or int(BATCH_MAX_UNCOMPRESSED_MB * 1024 * 1024)
+    entries = []
+    with zipfile.ZipFile(archive) as zf:
+        for member in zf.infolist():
+            if member.is_dir() or member.filename.startswith('__MACOSX/'):
+                continue
+            filename = secure_filename(os.path.basename(member.filename))
+            if not filename or filename.startswith('.') or not document_filetype(filename):
+                entries.append({'filename': member.filename, 'filetype': None, 'status': 'skipped',
+                                'error': 'Unsupported file type'})
+                continue
+            if sum(entry['status'] == 'stored' for entry in entries) >= max_files:
+                raise BatchLimitError(f"Archive holds more than {max_files} documents")
+            if member.file_size > budget:
+                raise BatchLimitError('Archive expands past the uncompressed size limit')
+            try:
+                with zf.open(member) as stream:
+                    # Declared sizes can lie, so count what is actually decompressed
+                    reader = _LimitedReader(stream, budget)
+                    entries.append(store_document(upload_store, reader, filename))
+                budget -= reader.bytes_read
+            except (RuntimeError, NotImplementedError, zipfile.BadZipFile) as e:
+                entries.append({'filename': member.filename, 'filetype': None, 'status': 'skipped', 'error': str(e)})
+    logger.info(f"Stored {sum(entry['status'] == 'stored' for entry in entries)} documents from archive")
+    return entries
+
+
+def _process(entry, save_directory, pipeline_kwargs):
+    """Run the pipeline for one stored document and return its status fields"""
+    try:
+        result = run_pipeline(entry['path'], entry['filetype'], save_directory=save_directory, **pipeline_kwargs)
+        return {
+            'status': 'partial' if result['page_errors'] else 'done',
+            'pages': len(result['extracted_data']) + len(result['page_errors']),
+            'page_errors': result['page_errors'],
+            'skipped_pages': result['skipped_pages'],
+            'mapped_data': result['mapped_data'],
+            'mapped_items': len(result['mapped_data']),
+            'mapping_warnings': result['mapping_warnings'],
+            'csv_filename': result['csv_filename']
+        }
+    except ExtractionFailedError as e:
+        return {'status': 'failed', 'error': str(e), 'page_errors': e.page_errors}
+    except Exception as e:
+        logger.error(f"Batch document {entry['filename']} failed: {str(e)}")
+        return {'status': 'failed', 'error': f"{type(e).__name__}: {str(e)}"}
+
+
+def run_batch(entries, save_directory, document_workers=None, progress=None, **pipeline_kwargs):
+    """
+    Process the stored documents of a batch in parallel and combine their mapped data
+
+    Each distinct document runs through run_pipeline once, even if it was uploaded under
+    several names. A failed document does not stop the others.
+
+    Args:
+        entries (list): Batch entries from store_document / store_archive; only 'stored' ones are processed
+        save_directory (str): Where to write the per-document and combined CSVs
+        document_workers (int, optional): Documents processed in parallel (default: BATCH_WORKERS)
+        progress (callable, optional): Called as progress(state, details) with 'extracting'
+            ({'documents_total'}), 'document_done' (the document's id, filename and status fields,
+            once per distinct document, from worker threads) and 'writing' ({}); see job_utils.Job.progress
+        **pipeline_kwargs: Further run_pipeline arguments (dictionary_name, render_profile, max_workers, ...)
+
+    Returns:
+        dict: documents (entries with status, pages, page_errors, skipped_pages, mapped_items,
+              mapping_warnings, csv_filename or error), totals, and csv_filename / csv_path of the combined CSV
+    """
+    report = progress or (lambda state, details: None)
+    unique = {}
+    for entry in entries:
+        if entry['status'] == 'stored':
+            unique.setdefault(entry['document_id'], entry)
+    report('extracting', {'documents_done': 0, 'documents_total': len(unique)})
+
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=document_workers or BATCH_WORKERS, thread_name_prefix="batch") as executor:
+        futures = {
+            executor.submit(_process, entry, save_directory, pipeline_kwargs): document_id
+            for document_id, entry in unique.items()
+        }
+        for future in as_completed(futures):
+            document_id = futures[future]
+            outcomes[document_id] = future.result()
+            report('document_done', {
+                'document_id': document_id,
+                'filename': unique[document_id]['filename'],
+                **{key: value for key, value in outcomes[document_id].items() if key != 'mapped_data'}
+            })
+
+    report('writing', {})
+
+    documents = []
+    for entry in entries:
+        document = {key: value for key, value in entry.items() if key != 'path'}
+        if entry['status'] == 'stored':
+            document.update(outcomes[entry['document_id']])
+        documents.append(document)
+
+    dictionary_name = pipeline_kwargs.get('dictionary_name', 'GIFI')
+    csv_filename = f"tax_form_batch_{dictionary_name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.csv"
+    csv_path = os.path.join(save_directory, csv_filename)
+    generate_batch_csv([document for document in documents if document.get('mapped_data')], csv_path)
+    for document in documents:
+        document.pop('mapped_data', None)  # Already in the combined CSV; keeps the response small
+
+    totals = {status: sum(document['status'] == status for document in documents)
+              for status in ('done', 'partial', 'failed', 'skipped')}
+    logger.info(f"Batch complete: {totals}. Combined CSV saved to {csv_path}")
+    return {'documents': documents, 'totals': totals, 'csv_filename': csv_filename, 'csv_path': csv_path}
@@ -0,0 +1,300 @@
+import io
+import os
+import json
+import mmap
+import uuid
+import time
+import base64
+import logging
+import tempfile
+from modules.metrics_utils import record_stage
+
+logger = logging.getLogger(__name__)
+
+# Encoded page images larger than this spill from memory to an anonymous temp file (override in .env)
+PAGE_IMAGE_SPOOL_MB = float(os.getenv("PAGE_IMAGE_SPOOL_MB", "8"))
+
+# Raw bytes base64-encoded per step when streaming a request body (a multiple of 3, so chunks concatenate cleanly)
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+
+class PageImage:
+    """
+    An encoded page image held in memory.
+
+    Pages are written straight from the renderer into a BytesIO buffer; buffers that
+    grow past PAGE_IMAGE_SPOOL_MB move to an unnamed temporary file (removed by the OS
+    as soon as it is closed) and are read back through a memory map. Call close(), or
+    use the image as a context manager, when the page is no longer needed.
+
+    Args:
+        mime_type (str): MIME type of the encoded image
+        size (tuple): (width, height) in pixels
+        page_number (int, optional): PDF page the image was rendered from
+        spool_bytes (int, optional): In-memory limit before spilling to disk
+    """
+
+    def __init__(self, mime_type='image/png', size=(0, 0), page_number=None, spool_bytes=None):
+        self.mime_type = mime_type
+        self.size = tuple(size)
+        self.page_number = page_number
+        self.spool_bytes = spool_bytes if spool_bytes is not None else int(PAGE_IMAGE_SPOOL_MB * 1024 * 1024)
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._mmap = None
+        self.closed = False
+
+    @classmethod
+    def from_pil(cls, image, fmt='png', page_number=None, **save_options):
+        """
+        Encode a PIL image into a new buffer
+
+        Args:
+            image (PIL.Image.Image): Image to encode
+            fmt (str): 'png', 'jpeg' or 'webp'
+            page_number (int, optional): PDF page the image was rendered from
+            **save_options: Passed to PIL's Image.save (e.g. quality, optimize)
+
+        Returns:
+            PageImage: The encoded image
+        """
+        fmt = fmt.lower()
+        page_image = cls(f"image/{fmt}", image.size, page_number)
+        try:
+            image.save(page_image, format=fmt.upper(), **save_options)
+        except Exception:
+            page_image.close()
+            raise
+        return page_image
+
+    @classmethod
+    def from_file(cls, path, page_number=None):
+        """
+        Load an image file into a new buffer
+
+        Args:
+            path (str): Path to a PNG, JPEG or WebP file
+            page_number (int, optional): PDF page the image was rendered from
+
+        Returns:
+            PageImage: The image
+        """
+        from PIL import Image  # Pillow is installed with pdf2image
+        with Image.open(path) as image:  # Reads the header only
+            mime_type, size = Image.MIME.get(image.format, 'image/png'), image.size
+        page_image = cls(mime_type, size, page_number)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                page_image.write(chunk)
+        return page_image
+
+    @property
+    def extension(self):
+        return {'image/jpeg': '.jpg', 'image/webp': '.webp'}.get(self.mime_type, '.png')
+
+    @property
+    def format(self):
+        """PIL format name of the encoded image"""
+        return self.mime_type.split('/')[1].upper()
+
+    @property
+    def nbytes(self):
+        """Size of the encoded image in bytes"""
+        if self._file is not None:
+            return os.fstat(self._file.fileno()).st_size
+        return self._buffer.getbuffer().nbytes
+
+    @property
+    def spilled(self):
+        """True if the image lives in a temporary file rather than memory"""
+        return self._file is not None
+
+    def write(self, data):
+        """Append encoded bytes (file-like interface used by PIL's Image.save)"""
+        if self.closed:
+            raise ValueError("Page image is closed")
+        if self._file is None and self._buffer.tell() + len(data) > self.spool_bytes:
+            self._file = tempfile.TemporaryFile(prefix="page_image_")
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        return (self._file or self._buffer).write(data)
+
+    def seek(self, offset, whence=0):
+        return (self._file or self._buffer).seek(offset, whence)
+
+    def tell(self):
+        return (self._file or self._buffer).tell()
+
+    def flush(self):
+        pass
+
+    def view(self):
+        """
+        Read-only view of the encoded bytes without copying them
+
+        Use as a context manager (`with page_image.view() as data:`) so the view is
+        released before the image is closed.
+
+        Returns:
+            memoryview: The encoded image
+        """
+        if self.closed:
+            raise ValueError("Page image is closed")
+        if self._file is None:
+            return self._buffer.getbuffer().toreadonly()
+        if self._mmap is None:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def open(self):
+        """
+        Returns:
+            PIL.Image.Image: Decoded image (the caller closes it)
+        """
+        from PIL import Image  # Pillow is installed with pdf2image
+        with self.view() as data:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        return image
+
+    def copy(self):
+        """
+        Returns:
+            PageImage: An independent copy with its own lifecycle
+        """
+        duplicate = PageImage(self.mime_type, self.size, self.page_number, self.spool_bytes)
+        with self.view() as data:
+            duplicate.write(data)
+        return duplicate
+
+    def base64_length(self):
+        """Length of the base64 encoding of the image"""
+        return 4 * -(-self.nbytes // 3)
+
+    def iter_base64(self, chunk_size=BASE64_CHUNK_SIZE):
+        """
+        Base64-encode the image incrementally
+
+        Yields:
+            bytes: Consecutive pieces of the encoding
+        """
+        # Encoding is interleaved with sending, so only the encode calls are timed
+        elapsed = 0.0
+        try:
+            with self.view() as data:
+                for start in range(0, len(data), chunk_size):
+                    started = time.perf_counter()
+                    chunk = base64.b64encode(data[start:start + chunk_size])
+                    elapsed += time.perf_counter() - started
+                    yield chunk
+        finally:
+            record_stage('base64_encode', elapsed)
+
+    def close(self):
+        """Release the buffer (and the temporary file, if the image spilled to disk)"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JSONStreamBody:
+    """
+    A JSON request body whose embedded page images are base64-encoded as it is sent.
+
+    The payload may contain PageImage objects anywhere a string is expected; each is
+    written as a 'data:<mime>;base64,...' URL. Only the JSON around the images is
+    materialized up front, so a request never holds a second, base64 copy of every
+    page in memory. The body has a known length (so it is sent with Content-Length)
+    and can be rewound for retries. The images stay owned by the caller.
+
+    Args:
+        payload (dict): JSON-serializable payload, possibly containing PageImage objects
+    """
+
+    def __init__(self, payload):
+        marker = uuid.uuid4().hex
+        images = []
+
+        def placeholder(value):
+            if isinstance(value, PageImage):
+                images.append(value)
+                return f"{marker}:{len(images) - 1}"
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+        text = json.dumps(payload, default=placeholder)
+        self._segments = []
+        for i, image in enumerate(images):
+            before, text = text.split(f"{marker}:{i}", 1)
+            self._segments.append(before.encode('utf-8') + f"data:{image.mime_type};base64,".encode('ascii'))
+            self._segments.append(image)
+        self._segments.append(text.encode('utf-8'))
+        self._length = sum(len(s) if isinstance(s, bytes) else s.base64_length() for s in self._segments)
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def _iter_chunks(self):
+        for segment in self._segments:
+            if isinstance(segment, bytes):
+                yield segment
+            else:
+                yield from segment.iter_base64()
+
+    def __iter__(self):
+        self.seek(0)
+        while True:
+            chunk = self.read(BASE64_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        """Read up to size bytes of the body (all remaining bytes if size is negative)"""
+        while size < 0 or len(self._pending) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._pending += chunk
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = bytes(self._pending[:size]), self._pending[size:]
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        """Only rewinding to the start is supported"""
+        if offset != 0 or whence != 0:
+            raise io.UnsupportedOperation("JSONStreamBody can only seek to the start")
+        if getattr(self, '_chunks', None) is not None:
+            self._chunks.close()
+        self._chunks = self._iter_chunks()
+        self._pending = bytearray()
+        self._position = 0
+        return 0
+
+    def getvalue(self):
+        """Return the whole body as bytes (for logging and tests)"""
+        self.seek(0)
+        data = self.read()
+        self.seek(0)
+        return data
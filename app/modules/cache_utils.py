@@ -0,0 +1,183 @@
+import os
+import logging
+import json
+import hashlib
+import tempfile
+import threading
+from modules.metrics_utils import VISION_CACHE_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Cache settings (override in .env)
+VISION_CACHE_ENABLED = os.getenv("VISION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+VISION_CACHE_DIR = os.getenv("VISION_CACHE_DIR", os.path.join(tempfile.gettempdir(), 'tax_form_vision_cache'))
+VISION_CACHE_MAX_MB = float(os.getenv("VISION_CACHE_MAX_MB", "256"))
+
+
+def make_cache_key(content, *parts):
+    """
+    Build a content-addressed cache key
+
+    Args:
+        content (bytes): Primary content to hash (e.g., rendered page image bytes)
+        *parts: Additional values that change the result (model name, prompt, versions)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    digest.update(content)
+    for part in parts:
+        digest.update(b'\x00')
+        digest.update(str(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class VisionCache:
+    """
+    Persistent on-disk cache for vision extraction results.
+
+    Entries are JSON files named by their key. Reads refresh the file's mtime so that
+    eviction can drop the least recently used entries once max_bytes is exceeded.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+        logger.info(f"Vision cache at {cache_dir}: {self._size} bytes in use, limit {max_bytes}")
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _entries(self):
+        """Yield (path, size, mtime) for every cache entry on disk"""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key):
+        """
+        Look up a cached result
+
+        Args:
+            key (str): Cache key from make_cache_key
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            VISION_CACHE_TOTAL.inc(result='miss')
+            return None
+        with self._lock:
+            self.hits += 1
+        VISION_CACHE_TOTAL.inc(result='hit')
+        return value
+
+    def set(self, key, value):
+        """
+        Store a result, evicting least recently used entries if the cache is over its size limit
+
+        Args:
+            key (str): Cache key from make_cache_key
+            value: JSON-serializable value to store
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps(value).encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._size += len(payload) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete the oldest entries until the cache is back under 90% of its limit (lock held)"""
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            removed += 1
+        logger.info(f"Evicted {removed} vision cache entries, {self._size} bytes in use")
+
+    def clear(self):
+        """Remove every entry and reset the counters"""
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss counters and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes
+            }
+
+
+_vision_cache = None
+_vision_cache_lock = threading.Lock()
+
+
+def get_vision_cache():
+    """
+    Get the shared vision cache, creating it on first use
+
+    Returns:
+        VisionCache: The shared cache, or None if caching is disabled
+    """
+    global _vision_cache
+    if not VISION_CACHE_ENABLED:
+        return None
+    with _vision_cache_lock:
+        if _vision_cache is None:
+            _vision_cache = VisionCache(VISION_CACHE_DIR, int(VISION_CACHE_MAX_MB * 1024 * 1024))
+        return _vision_cache
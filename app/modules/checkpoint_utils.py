@@ -0,0 +1,226 @@
+import os
+import time
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from modules.openai_utils import OPENAI_MODEL, POST_PROCESS_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Page checkpoint settings (override in .env)
+PAGE_CHECKPOINT_ENABLED = os.getenv("PAGE_CHECKPOINT_ENABLED", "true").lower() in ("1", "true", "yes")
+PAGE_CHECKPOINT_DIR = os.getenv("PAGE_CHECKPOINT_DIR", os.path.join(tempfile.gettempdir(), 'tax_form_page_checkpoints'))
+
+# Checkpoints older than this are ignored and swept (override in .env)
+PAGE_CHECKPOINT_MAX_AGE_DAYS = float(os.getenv("PAGE_CHECKPOINT_MAX_AGE_DAYS", "7"))
+
+
+def extraction_options_key(**options):
+    """
+    Identify the extraction options that change a page's result (render profile, cropping, ...)
+
+    Args:
+        **options: Resolved option values; must be JSON-serializable
+
+    Returns:
+        str: Short stable key for the options
+    """
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class PageCheckpointStore:
+    """
+    Per-page extraction results saved as soon as each page finishes.
+
+    Each page is a small JSON file at <root>/<document sha256>/page_<n>.json holding
+    either the extracted data or the error from the last failed attempt, so a retried
+    document only re-extracts the pages that have not succeeded yet. A result is only
+    reused while it was produced by the same extraction version (model and
+    post-processing) and, when the caller asks for them, the same extraction options
+    (see extraction_options_key), and not after max_age_seconds.
+
+    Args:
+        root (str): Directory holding the checkpoints
+        version (str): Identifies the extraction setup; checkpoints from another version are ignored
+        max_age_seconds (float): Checkpoints older than this are ignored
+    """
+
+    def __init__(self, root, version, max_age_seconds):
+        self.root = root
+        self.version = version
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, file_hash, page_number):
+        return os.path.join(self.root, file_hash, f"page_{int(page_number)}.json")
+
+    def _write(self, file_hash, page_number, record):
+        path = self._path(file_hash, page_number)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save_result(self, file_hash, page_number, data, source, options=None):
+        """
+        Record a successfully extracted page
+
+        Args:
+            file_hash (str): SHA-256 of the document
+            page_number (int): Page number (1-based)
+            data (dict): Extracted GIFI codes and values (after post-processing)
+            source (str): 'text' or 'vision'
+            options (str, optional): extraction_options_key of the run that produced it
+        """
+        previous = self.load(file_hash, page_number, include_failed=True)
+        self._write(file_hash, page_number, {
+            'page': page_number,
+            'status': 'done',
+            'data': data,
+            'source': source,
+            'error': None,
+            'attempts': (previous or {}).get('attempts', 0) + 1,
+            'version': self.version,
+            'options': options,
+            'saved_at': time.time()
+        })
+
+    def save_failure(self, file_hash, page_number, error, options=None):
+        """
+        Record a failed attempt so it can be retried and reported later
+
+        Args:
+            file_hash (str): SHA-256 of the document
+            page_number (int): Page number (1-based)
+            error (str): Error message
+            options (str, optional): extraction_options_key of the failed run
+        """
+        previous = self.load(file_hash, page_number, include_failed=True)
+        if previous and previous['status'] == 'done':
+            return  # Never overwrite a good result with a later failure
+        self._write(file_hash, page_number, {
+            'page': page_number,
+            'status': 'failed',
+            'data': None,
+            'source': None,
+            'error': error,
+            'attempts': (previous or {}).get('attempts', 0) + 1,
+            'version': self.version,
+            'options': options,
+            'saved_at': time.time()
+        })
+
+    def load(self, file_hash, page_number, include_failed=False, options=None):
+        """
+        Args:
+            options (str, optional): Only return a checkpoint saved with these extraction options;
+                any options if None
+
+        Returns:
+            dict: The page's checkpoint, or None if there is no current one
+                  (failed attempts only with include_failed)
+        """
+        try:
+            with open(self._path(file_hash, page_number), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get('version') != self.version or time.time() - record.get('saved_at', 0) > self.max_age_seconds:
+            return None
+        if options is not None and record.get('options') != options:
+            return None
+        if record['status'] != 'done' and not include_failed:
+            return None
+        return record
+
+    def completed_pages(self, file_hash, pages, options=None):
+        """
+        Args:
+            file_hash (str): SHA-256 of the document
+            pages (list): Page numbers to look up
+            options (str, optional): Only pages extracted with these options (see load)
+
+        Returns:
+            dict: page number -> checkpoint for the pages already extracted
+        """
+        completed = {}
+        for page_number in pages:
+            record = self.load(file_hash, page_number, options=options)
+            if record:
+                completed[page_number] = record
+        return completed
+
+    def stored_pages(self, file_hash):
+        """
+        Returns:
+            list: Sorted page numbers with a checkpoint file (current or not) for the document
+        """
+        directory = os.path.join(self.root, file_hash)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            int(name[len('page_'):-len('.json')]) for name in os.listdir(directory)
+            if name.startswith('page_') and name.endswith('.json')
+        )
+
+    def document_status(self, file_hash):
+        """
+        Returns:
+            dict: 'page_<n>' -> {'status', 'source', 'error', 'attempts'} for every checkpointed page
+        """
+        status = {}
+        for page_number in self.stored_pages(file_hash):
+            record = self.load(file_hash, page_number, include_failed=True)
+            if record:
+                status[f"page_{page_number}"] = {key: record[key] for key in ('status', 'source', 'error', 'attempts')}
+        return status
+
+    def sweep(self):
+        """Delete checkpoints older than max_age_seconds"""
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        with self._lock:
+            for root, _, files in os.walk(self.root):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        if os.path.getmtime(path) < cutoff:
+                            os.remove(path)
+                            removed += 1
+                    except OSError:
+                        continue
+        if removed:
+            logger.info(f"Removed {removed} expired page checkpoints")
+        return removed
+
+
+_page_checkpoints = None
+_page_checkpoints_lock = threading.Lock()
+
+
+def get_page_checkpoints():
+    """
+    Get the shared page checkpoint store, creating it (and sweeping expired entries) on first use
+
+    Returns:
+        PageCheckpointStore: The shared store, or None if page checkpoints are disabled
+    """
+    global _page_checkpoints
+    if not PAGE_CHECKPOINT_ENABLED:
+        return None
+    with _page_checkpoints_lock:
+        if _page_checkpoints is None:
+            _page_checkpoints = PageCheckpointStore(
+                PAGE_CHECKPOINT_DIR, f"{OPENAI_MODEL}:{POST_PROCESS_VERSION}", PAGE_CHECKPOINT_MAX_AGE_DAYS * 86400
+            )
+            _page_checkpoints.sweep()
+        return _page_checkpoints
@@ -3,7 +3,7 @@ import logging
 import csv
 import tempfile
 from datetime import datetime
-import pandas as pd
+from modules.metrics_utils import span
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +21,7 @@ def generate_csv(mapped_data, save_path):
     try:
         logger.info(f"Generating CSV at: {save_path} with {len(mapped_data)} mapped items")
 
-        with open(save_path, 'w', newline='') as csvfile:
+        with span('generate_csv'), open(save_path, 'w', newline='') as csvfile:
             fieldnames = ['cell_id', 'value']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             
@@ -59,6 +59,7 @@ def generate_taxprep_csv(mapped_data, template_path=None):
         # If a template is provided, use it as a base
         if template_path and os.path.exists(template_path):
             logger.info(f"Using template: {template_path}")
+            import pandas as pd  # Import here to avoid startup cost if not used
             df = pd.read_csv(template_path)
             
             # Update values in the template
@@ -89,3 +90,59 @@ def generate_taxprep_csv(mapped_data, template_path=None):
     except Exception as e:
         logger.error(f"Error generating TaxPrep CSV: {str(e)}")
         raise
+
+
+# Columns of the batch summary, one row per document
+SUMMARY_FIELDS = ['source', 'sha256', 'status', 'pages', 'pages_failed', 'mapped_items',
+                  'mapping_warnings', 'csv_path', 'seconds', 'error']
+
+
+def generate_summary_csv(documents, save_path):
+    """
+    Write a batch summary CSV with one row per processed document
+    
+    Args:
+        documents (list): Document records (dicts); keys outside SUMMARY_FIELDS are ignored
+        save_path (str): Path where the CSV file should be saved
+    
+    Returns:
+        str: Path to the generated CSV file
+    """
+    try:
+        logger.info(f"Generating batch summary at: {save_path} for {len(documents)} documents")
+        with open(save_path, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            for document in documents:
+                writer.writerow(document)
+        return save_path
+    
+    except Exception as e:
+        logger.error(f"Error generating batch summary: {str(e)}")
+        raise
+
+
+def generate_batch_csv(documents, save_path):
+    """
+    Write the mapped data of several documents to one CSV, one row per document and cell ID
+    
+    Args:
+        documents (list): Dicts with 'filename', 'document_id' and 'mapped_data' (cell ID -> value)
+        save_path (str): Path where the CSV file should be saved
+    
+    Returns:
+        str: Path to the generated CSV file
+    """
+    try:
+        logger.info(f"Generating combined CSV at: {save_path} for {len(documents)} documents")
+        with span('generate_csv'), open(save_path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['filename', 'document_id', 'cell_id', 'value'])
+            for document in documents:
+                for cell_id, value in document['mapped_data'].items():
+                    writer.writerow([document['filename'], document['document_id'], cell_id, value])
+        return save_path
+    
+    except Exception as e:
+        logger.error(f"Error generating combined CSV: {str(e)}")
+        raise
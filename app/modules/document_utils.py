@@ -0,0 +1,321 @@
+import os
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from modules.pdf_utils import (
+    iter_pdf_images, get_poppler_path, get_render_profile, find_parenthetical_codes, evaluate_text_layer
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of parsed documents kept open at once (override in .env)
+DOCUMENT_SESSION_CACHE_SIZE = int(os.getenv("DOCUMENT_SESSION_CACHE_SIZE", "8"))
+
+# Rendered page images kept in memory per document for reuse (override in .env)
+DOCUMENT_IMAGE_CACHE_MB = float(os.getenv("DOCUMENT_IMAGE_CACHE_MB", "64"))
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-256 of a file without loading it into memory
+
+    Args:
+        path (str): Path to the file
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DocumentSession:
+    """
+    A PDF parsed once and shared by every pipeline stage.
+
+    The pdfplumber document stays open for the life of the session; page text, word
+    boxes, parenthetical flags, text-layer results and rendered images are computed on
+    first use and cached. Methods are thread-safe so concurrent vision workers can share
+    a session.
+    """
+
+    def __init__(self, pdf_path, file_hash=None):
+        self.pdf_path = pdf_path
+        self.file_hash = file_hash or hash_file(pdf_path)
+        self._lock = threading.RLock()
+        self._pdf = None
+        self._page_count = None
+        self._pages = {}
+        self._parenthetical = {}
+        self._text_layer = {}
+        self._images = OrderedDict()
+        self._image_bytes = 0
+
+    def _open(self):
+        if self._pdf is None:
+            import pdfplumber  # Import here to avoid startup cost if not used
+            self._pdf = pdfplumber.open(self.pdf_path)
+            self._page_count = len(self._pdf.pages)
+        return self._pdf
+
+    @property
+    def page_count(self):
+        """Number of pages in the document"""
+        with self._lock:
+            self._open()
+            return self._page_count
+
+    def _page(self, page_number):
+        """Parse a page's text, word boxes and character count once (lock held)"""
+        if page_number not in self._pages:
+            pdf = self._open()
+            if not 1 <= page_number <= self._page_count:
+                raise ValueError(f"Page {page_number} out of range (document has {self._page_count} pages)")
+            page = pdf.pages[page_number - 1]
+            self._pages[page_number] = {
+                'text': page.extract_text() or '',
+                'words': page.extract_words(),
+                'char_count': len(page.chars),
+                'size': (float(page.width), float(page.height))
+            }
+            if hasattr(page, 'close'):
+                page.close()  # Drop pdfplumber's per-page object cache; we keep what we need
+        return self._pages[page_number]
+
+    def page_text(self, page_number):
+        """
+        Args:
+            page_number (int): Page number (1-based)
+
+        Returns:
+            str: Text extracted from the page's text layer
+        """
+        with self._lock:
+            return self._page(page_number)['text']
+
+    def page_words(self, page_number):
+        """
+        Args:
+            page_number (int): Page number (1-based)
+
+        Returns:
+            list: pdfplumber word dicts with positions
+        """
+        with self._lock:
+            return self._page(page_number)['words']
+
+    def page_size(self, page_number):
+        """
+        Args:
+            page_number (int): Page number (1-based)
+
+        Returns:
+            tuple: (width, height) of the page in PDF points
+        """
+        with self._lock:
+            return self._page(page_number)['size']
+
+    def page_char_count(self, page_number):
+        """
+        Args:
+            page_number (int): Page number (1-based)
+
+        Returns:
+            int: Number of characters in the page's text layer (0 for scanned pages)
+        """
+        with self._lock:
+            return self._page(page_number)['char_count']
+
+    def parenthetical_flags(self, page_number=None):
+        """
+        Identify GIFI codes whose values are shown in parentheses
+
+        Args:
+            page_number (int, optional): Page number (1-based). If None, returns flags for every page.
+
+        Returns:
+            dict: GIFI code to True for one page, or page number to such a dict for all pages
+        """
+        with self._lock:
+            page_numbers = [page_number] if page_number else range(1, self.page_count + 1)
+            for number in page_numbers:
+                if number not in self._parenthetical:
+                    self._parenthetical[number] = find_parenthetical_codes(self._page(number)['text'])
+            if page_number:
+                return self._parenthetical[page_number]
+            return dict(self._parenthetical)
+
+    def text_layer_values(self, page_number):
+        """
+        Extract GIFI values from the page's text layer
+
+        Args:
+            page_number (int): Page number (1-based)
+
+        Returns:
+            tuple: (values, parenthetical_values), or None if the text layer is not usable
+        """
+        with self._lock:
+            if page_number not in self._text_layer:
+                page = self._page(page_number)
+                self._text_layer[page_number] = evaluate_text_layer(page['words'], page['char_count'], page_number)
+            return self._text_layer[page_number]
+
+    def iter_render(self, pages, profile=None):
+        """
+        Rasterize pages, yielding each one as soon as it is available
+
+        Images already rendered with the same profile are yielded first; the rest are
+        rendered in batched poppler runs and yielded as each run completes. Every yielded
+        image belongs to the caller, who must close it; the session keeps its own copies
+        (up to DOCUMENT_IMAGE_CACHE_MB per document) for later runs.
+
+        Args:
+            pages (list): Page numbers to render (1-indexed)
+            profile (str or dict, optional): Rasterization profile
+
+        Yields:
+            tuple: (page_number, PageImage)
+        """
+        profile = get_render_profile(profile)
+        profile_key = tuple(sorted((k, str(v)) for k, v in profile.items()))
+        out_of_range = [p for p in dict.fromkeys(pages) if not 1 <= p <= self.page_count]
+        if out_of_range:
+            raise ValueError(f"Invalid page selection: pages out of range: {out_of_range}")
+        with self._lock:
+            cached = []
+            for p in dict.fromkeys(pages):
+                if (profile_key, p) in self._images:
+                    self._images.move_to_end((profile_key, p))
+                    cached.append((p, self._images[(profile_key, p)].copy()))
+            missing = [p for p in dict.fromkeys(pages) if (profile_key, p) not in self._images]
+        yield from cached
+        if not missing:
+            return
+        for page_number, page_image in iter_pdf_images(self.pdf_path, missing, get_poppler_path(), profile=profile):
+            self._cache_image((profile_key, page_number), page_image)
+            yield page_number, page_image
+
+    def _cache_image(self, key, page_image):
+        """Keep a copy of a rendered page, evicting the oldest copies beyond the byte budget"""
+        budget = DOCUMENT_IMAGE_CACHE_MB * 1024 * 1024
+        if page_image.nbytes > budget:
+            return
+        with self._lock:
+            if key in self._images:
+                return
+            self._images[key] = page_image.copy()
+            self._image_bytes += page_image.nbytes
+            while self._image_bytes > budget:
+                _, old = self._images.popitem(last=False)
+                self._image_bytes -= old.nbytes
+                old.close()
+
+    def render(self, pages, profile=None):
+        """
+        Rasterize pages, reusing images already rendered with the same profile
+
+        Args:
+            pages (list): Page numbers to render (1-indexed)
+            profile (str or dict, optional): Rasterization profile
+
+        Returns:
+            list: PageImage objects in the order the pages were requested; the caller closes them
+        """
+        rendered = dict(self.iter_render(pages, profile))
+        images = []
+        for i, p in enumerate(pages):
+            # A page selected twice gets its own copy so each image can be closed independently
+            images.append(rendered[p].copy() if p in pages[:i] else rendered[p])
+        return images
+
+    def close(self):
+        """Close the PDF and release rendered images"""
+        with self._lock:
+            if self._pdf is not None:
+                self._pdf.close()
+                self._pdf = None
+            for page_image in self._images.values():
+                page_image.close()
+            self._images.clear()
+            self._image_bytes = 0
+
+
+_sessions = OrderedDict()
+_file_hashes = {}
+_sessions_lock = threading.Lock()
+
+
+def get_file_hash(path):
+    """
+    Hash a file, reusing the previous result while its size and mtime are unchanged
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    stat = os.stat(path)
+    signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _sessions_lock:
+        if signature in _file_hashes:
+            return _file_hashes[signature]
+    file_hash = hash_file(path)
+    with _sessions_lock:
+        _file_hashes[signature] = file_hash
+    return file_hash
+
+
+def register_file_hash(path, file_hash):
+    """
+    Record a hash computed elsewhere (e.g. while an upload was streamed) so the file
+    is not read again to key its document session
+
+    Args:
+        path (str): Path to the file
+        file_hash (str): Hex SHA-256 digest of its contents
+    """
+    stat = os.stat(path)
+    with _sessions_lock:
+        _file_hashes[(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)] = file_hash
+
+
+def get_document_session(pdf_path):
+    """
+    Get the shared session for a PDF, parsing it only if it is not already cached
+
+    Sessions are keyed by file hash, so the same document uploaded under a different
+    name reuses the same session. The least recently used session is closed when the
+    cache holds more than DOCUMENT_SESSION_CACHE_SIZE documents.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+
+    Returns:
+        DocumentSession: The session for this document
+    """
+    file_hash = get_file_hash(pdf_path)
+    evicted = []
+    with _sessions_lock:
+        session = _sessions.get(file_hash)
+        if session is not None and not os.path.exists(session.pdf_path):
+            evicted.append(session)  # Same content, but the original file is gone
+            session = None
+        if session is None:
+            session = DocumentSession(pdf_path, file_hash)
+            _sessions[file_hash] = session
+            logger.info(f"Opened document session for {pdf_path} ({file_hash[:12]})")
+        _sessions.move_to_end(file_hash)
+        while len(_sessions) > DOCUMENT_SESSION_CACHE_SIZE:
+            _, old = _sessions.popitem(last=False)
+            evicted.append(old)
+    for old in evicted:
+        logger.info(f"Evicting document session for {old.pdf_path}")
+        old.close()
+    return session
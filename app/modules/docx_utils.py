@@ -1,7 +1,6 @@
 import os
 import logging
 import tempfile
-from docx import Document
 import subprocess
 
 logger = logging.getLogger(__name__)
@@ -24,6 +23,7 @@ def extract_text_from_docx(docx_path):
         
         if file_ext == '.docx':
             # Use python-docx for .docx files
+            from docx import Document  # Import here to avoid startup cost if not used
             doc = Document(docx_path)
             full_text = []
             
@@ -0,0 +1,173 @@
+import os
+import logging
+from modules.document_utils import get_document_session
+from modules.image_utils import ROI_CROP_ENABLED, crop_page_image
+from modules.pdf_utils import get_render_profile
+from modules.openai_utils import VISION_PACK_SIZE, extract_pages_with_vision, post_process_gifi_values
+from modules.metrics_utils import span, PAGES_TOTAL
+from modules.checkpoint_utils import extraction_options_key, get_page_checkpoints
+from modules.profile_utils import SKIP_BLANK_PAGES, get_document_profile
+
+logger = logging.getLogger(__name__)
+
+# Read digital PDFs from their text layer instead of calling the Vision API (override in .env)
+TEXT_LAYER_ENABLED = os.getenv("TEXT_LAYER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def extract_pdf_pages(pdf_path, pages, profile=None, max_workers=None, use_text_layer=None, on_event=None,
+                      pack_size=None, crop_roi=None, resume=True):
+    """
+    Extract GIFI codes and values from the selected pages of a PDF
+
+    Pages with a usable text layer are read directly from it. Only the remaining pages
+    are rasterized and sent to the Vision API, with parenthetical flags from the text
+    layer (when present) used to restore negative values. Rendering and extraction
+    overlap: a page is sent as soon as its poppler run finishes. Rendered pages are
+    cropped to their GIFI code and value regions first (see image_utils.crop_page_image).
+    
+    With SKIP_BLANK_PAGES, pages the document profile (see profile_utils) confirmed blank are
+    skipped without an API call; they are not checkpointed, so turning skipping off extracts them.
+    Each page's result (or error) is checkpointed as soon as it finishes (see
+    checkpoint_utils). Pages already extracted for this document with the same options (render
+    profile, text layer, cropping and packing) are taken from their checkpoints, so
+    re-running after a failure only extracts the pages that failed.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        pages (list): Page numbers to extract (1-indexed)
+        profile (str or dict, optional): Rasterization profile for pages sent to vision
+        max_workers (int, optional): Maximum vision requests in flight
+        use_text_layer (bool, optional): Try the text layer first (default: TEXT_LAYER_ENABLED)
+        on_event (callable, optional): Progress callback, called as on_event(event, details) with
+            'rendering' ({'pages'}), 'page_rendered' ({'page', 'roi'}), 'page_extracted' ({'page', 'data', 'source'}) and
+            'page_failed' ({'page', 'error'}) events. Page events may come from worker threads.
+            'page_extracted' details include 'resumed': True for pages taken from a checkpoint.
+        pack_size (int, optional): Maximum pages per vision request (default: VISION_PACK_SIZE)
+        crop_roi (bool, optional): Crop rendered pages before sending them (default: ROI_CROP_ENABLED)
+        resume (bool): Reuse checkpointed page results (new results are checkpointed either way)
+
+    Returns:
+        tuple: Dictionary of 'page_<n>' keys to extracted data in page order,
+               dictionary of 'page_<n>' keys to error messages,
+               dictionary of 'page_<n>' keys to the source used ('text', 'vision' or 'blank')
+    """
+    if use_text_layer is None:
+        use_text_layer = TEXT_LAYER_ENABLED
+    if crop_roi is None:
+        crop_roi = ROI_CROP_ENABLED
+    notify = on_event or (lambda event, details: None)
+
+    session = get_document_session(pdf_path)
+    checkpoints = get_page_checkpoints()
+    options = extraction_options_key(
+        render_profile=get_render_profile(profile), use_text_layer=bool(use_text_layer), crop_roi=bool(crop_roi),
+        pack_size=max(1, pack_size or VISION_PACK_SIZE)
+    )
+    stored = checkpoints.completed_pages(session.file_hash, pages, options) if checkpoints and resume else {}
+    if stored:
+        logger.info(f"Resuming {len(stored)} of {len(pages)} pages from checkpoints")
+    # Pages the upload-time profile found blank have nothing to extract
+    document_profile = get_document_profile(session.file_hash) if SKIP_BLANK_PAGES else None
+    blank_pages = set(document_profile['blank_pages']) if document_profile else set()
+
+    def save_result(page_num, data, source):
+        if checkpoints:
+            try:
+                checkpoints.save_result(session.file_hash, page_num, data, source, options)
+            except OSError as e:
+                logger.warning(f"Could not checkpoint page {page_num}: {str(e)}")
+
+    results = {}
+    sources = {}
+    vision_pages = []
+    for page_num in pages:
+        if page_num in stored:
+            results[f'page_{page_num}'] = stored[page_num]['data']
+            sources[f'page_{page_num}'] = stored[page_num]['source']
+            notify('page_extracted', {'page': page_num, 'data': results[f'page_{page_num}'],
+                                      'source': stored[page_num]['source'], 'resumed': True})
+            continue
+        if page_num in blank_pages:
+            results[f'page_{page_num}'] = {}
+            sources[f'page_{page_num}'] = 'blank'
+            PAGES_TOTAL.inc(source='blank', outcome='skipped')
+            notify('page_extracted', {'page': page_num, 'data': {}, 'source': 'blank'})
+            continue
+        text_result = None
+        if use_text_layer:
+            with span('text_layer'):
+                text_result = session.text_layer_values(page_num)
+        if text_result is None:
+            vision_pages.append(page_num)
+            continue
+        values, parenthetical_values = text_result
+        results[f'page_{page_num}'] = post_process_gifi_values(values, parenthetical_values)
+        sources[f'page_{page_num}'] = 'text'
+        PAGES_TOTAL.inc(source='text', outcome='extracted')
+        save_result(page_num, results[f'page_{page_num}'], 'text')
+        notify('page_extracted', {'page': page_num, 'data': results[f'page_{page_num}'], 'source': 'text'})
+    logger.info(f"{len(results) - len(stored)} pages read from text layer or blank, "
+                f"{len(vision_pages)} pages need vision extraction")
+
+    page_errors = {}
+    if vision_pages:
+        notify('rendering', {'pages': vision_pages})
+
+        # In-memory page images in flight, released as soon as their page is extracted
+        images = {}
+
+        def rendered_pages():
+            # Hand each page to the vision workers as soon as its poppler run finishes
+            for page_num, page_image in session.iter_render(vision_pages, profile=profile):
+                roi = None
+                if crop_roi:
+                    page_image, roi = crop_region(page_num, page_image)
+                images[page_num] = page_image
+                notify('page_rendered', {'page': page_num, 'roi': roi})
+                yield page_num, page_image
+
+        def crop_region(page_num, page_image):
+            try:
+                with span('crop'):
+                    words = session.page_words(page_num)
+                    cropped, roi = crop_page_image(
+                        page_image, words, session.page_size(page_num), get_render_profile(profile)
+                    )
+            except Exception as e:
+                logger.warning(f"Page {page_num}: cropping failed, sending the full page: {str(e)}")
+                return page_image, None
+            if cropped is not page_image:
+                page_image.close()
+            saved = 1 - roi['cropped_pixels'] / max(1, roi['original_pixels'])
+            logger.info(f"Page {page_num}: {roi['method']} crop removed {saved:.0%} of pixels "
+                        f"({roi['original_bytes']} -> {roi['cropped_bytes']} bytes)")
+            return cropped, roi
+
+        def on_page(page_num, data, error):
+            page_image = images.pop(page_num, None)
+            if page_image:
+                page_image.close()
+            PAGES_TOTAL.inc(source='vision', outcome='failed' if error else 'extracted')
+            if error:
+                if checkpoints:
+                    try:
+                        checkpoints.save_failure(session.file_hash, page_num, error, options)
+                    except OSError as e:
+                        logger.warning(f"Could not checkpoint page {page_num}: {str(e)}")
+                notify('page_failed', {'page': page_num, 'error': error})
+            else:
+                save_result(page_num, data, 'vision')
+                notify('page_extracted', {'page': page_num, 'data': data, 'source': 'vision'})
+
+        try:
+            vision_results, page_errors = extract_pages_with_vision(
+                rendered_pages(), pdf_path=pdf_path, max_workers=max_workers, on_page=on_page, pack_size=pack_size
+            )
+        finally:
+            for page_image in images.values():
+                page_image.close()
+        results.update(vision_results)
+        sources.update({key: 'vision' for key in vision_results})
+
+    extracted = {f'page_{n}': results[f'page_{n}'] for n in pages if f'page_{n}' in results}
+    return extracted, page_errors, sources
@@ -0,0 +1,259 @@
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from modules.metrics_utils import API_REQUESTS_IN_FLIGHT, API_REQUESTS_TOTAL, API_RETRIES_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive connections held open to the API host (override in .env)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+# Seconds to wait for a vision API response (override in .env)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+
+# Retries after the first attempt for throttled or failed requests (override in .env)
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+
+# Base and ceiling for exponential backoff, in seconds (override in .env)
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "1.0"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+
+# Consecutive failures that open the circuit, and how long it stays open (override in .env)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the API has failed repeatedly and requests are being short-circuited"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling an API that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests fail
+    immediately for `reset_seconds`. The next request after that is let through as a
+    trial: success closes the circuit, failure opens it again. Throttling (429) is not
+    counted as a failure, since the API is up and telling us when to come back.
+    """
+
+    def __init__(self, failure_threshold=None, reset_seconds=None):
+        self.failure_threshold = failure_threshold or CIRCUIT_FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds if reset_seconds is not None else CIRCUIT_RESET_SECONDS
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half_open'
+        return 'open'
+
+    def before_request(self):
+        """
+        Returns:
+            bool: True if this request is the half-open trial; its outcome must be recorded
+                or the trial released
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or a half-open trial is already running
+        """
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return False
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            remaining = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(f"Vision API circuit is open after {self.failures} consecutive failures; retry in {remaining:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Vision API circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a half-open trial without an outcome (e.g. throttled), so the next request can try again"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            reopen = self._trial_in_flight
+            self._trial_in_flight = False
+            if reopen or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                logger.warning(f"Vision API circuit opened after {self.failures} consecutive failures")
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header
+
+    Args:
+        value (str): Delay in seconds or an HTTP date
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryingClient:
+    """
+    Pooled HTTP client for the vision API.
+
+    One requests.Session is shared by all worker threads so connections (and TLS
+    sessions) are kept alive between pages. Throttled (429) and transient (5xx,
+    connection error, timeout) failures are retried with exponential backoff and full
+    jitter, waiting at least as long as the server's Retry-After header asks.
+
+    Args:
+        pool_size (int): Connections kept open per host
+        max_retries (int): Retries after the first attempt
+        backoff_base (float): Backoff for the first retry, doubled each attempt
+        backoff_max (float): Upper bound on a single backoff
+        timeout (float): Default request timeout in seconds
+        breaker (CircuitBreaker, optional): Circuit breaker shared by all requests
+        sleep (callable): Used to wait between attempts (replaceable in tests)
+    """
+
+    def __init__(self, pool_size=None, max_retries=None, backoff_base=None, backoff_max=None,
+                 timeout=None, breaker=None, sleep=time.sleep):
+        self.pool_size = pool_size or HTTP_POOL_SIZE
+        self.max_retries = max_retries if max_retries is not None else HTTP_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else HTTP_BACKOFF_BASE
+        self.backoff_max = backoff_max if backoff_max is not None else HTTP_BACKOFF_MAX
+        self.timeout = timeout or HTTP_TIMEOUT
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.retries = 0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Args:
+            attempt (int): Number of the retry about to be made (0 for the first)
+            retry_after (float, optional): Delay requested by the server
+
+        Returns:
+            float: Seconds to wait before the retry
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def post(self, url, **kwargs):
+        """
+        POST with retries
+
+        Args:
+            url (str): Request URL
+            **kwargs: Passed to requests.Session.post (timeout defaults to the client's); a
+                file-like data body is rewound before every attempt
+
+        Returns:
+            requests.Response: The final response; callers should still raise_for_status()
+                to surface a non-retryable error or an exhausted retry budget
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            requests.RequestException: If the last attempt failed with a connection error or timeout
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        body = kwargs.get('data')
+        attempt = 0
+        while True:
+            trial = self.breaker.before_request()
+            retry_after = None
+            try:
+                if hasattr(body, 'seek'):
+                    body.seek(0)  # Streamed bodies are consumed by each attempt
+                try:
+                    with API_REQUESTS_IN_FLIGHT.track_inprogress():
+                        response = self.session.post(url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    API_REQUESTS_TOTAL.inc(status=type(e).__name__)
+                    self.breaker.record_failure()
+                    trial = False
+                    if attempt >= self.max_retries:
+                        raise
+                    logger.warning(f"Vision API request failed ({type(e).__name__}), retrying")
+                    API_RETRIES_TOTAL.inc(reason=type(e).__name__)
+                else:
+                    API_REQUESTS_TOTAL.inc(status=str(response.status_code))
+                    if response.status_code not in RETRY_STATUS_CODES:
+                        self.breaker.record_success()
+                        trial = False
+                        return response
+                    if response.status_code != 429:
+                        self.breaker.record_failure()
+                        trial = False
+                    if attempt >= self.max_retries:
+                        return response
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    logger.warning(f"Vision API returned {response.status_code}, retrying")
+                    API_RETRIES_TOTAL.inc(reason=str(response.status_code))
+                    response.close()
+            finally:
+                # A throttled trial or an unexpected error says nothing about the API's health;
+                # release the trial so the circuit does not stay open for good
+                if trial:
+                    self.breaker.release_trial()
+            delay = self.backoff(attempt, retry_after)
+            attempt += 1
+            self.retries += 1
+            logger.info(f"Retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            self.sleep(delay)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Get the process-wide vision API client
+
+    Returns:
+        RetryingClient: Shared client
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = RetryingClient()
+        return _client
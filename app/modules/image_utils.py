@@ -0,0 +1,156 @@
+import os
+import logging
+from modules.buffer_utils import PageImage
+from modules.pdf_utils import GIFI_CODE_PATTERN, AMOUNT_PATTERN, _split_leaders, _group_lines, _find_current_year_column
+
+logger = logging.getLogger(__name__)
+
+# Crop page images to the GIFI code and value regions before vision extraction (override in .env)
+ROI_CROP_ENABLED = os.getenv("ROI_CROP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Grayscale level below which a pixel counts as ink (override in .env)
+ROI_INK_THRESHOLD = int(os.getenv("ROI_INK_THRESHOLD", "200"))
+
+# White border kept around each crop, in PDF points (override in .env)
+ROI_PADDING_POINTS = float(os.getenv("ROI_PADDING_POINTS", "8"))
+
+# Width of the white gutter placed between the code and value column crops, in pixels
+COLUMN_GUTTER_PIXELS = 24
+
+
+def find_content_bbox(gray, threshold=None, min_ink=2):
+    """
+    Find the bounding box of the ink on a page
+
+    Rows and columns with fewer than min_ink dark pixels are treated as blank, so
+    isolated scanner specks do not stop the margins from being trimmed.
+
+    Args:
+        gray (numpy.ndarray): 2-D grayscale image
+        threshold (int, optional): Pixels darker than this are ink (default: ROI_INK_THRESHOLD)
+        min_ink (int): Dark pixels a row or column needs to count as content
+
+    Returns:
+        tuple: (left, top, right, bottom) in pixels, or None if the page is blank
+    """
+    import numpy as np  # Import here to avoid startup cost if not used
+
+    ink = gray < (threshold or ROI_INK_THRESHOLD)
+    rows = np.flatnonzero(np.count_nonzero(ink, axis=1) >= min_ink)
+    cols = np.flatnonzero(np.count_nonzero(ink, axis=0) >= min_ink)
+    if not rows.size or not cols.size:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def locate_gifi_columns(words):
+    """
+    Locate the GIFI code column and the Current Year value column from word boxes
+
+    Args:
+        words (list): pdfplumber word dicts with 'text', 'x0', 'x1', 'top' and 'bottom'
+
+    Returns:
+        list: Two (x0, top, x1, bottom) boxes in PDF points, code column first, or None
+              if the page has no Current Year header or too few code lines
+    """
+    lines = _group_lines(_split_leaders(words))
+    column = _find_current_year_column(lines)
+    if not column:
+        return None
+    header = next(line for line in lines if any(w['x0'] == column[0] for w in line))
+    center = (column[0] + column[1]) / 2
+    code_words, value_words = [], []
+    for line in lines:
+        for i, word in enumerate(line):
+            code = word['text'].strip('.:')
+            if not GIFI_CODE_PATTERN.match(code) or not 1000 <= int(code) <= 9999 or line is header:
+                continue
+            amounts = [w for w in line[i + 1:] if AMOUNT_PATTERN.match(w['text'].replace('$', ''))]
+            code_words.append(word)
+            if amounts:
+                value_words.append(min(amounts, key=lambda w: abs((w['x0'] + w['x1']) / 2 - center)))
+            break
+    if len(code_words) < 2:
+        return None
+    top = min(w['top'] for w in header)
+    bottom = max(w.get('bottom', w['top'] + 10) for w in code_words + value_words)
+    code_box = (min(w['x0'] for w in code_words), top, max(w['x1'] for w in code_words), bottom)
+    value_box = (min([column[0]] + [w['x0'] for w in value_words]), top,
+                 max([column[1]] + [w['x1'] for w in value_words]), bottom)
+    if code_box[2] >= value_box[0]:
+        return None  # Columns overlap; cropping would gain nothing
+    return [code_box, value_box]
+
+
+def crop_page_image(page_image, words=None, page_size=None, profile=None):
+    """
+    Crop a rendered page to the regions the vision model needs
+
+    With word boxes from a text layer, the GIFI code column and the Current Year value
+    column are cut out (header row included) and placed side by side, dropping the
+    margins, descriptions and prior-year column. Otherwise the page is trimmed to the
+    bounding box of its ink. The crop is encoded into a new in-memory image.
+
+    Args:
+        page_image (PageImage): Rendered page
+        words (list, optional): pdfplumber word dicts for the page
+        page_size (tuple, optional): (width, height) of the PDF page in points; required with words
+        profile (dict, optional): Render profile, for the output quality setting
+
+    Returns:
+        tuple: PageImage to send (page_image itself if nothing could be trimmed, otherwise a
+               new image the caller closes), dictionary with 'method', pixel and byte counts
+               before and after
+    """
+    import numpy as np
+    from PIL import Image  # Pillow is installed with pdf2image
+
+    with page_image.open() as image:
+        fmt = page_image.format
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        pixels = np.asarray(image)
+        gray = pixels if image.mode == 'L' else np.asarray(image.convert('L'))
+    height, width = gray.shape
+    # Pixels per PDF point: from the page size when known, else the profile's DPI
+    scale = width / page_size[0] if page_size else (profile or {}).get('dpi', 300) / 72
+    stats = {
+        'method': 'none',
+        'original_pixels': width * height,
+        'cropped_pixels': width * height,
+        'original_bytes': page_image.nbytes,
+        'cropped_bytes': page_image.nbytes
+    }
+
+    boxes = locate_gifi_columns(words) if words and page_size else None
+    pad = ROI_PADDING_POINTS
+    if boxes:
+        crops = []
+        for x0, top, x1, bottom in boxes:
+            left, right = max(0, int((x0 - pad) * scale)), min(width, int((x1 + pad) * scale) + 1)
+            upper, lower = max(0, int((top - pad) * scale)), min(height, int((bottom + pad) * scale) + 1)
+            crops.append(pixels[upper:lower, left:right])
+        gutter = np.full((crops[0].shape[0], COLUMN_GUTTER_PIXELS) + pixels.shape[2:], 255, dtype=pixels.dtype)
+        cropped = np.hstack([crops[0], gutter, crops[1]])
+        stats['method'] = 'columns'
+    else:
+        bbox = find_content_bbox(gray)
+        if bbox:
+            left, top, right, bottom = bbox
+            left, top = max(0, left - int(pad * scale)), max(0, top - int(pad * scale))
+            right, bottom = min(width, right + int(pad * scale)), min(height, bottom + int(pad * scale))
+            if (right - left) * (bottom - top) < width * height:
+                cropped = pixels[top:bottom, left:right]
+                stats['method'] = 'trim'
+
+    if stats['method'] == 'none':
+        return page_image, stats
+
+    save_options = {'optimize': True}
+    if profile and profile.get('quality') and fmt in ('JPEG', 'WEBP'):
+        save_options['quality'] = profile['quality']
+    cropped_image = PageImage.from_pil(Image.fromarray(cropped), fmt, page_image.page_number, **save_options)
+    stats['cropped_pixels'] = int(cropped.shape[0] * cropped.shape[1])
+    stats['cropped_bytes'] = cropped_image.nbytes
+    return cropped_image, stats
@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Background pipeline workers per web process (override in .env)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Finished jobs are forgotten after this many seconds (override in .env)
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+# Job states, in the order a successful job passes through them
+JOB_STATES = ('queued', 'rendering', 'extracting', 'mapping', 'writing', 'done', 'failed')
+
+
+class Job:
+    """State of one background pipeline run"""
+
+    def __init__(self, params=None):
+        self.id = uuid.uuid4().hex
+        self.params = params or {}
+        self.state = 'queued'
+        self.pages_done = 0
+        self.pages_total = 0
+        self.documents_done = 0
+        self.documents_total = 0
+        self.result = None
+        self.error = None
+        self.error_details = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.events = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed')
+
+    def _emit(self, event, data):
+        """Append to the event log and wake streaming clients (lock held)"""
+        self.events.append({'id': len(self.events) + 1, 'event': event, 'data': data})
+        self._changed.notify_all()
+
+    def _state_event(self):
+        return {
+            'state': self.state,
+            'message': self.message(),
+            'pages_done': self.pages_done,
+            'pages_total': self.pages_total,
+            'documents_done': self.documents_done,
+            'documents_total': self.documents_total
+        }
+
+    def update(self, state=None, **fields):
+        with self._lock:
+            if state:
+                self.state = state
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+            if state == 'done':
+                self._emit('done', {**self._state_event(), 'result': self.result})
+            elif state == 'failed':
+                self._emit('failed', {**self._state_event(), 'error': self.error, 'error_details': self.error_details})
+            else:
+                self._emit('state', self._state_event())
+
+    def progress(self, state, details):
+        """Pipeline progress callback (see pipeline_utils.run_pipeline and batch_utils.run_batch)"""
+        if state in ('page_extracted', 'page_failed'):
+            with self._lock:
+                self.pages_done += 1
+                if self.state == 'rendering':
+                    self.state = 'extracting'
+                self.updated_at = time.time()
+                self._emit(state, {**details, **self._state_event()})
+        elif state == 'page_rendered':
+            with self._lock:
+                if self.state == 'rendering':
+                    self.state = 'extracting'
+                self._emit(state, {**details, **self._state_event()})
+        elif state == 'document_done':
+            with self._lock:
+                self.documents_done += 1
+                self.updated_at = time.time()
+                self._emit(state, {**details, **self._state_event()})
+        elif state in JOB_STATES:
+            fields = {k: v for k, v in details.items()
+                      if k in ('pages_done', 'pages_total', 'documents_done', 'documents_total')}
+            self.update(state, **fields)
+
+    def wait_for_events(self, after=0, timeout=15):
+        """
+        Block until the job has events newer than `after`
+
+        Args:
+            after (int): ID of the last event the caller has seen
+            timeout (float): Seconds to wait before returning an empty list
+
+        Returns:
+            list: Events with id greater than `after`
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > after or self.finished, timeout=timeout)
+            return self.events[after:]
+
+    def stream_events(self, after=0, keep_alive=15):
+        """
+        Server-Sent Events for the job, ending after its final event
+
+        Args:
+            after (int): ID of the last event the client has seen (Last-Event-ID)
+            keep_alive (float): Seconds without events before a keep-alive comment is sent
+
+        Yields:
+            str: SSE messages
+        """
+        seen = after
+        while True:
+            events = self.wait_for_events(after=seen, timeout=keep_alive)
+            if not events:
+                if self.finished:
+                    return  # Reconnected after the final event; nothing more will come
+                yield ': keep-alive\n\n'
+                continue
+            for event in events:
+                seen = event['id']
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+                if event['event'] in ('done', 'failed'):
+                    return
+
+    def message(self):
+        if self.state == 'extracting' and self.documents_total:
+            return f"Processed {self.documents_done}/{self.documents_total} documents"
+        if self.state == 'extracting' and self.pages_total:
+            return f"Extracting page {min(self.pages_done + 1, self.pages_total)}/{self.pages_total}"
+        return {
+            'queued': 'Waiting for a worker',
+            'rendering': 'Rendering pages',
+            'extracting': 'Extracting data',
+            'mapping': 'Mapping to cell IDs',
+            'writing': 'Writing CSV',
+            'done': 'Processing complete',
+            'failed': 'Processing failed'
+        }.get(self.state, self.state)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'state': self.state,
+                'message': self.message(),
+                'pages_done': self.pages_done,
+                'pages_total': self.pages_total,
+                'documents_done': self.documents_done,
+                'documents_total': self.documents_total,
+                'result': self.result,
+                'error': self.error,
+                'error_details': self.error_details,
+                'created_at': self.created_at,
+                'updated_at': self.updated_at
+            }
+
+
+class JobManager:
+    """
+    Runs pipeline jobs on a background thread pool and tracks their state.
+
+    Jobs live in memory, so state is only visible to the web process that accepted the
+    job. Finished jobs are dropped JOB_RETENTION_SECONDS after they complete.
+    """
+
+    def __init__(self, max_workers=None, retention_seconds=None):
+        self.max_workers = max_workers or JOB_WORKERS
+        self.retention_seconds = retention_seconds if retention_seconds is not None else JOB_RETENTION_SECONDS
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, params=None, **kwargs):
+        """
+        Queue a job
+
+        Args:
+            func (callable): Pipeline function; called as func(progress=job.progress, **kwargs)
+                and must return a JSON-serializable result
+            params (dict, optional): Request parameters to keep with the job
+            **kwargs: Arguments for func
+
+        Returns:
+            Job: The queued job
+        """
+        self._prune()
+        job = Job(params)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, kwargs)
+        logger.info(f"Queued job {job.id}")
+        return job
+
+    def _run(self, job, func, kwargs):
+        job.update('extracting')
+        try:
+            result = func(progress=job.progress, **kwargs)
+            job.update('done', result=result)
+            logger.info(f"Job {job.id} finished")
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            job.update('failed', error=str(e), error_details=getattr(e, 'page_errors', None))
+
+    def get(self, job_id):
+        """
+        Args:
+            job_id (str): ID returned by submit
+
+        Returns:
+            Job: The job, or None if it is unknown or expired
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.updated_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of tracked jobs per state
+        """
+        with self._lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job.state] += 1
+            return counts
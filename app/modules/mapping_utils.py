@@ -1,8 +1,10 @@
 import os
 import logging
-import pandas as pd
+import hashlib
+import threading
 import json
 from pathlib import Path
+from modules.metrics_utils import span
 
 logger = logging.getLogger(__name__)
 
@@ -12,20 +14,146 @@ SAFE_LIST_CODES = {
     '8089', '8299', '8518', '8519', '9367', '9368', '9369', '9970', '9998', '9999'
 }
 
+MAPPING_DIR = Path(__file__).parent.parent / "mapping"
+
+# Compiled copy of each mapping written next to its XLSX so later processes skip Excel parsing
+SIDECAR_SUFFIX = ".index.json"
+
+# Bump when the compiled sidecar format changes
+SIDECAR_VERSION = 1
+
+# In-memory registry of compiled mappings: name -> {'path', 'mtime_ns', 'size', 'sha256', 'mapping', 'description'}
+_registry = {}
+_registry_lock = threading.RLock()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _parse_mapping_xlsx(xlsx_path):
+    """Read a mapping workbook into a code -> cell ID dictionary"""
+    import pandas as pd  # Import here to avoid startup cost; only needed when a workbook is (re)compiled
+
+    df = pd.read_excel(xlsx_path)
+    # Validate columns (expect at least two columns)
+    if df.shape[1] < 2:
+        raise ValueError(f"Mapping file {xlsx_path} must have at least two columns (Cell ID, Code)")
+    pairs = df.iloc[:, :2].dropna()
+    return {str(code): str(cell_id) for cell_id, code in zip(pairs.iloc[:, 0], pairs.iloc[:, 1])}
+
+
+def _read_description(xlsx_path):
+    """Read the optional companion description file (e.g., GIFI_map.txt)"""
+    desc_path = xlsx_path.with_suffix('.txt')
+    if desc_path.exists():
+        with open(desc_path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    return ''
+
+
+def _compile_mapping(name, xlsx_path, stat):
+    """Load a mapping from its sidecar if it matches the XLSX, otherwise parse the XLSX and rewrite the sidecar"""
+    sha256 = _file_sha256(xlsx_path)
+    previous = _registry.get(name)
+    if previous and previous['sha256'] == sha256:
+        # Touched but unchanged: keep the compiled mapping
+        return {**previous, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'description': _read_description(xlsx_path)}
+
+    sidecar_path = xlsx_path.with_name(xlsx_path.stem + SIDECAR_SUFFIX)
+    mapping = None
+    if sidecar_path.exists():
+        try:
+            with open(sidecar_path, 'r', encoding='utf-8') as f:
+                sidecar = json.load(f)
+            if sidecar.get('version') == SIDECAR_VERSION and sidecar.get('source_sha256') == sha256:
+                mapping = sidecar['mapping']
+                logger.info(f"Loaded {len(mapping)} mappings from sidecar {sidecar_path}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable mapping sidecar {sidecar_path}: {str(e)}")
+
+    if mapping is None:
+        mapping = _parse_mapping_xlsx(xlsx_path)
+        logger.info(f"Loaded {len(mapping)} mappings from {xlsx_path}")
+        try:
+            tmp_path = sidecar_path.with_name(sidecar_path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': SIDECAR_VERSION, 'source_sha256': sha256, 'mapping': mapping}, f)
+            os.replace(tmp_path, sidecar_path)
+        except OSError as e:
+            logger.warning(f"Could not write mapping sidecar {sidecar_path}: {str(e)}")
+
+    return {
+        'path': xlsx_path,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': sha256,
+        'mapping': mapping,
+        'description': _read_description(xlsx_path)
+    }
+
+
+def get_mapping_entry(dictionary_name):
+    """
+    Get a compiled mapping from the registry, recompiling it only if its XLSX changed
+    Args:
+        dictionary_name (str): Name of the mapping (case-insensitive, e.g., 'GIFI')
+    Returns:
+        dict: Registry entry with 'path', 'sha256', 'mapping' (code -> cell ID) and 'description'
+    Raises:
+        FileNotFoundError: If mapping file does not exist
+        ValueError: If required columns are missing
+    """
+    name = dictionary_name.upper()
+    xlsx_path = MAPPING_DIR / f"{name}_map.xlsx"
+    with _registry_lock:
+        try:
+            stat = xlsx_path.stat()
+        except FileNotFoundError:
+            _registry.pop(name, None)
+            raise FileNotFoundError(f"Mapping file not found: {xlsx_path}")
+        entry = _registry.get(name)
+        if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry
+        entry = _compile_mapping(name, xlsx_path, stat)
+        _registry[name] = entry
+        return entry
+
+
 def list_available_mappings():
     """
     List all available mapping Excel files in the mapping directory.
+    Mappings that cannot be compiled are logged and left out.
     Returns:
         dict: Dictionary of mapping name (without _map.xlsx) to file path
     """
-    mapping_dir = Path(__file__).parent.parent / "mapping"
     mapping_files = {}
-    for file in mapping_dir.glob("*_map.xlsx"):
+    for file in sorted(MAPPING_DIR.glob("*_map.xlsx")):
         name = file.stem.replace('_map', '')
-        mapping_files[name] = file
+        try:
+            mapping_files[name] = get_mapping_entry(name)['path']
+        except (ValueError, OSError) as e:
+            logger.warning(f"Skipping mapping {file}: {str(e)}")
+    with _registry_lock:
+        for name in set(_registry) - {n.upper() for n in mapping_files}:
+            del _registry[name]
     return mapping_files
 
 
+def get_mapping_description(dictionary_name):
+    """
+    Args:
+        dictionary_name (str): Name of the mapping (e.g., 'GIFI')
+    Returns:
+        str: Text of the companion description file, or '' if there is none
+    """
+    return get_mapping_entry(dictionary_name)['description']
+
+
 def load_mapping(dictionary_name):
     """
     Load a mapping dictionary from the mapping directory by name (e.g., 'GIFI', 'T2S1', 'T661')
@@ -37,22 +165,8 @@ def load_mapping(dictionary_name):
         FileNotFoundError: If mapping file does not exist
         ValueError: If required columns are missing
     """
-    mapping_dir = Path(__file__).parent.parent / "mapping"
-    xlsx_path = mapping_dir / f"{dictionary_name.upper()}_map.xlsx"
-    if not xlsx_path.exists():
-        raise FileNotFoundError(f"Mapping file not found: {xlsx_path}")
-    df = pd.read_excel(xlsx_path)
-    # Validate columns (expect at least two columns)
-    if df.shape[1] < 2:
-        raise ValueError(f"Mapping file {xlsx_path} must have at least two columns (Cell ID, Code)")
-    mapping = {}
-    for _, row in df.iterrows():
-        cell_id = row.iloc[0]
-        code = row.iloc[1]
-        if pd.notna(cell_id) and pd.notna(code):
-            mapping[str(code)] = str(cell_id)
-    logger.info(f"Loaded {len(mapping)} mappings from {xlsx_path}")
-    return mapping
+    with span('load_mapping'):
+        return dict(get_mapping_entry(dictionary_name)['mapping'])
 
 
 def map_extracted_data_to_cell_ids(extracted_data, dictionary_name="GIFI"):
@@ -66,50 +180,63 @@ def map_extracted_data_to_cell_ids(extracted_data, dictionary_name="GIFI"):
     """
     try:
         logger.info(f"Mapping {len(extracted_data)} extracted items to cell IDs using {dictionary_name} dictionary")
-        mapping_dict = load_mapping(dictionary_name)
+        with span('load_mapping'):
+            mapping_dict = get_mapping_entry(dictionary_name)['mapping']
         mapped = {}
         mapping_warnings = []
-        for code, value in extracted_data.items():
-            code_str = str(code).strip()
-            cell_id = mapping_dict.get(code_str)
-            if cell_id:
-                mapped[cell_id] = value
-            elif code_str in SAFE_LIST_CODES:
-                continue
-            else:
-                mapping_warnings.append(f"Code {code_str} not found in {dictionary_name} mapping.")
+        with span('map_cells'):
+            for code, value in extracted_data.items():
+                code_str = str(code).strip()
+                cell_id = mapping_dict.get(code_str)
+                if cell_id:
+                    mapped[cell_id] = value
+                elif code_str in SAFE_LIST_CODES:
+                    continue
+                else:
+                    mapping_warnings.append(f"Code {code_str} not found in {dictionary_name} mapping.")
         return mapped, mapping_warnings
     except Exception as e:
         logger.error(f"Error mapping extracted data: {str(e)}")
         raise
 
 
-def convert_gifi_map_to_json():
+def convert_mapping_to_json(dictionary_name):
     """
-    Convert the GIFI mapping from XLSX to JSON format
+    Convert a mapping from XLSX to a plain code -> cell ID JSON file
+    
+    Args:
+        dictionary_name (str): Name of the mapping (e.g., 'GIFI')
     
     Returns:
         str: Path to the generated JSON file
     """
     try:
-        # Load the mapping
-        gifi_map = load_mapping('GIFI')
+        mapping = get_mapping_entry(dictionary_name)['mapping']
         
         # Define the output path
-        mapping_dir = Path(__file__).parent.parent / "mapping"
-        json_path = mapping_dir / "GIFI_map.json"
+        json_path = MAPPING_DIR / f"{dictionary_name.upper()}_map.json"
         
         # Write to JSON file
         with open(json_path, 'w') as f:
-            json.dump(gifi_map, f, indent=4)
+            json.dump(mapping, f, indent=4)
         
-        logger.info(f"GIFI mapping converted to JSON: {json_path}")
+        logger.info(f"{dictionary_name} mapping converted to JSON: {json_path}")
         return str(json_path)
     
     except Exception as e:
-        logger.error(f"Error converting GIFI mapping to JSON: {str(e)}")
+        logger.error(f"Error converting {dictionary_name} mapping to JSON: {str(e)}")
         raise
 
 
+def convert_gifi_map_to_json():
+    """
+    Convert the GIFI mapping from XLSX to JSON format
+    
+    Returns:
+        str: Path to the generated JSON file
+    """
+    return convert_mapping_to_json('GIFI')
+
+
 # For backward compatibility
 load_gifi_map = lambda: load_mapping('GIFI')
@@ -0,0 +1,222 @@
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond parsing up to slow vision calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_metrics = []
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base for metrics with optional labels, rendered in the Prometheus text format"""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}"]
+
+    def value(self, **labels):
+        """Current value for a label set (for tests and JSON endpoints)"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. work in flight"""
+
+    type_name = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """Increment for the duration of the block"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, amount, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + amount)
+
+    def value(self, **labels):
+        """(count, sum) for a label set"""
+        with self._lock:
+            counts, total = self._values.get(self._key(labels), ([0] * len(self.buckets), 0.0))
+            return counts[-1], total
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines = [
+            f"{self.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {count}"
+            for bound, count in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {counts[-1]}")
+        return lines
+
+
+def render_metrics():
+    """
+    Returns:
+        str: Every registered metric in the Prometheus text exposition format
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+STAGE_SECONDS = Histogram('taxform_stage_duration_seconds', 'Time spent in each pipeline stage', ['stage'])
+HTTP_REQUEST_SECONDS = Histogram('taxform_http_request_duration_seconds', 'Flask request latency', ['endpoint', 'method', 'status'])
+HTTP_REQUESTS_IN_FLIGHT = Gauge('taxform_http_requests_in_flight', 'Flask requests being handled')
+PIPELINES_IN_FLIGHT = Gauge('taxform_pipelines_in_flight', 'Documents being processed')
+API_REQUESTS_IN_FLIGHT = Gauge('taxform_api_requests_in_flight', 'Vision API requests awaiting a response')
+PAGES_TOTAL = Counter('taxform_pages_total', 'Pages processed, by extraction source and outcome', ['source', 'outcome'])
+VISION_CACHE_TOTAL = Counter('taxform_vision_cache_lookups_total', 'Vision cache lookups', ['result'])
+API_REQUESTS_TOTAL = Counter('taxform_api_requests_total', 'Vision API responses by HTTP status', ['status'])
+API_RETRIES_TOTAL = Counter('taxform_api_retries_total', 'Vision API retries', ['reason'])
+API_BYTES_TOTAL = Counter('taxform_api_bytes_total', 'Bytes exchanged with the vision API', ['direction'])
+API_TOKENS_TOTAL = Counter('taxform_api_tokens_total', 'Tokens reported by the vision API', ['kind'])
+
+
+# Per-request timing breakdown: stage -> {'count', 'seconds'}; None when not collecting
+_timings = contextvars.ContextVar('timings', default=None)
+_timings_lock = threading.Lock()
+
+
+def record_stage(stage, seconds):
+    """
+    Record time spent in a stage: observed in STAGE_SECONDS and, if the current request
+    is collecting a breakdown, added to it
+
+    Args:
+        stage (str): Stage name
+        seconds (float): Elapsed time
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _timings.get()
+    if timings is not None:
+        with _timings_lock:
+            entry = timings.setdefault(stage, {'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a block of work as one pipeline stage
+
+    Args:
+        stage (str): Stage name (e.g. 'render', 'vision_request', 'generate_csv')
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collect a per-stage timing breakdown for the work done inside the block
+
+    Worker threads contribute when they are started with a copy of this context
+    (contextvars.copy_context().run). Stage times are summed across threads, so
+    concurrent stages can add up to more than the wall-clock total.
+
+    Yields:
+        dict: Filled in as stages complete; 'total' is added when the block exits
+    """
+    timings = {}
+    token = _timings.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+        with _timings_lock:
+            timings['total'] = {'count': 1, 'seconds': time.perf_counter() - start}
@@ -1,10 +1,15 @@
 import os
 import logging
-import base64
-import requests
 import json
+import math
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from modules.pdf_utils import extract_parenthetical_values
+from modules.document_utils import get_document_session
+from modules.cache_utils import get_vision_cache, make_cache_key
+from modules.http_utils import get_http_client
+from modules.buffer_utils import PageImage, JSONStreamBody
+from modules.metrics_utils import span, API_BYTES_TOTAL, API_TOKENS_TOTAL
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,6 +19,60 @@ logger = logging.getLogger(__name__)
 # Get API key from environment variable
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Chat completions endpoint (override in .env, e.g. to point at a proxy or a local fake for benchmarks)
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+
+# Vision model used for extraction (override in .env)
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+
+# Bump when response parsing or post-processing changes so cached extractions are not reused
+POST_PROCESS_VERSION = 1
+
+SYSTEM_PROMPT = """You are an expert at extracting GIFI codes and their corresponding values from tax form images. Follow these rules:
+                1. Only extract GIFI codes and their corresponding values from the "Current Year" column
+                2. Return values as strings without currency symbols or commas
+                3. For values in parentheses, remove the parentheses but keep the value positive - we'll handle negatives in post-processing
+                4. Ignore any text that isn't a GIFI code and its value
+                5. If a value appears to be zero, return "0"
+                6. Format the response as a JSON object with GIFI codes as keys and values as strings
+                7. Only include entries where you are confident in both the GIFI code and value
+                8. Do not include any explanatory text in your response, just the JSON
+                Example response:
+                {
+                    "1000": "123456",
+                    "2599": "0"
+                }"""
+
+USER_PROMPT = "Extract the GIFI codes and values from this tax form image:"
+
+# Maximum number of vision requests in flight at once for a single document
+VISION_MAX_CONCURRENCY = int(os.getenv("VISION_MAX_CONCURRENCY", "4"))
+
+# Pages sent together in one vision request; 1 sends each page on its own (override in .env)
+VISION_PACK_SIZE = int(os.getenv("VISION_PACK_SIZE", "1"))
+
+# Image prompt tokens allowed in one packed request (override in .env)
+VISION_PACK_TOKEN_BUDGET = int(os.getenv("VISION_PACK_TOKEN_BUDGET", "4000"))
+
+# Prompts for packed requests: several labelled page images in, one JSON object per page out
+PACKED_SYSTEM_PROMPT = """You are an expert at extracting GIFI codes and their corresponding values from tax form images. You will be given several pages, each image preceded by its page label. Follow these rules for every page:
+                1. Only extract GIFI codes and their corresponding values from the "Current Year" column
+                2. Return values as strings without currency symbols or commas
+                3. For values in parentheses, remove the parentheses but keep the value positive - we'll handle negatives in post-processing
+                4. Ignore any text that isn't a GIFI code and its value
+                5. If a value appears to be zero, return "0"
+                6. Format the response as a JSON object keyed by page label; each value is an object with GIFI codes as keys and values as strings
+                7. Include every page label, with an empty object for pages without GIFI codes
+                8. Only include entries where you are confident in both the GIFI code and value
+                9. Do not include any explanatory text in your response, just the JSON
+                Example response:
+                {
+                    "page_3": {"1000": "123456", "2599": "0"},
+                    "page_4": {}
+                }"""
+
+PACKED_USER_PROMPT = "Extract the GIFI codes and values from each of these {count} tax form pages:"
+
 def post_process_gifi_values(data, parenthetical_values):
     """
     Post-process extracted GIFI values
@@ -61,108 +120,359 @@ def post_process_gifi_values(data, parenthetical_values):
     
     return processed
 
-def extract_data_with_vision(image_path, pdf_path=None, page_number=1):
+def _request_completion(messages, max_tokens):
+    """
+    Send a chat completion request and parse the JSON object in the reply
+    
+    Args:
+        messages (list): Chat messages; image URLs may be PageImage objects
+        max_tokens (int): Completion token limit
+        
+    Returns:
+        dict: Parsed JSON from the model's reply
+    """
+    # Images are base64-encoded into the body as it is sent rather than up front
+    body = JSONStreamBody({
+        "model": OPENAI_MODEL,
+        "messages": messages,
+        "max_tokens": max_tokens
+    })
+    
+    # Make the API request over the shared keep-alive pool, retrying throttled calls
+    with span('vision_request'):
+        response = get_http_client().post(
+            OPENAI_API_URL,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"
+            },
+            data=body
+        )
+    API_BYTES_TOTAL.inc(len(body), direction='sent')
+    API_BYTES_TOTAL.inc(len(response.content), direction='received')
+    
+    # Check for errors
+    response.raise_for_status()
+    
+    # Parse the response
+    try:
+        with span('parse_response'):
+            reply = response.json()
+            usage = reply.get("usage") or {}
+            API_TOKENS_TOTAL.inc(usage.get("prompt_tokens", 0), kind="prompt")
+            API_TOKENS_TOTAL.inc(usage.get("completion_tokens", 0), kind="completion")
+            content = reply["choices"][0]["message"]["content"]
+            
+            # Handle case where JSON is wrapped in markdown code blocks
+            if content.startswith("```") and "```" in content:
+                # Extract JSON from markdown code block
+                content = content.split("```")[1]
+                if content.startswith("json\n"):
+                    content = content[5:]  # Remove "json\n" prefix
+                elif content.startswith("json"):
+                    content = content[4:]  # Remove "json" prefix
+            
+            return json.loads(content)
+        
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse API response as JSON: {str(e)}")
+        logger.error(f"Raw response: {content}")
+        raise
+        
+    except KeyError as e:
+        logger.error(f"Unexpected API response format: {str(e)}")
+        logger.error(f"Response: {response.json()}")
+        raise
+
+def _image_part(page_image):
+    """Build an image_url message part; the data URL is written when the request body is streamed"""
+    return {"type": "image_url", "image_url": {"url": page_image}}
+
+def _as_page_image(image, page_number=None):
+    """
+    Returns:
+        tuple: (PageImage, True if it was loaded here from a path and must be closed by the caller)
+    """
+    if isinstance(image, PageImage):
+        return image, False
+    return PageImage.from_file(image, page_number), True
+
+def extract_data_with_vision(image, pdf_path=None, page_number=1):
     """
     Extract GIFI codes and values from an image using OpenAI's Vision API
     
     Args:
-        image_path (str): Path to the image file
+        image (PageImage or str): Rendered page, or path to an image file
         pdf_path (str, optional): Path to the original PDF file, used for text extraction
         page_number (int, optional): Page number in PDF to extract from (1-based)
         
     Returns:
         dict: Dictionary mapping GIFI codes to their values
     """
+    page_image, owned = None, False
     try:
-        logger.info(f"Extracting data from image: {image_path}")
+        logger.info(f"Extracting data from image: page {page_number}")
         
         # Get parenthetical values from PDF if available
         parenthetical_values = {}
         if pdf_path:
-            parenthetical_values = extract_parenthetical_values(pdf_path, page_number)
+            parenthetical_values = get_document_session(pdf_path).parenthetical_flags(page_number)
             logger.info(f"Found {len(parenthetical_values)} parenthetical values")
         
-        # Read and encode the image
-        with open(image_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode('utf-8')
+        page_image, owned = _as_page_image(image, page_number)
+        
+        # Reuse a previous extraction of the same image, model and prompt
+        cache = get_vision_cache()
+        cache_key = None
+        if cache:
+            with page_image.view() as image_bytes:
+                cache_key = make_cache_key(image_bytes, OPENAI_MODEL, SYSTEM_PROMPT, USER_PROMPT, POST_PROCESS_VERSION)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                processed_data = post_process_gifi_values(cached, parenthetical_values)
+                logger.info(f"Vision cache hit for page {page_number} ({len(processed_data)} items)")
+                return processed_data
         
         # Prepare the messages for the API
         messages = [
-            {
-                "role": "system",
-                "content": """You are an expert at extracting GIFI codes and their corresponding values from tax form images. Follow these rules:
-                1. Only extract GIFI codes and their corresponding values from the "Current Year" column
-                2. Return values as strings without currency symbols or commas
-                3. For values in parentheses, remove the parentheses but keep the value positive - we'll handle negatives in post-processing
-                4. Ignore any text that isn't a GIFI code and its value
-                5. If a value appears to be zero, return "0"
-                6. Format the response as a JSON object with GIFI codes as keys and values as strings
-                7. Only include entries where you are confident in both the GIFI code and value
-                8. Do not include any explanatory text in your response, just the JSON
-                Example response:
-                {
-                    "1000": "123456",
-                    "2599": "0"
-                }"""
-            },
+            {"role": "system", "content": SYSTEM_PROMPT},
             {
                 "role": "user",
                 "content": [
-                    {"type": "text", "text": "Extract the GIFI codes and values from this tax form image:"},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_data}"}}
+                    {"type": "text", "text": USER_PROMPT},
+                    _image_part(page_image)
                 ]
             }
         ]
         
-        # Make the API request
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"
-            },
-            json={
-                "model": "gpt-4o",
-                "messages": messages,
-                "max_tokens": 1000
-            },
-            timeout=30
-        )
+        data = _request_completion(messages, max_tokens=1000)
+        if cache:
+            cache.set(cache_key, data)
         
-        # Check for errors
-        response.raise_for_status()
+        # Post-process the data
+        processed_data = post_process_gifi_values(data, parenthetical_values)
         
-        # Parse the response
-        try:
-            content = response.json()["choices"][0]["message"]["content"]
-            
-            # Handle case where JSON is wrapped in markdown code blocks
-            if content.startswith("```") and "```" in content:
-                # Extract JSON from markdown code block
-                content = content.split("```")[1]
-                if content.startswith("json\n"):
-                    content = content[5:]  # Remove "json\n" prefix
-                elif content.startswith("json"):
-                    content = content[4:]  # Remove "json" prefix
-            
-            data = json.loads(content)
-            
-            # Post-process the data
-            processed_data = post_process_gifi_values(data, parenthetical_values)
-            
-            logger.info(f"Successfully extracted data from image: {len(processed_data)} items")
-            return processed_data
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse API response as JSON: {str(e)}")
-            logger.error(f"Raw response: {content}")
-            raise
-            
-        except KeyError as e:
-            logger.error(f"Unexpected API response format: {str(e)}")
-            logger.error(f"Response: {response.json()}")
-            raise
+        logger.info(f"Successfully extracted data from image: {len(processed_data)} items")
+        return processed_data
         
     except Exception as e:
         logger.error(f"Error extracting data from image: {str(e)}")
         raise
+    
+    finally:
+        if owned:
+            page_image.close()
+
+def estimate_image_tokens(width, height):
+    """
+    Estimate the prompt tokens a high-detail image costs
+    
+    Follows the published tiling rule: the image is fitted within 2048x2048, scaled so
+    its short side is at most 768px, then billed 170 tokens per 512px tile plus 85.
+    
+    Args:
+        width (int): Image width in pixels
+        height (int): Image height in pixels
+        
+    Returns:
+        int: Estimated prompt tokens
+    """
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 170 * math.ceil(width / 512) * math.ceil(height / 512) + 85
+
+def iter_page_packs(page_images, pack_size=None, token_budget=None):
+    """
+    Group page images into packs for multi-page requests
+    
+    Pages are packed in arrival order until the pack holds pack_size pages or the next
+    page would push its estimated image tokens over token_budget.
+    
+    Args:
+        page_images (iterable): (page_number, image) tuples, image being a PageImage or a path
+        pack_size (int, optional): Maximum pages per pack (default: VISION_PACK_SIZE)
+        token_budget (int, optional): Maximum image tokens per pack (default: VISION_PACK_TOKEN_BUDGET)
+        
+    Yields:
+        list: (page_number, image) tuples
+    """
+    from PIL import Image  # Import here to avoid startup cost if not used
+    pack_size = max(1, pack_size or VISION_PACK_SIZE)
+    token_budget = token_budget or VISION_PACK_TOKEN_BUDGET
+    pack, pack_tokens = [], 0
+    for page_number, image in page_images:
+        if isinstance(image, PageImage):
+            size = image.size
+        else:
+            with Image.open(image) as opened:  # Reads the header only
+                size = opened.size
+        tokens = estimate_image_tokens(*size)
+        if pack and (len(pack) >= pack_size or pack_tokens + tokens > token_budget):
+            yield pack
+            pack, pack_tokens = [], 0
+        pack.append((page_number, image))
+        pack_tokens += tokens
+    if pack:
+        yield pack
+
+def extract_pack_with_vision(pack, pdf_path=None):
+    """
+    Extract GIFI codes and values from several pages in one Vision API request
+    
+    Pages already in the vision cache are not sent. The reply is split by page label
+    and post-processed per page; pages the reply leaves out are retried on their own.
+    
+    Args:
+        pack (list): (page_number, image) tuples, image being a PageImage or a path
+        pdf_path (str, optional): Path to the original PDF file, used for text extraction
+        
+    Returns:
+        tuple: Dictionary of page number to processed data,
+               dictionary of page number to error message for pages that failed
+    """
+    session = get_document_session(pdf_path) if pdf_path else None
+    cache = get_vision_cache()
+    owned = []
+    try:
+        raw = {}
+        pending = []
+        page_images = {}
+        for page_number, image in pack:
+            page_image, is_owned = _as_page_image(image, page_number)
+            if is_owned:
+                owned.append(page_image)
+            page_images[page_number] = page_image
+            cache_key = None
+            if cache:
+                with page_image.view() as image_bytes:
+                    cache_key = make_cache_key(image_bytes, OPENAI_MODEL, PACKED_SYSTEM_PROMPT, PACKED_USER_PROMPT, POST_PROCESS_VERSION)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    raw[page_number] = cached
+                    continue
+            pending.append((page_number, cache_key))
+        
+        if pending:
+            labels = [f"page_{page_number}" for page_number, _ in pending]
+            logger.info(f"Extracting {len(pending)} pages in one request: {', '.join(labels)}")
+            content = [{"type": "text", "text": PACKED_USER_PROMPT.format(count=len(pending))}]
+            for label, (page_number, _) in zip(labels, pending):
+                content.append({"type": "text", "text": label})
+                content.append(_image_part(page_images[page_number]))
+            messages = [
+                {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+                {"role": "user", "content": content}
+            ]
+            data = _request_completion(messages, max_tokens=1000 * len(pending))
+            for label, (page_number, cache_key) in zip(labels, pending):
+                page_data = data.get(label) if isinstance(data, dict) else None
+                if isinstance(page_data, dict):
+                    raw[page_number] = page_data
+                    if cache:
+                        cache.set(cache_key, page_data)
+        
+        results = {}
+        errors = {}
+        for page_number, _ in pack:
+            if page_number in raw:
+                parenthetical_values = session.parenthetical_flags(page_number) if session else {}
+                results[page_number] = post_process_gifi_values(raw[page_number], parenthetical_values)
+                continue
+            logger.warning(f"Packed reply had no entry for page {page_number}; extracting it on its own")
+            try:
+                results[page_number] = extract_data_with_vision(page_images[page_number], pdf_path, page_number)
+            except Exception as e:
+                errors[page_number] = str(e)
+        return results, errors
+    
+    finally:
+        for page_image in owned:
+            page_image.close()
+
+def extract_pages_with_vision(page_images, pdf_path=None, max_workers=None, on_page=None, pack_size=None,
+                              token_budget=None):
+    """
+    Extract GIFI codes and values from several page images concurrently
+    
+    Pages are sent to the Vision API in parallel, bounded by max_workers. page_images may
+    be a generator (e.g. pages still being rendered); each page is submitted as soon as it
+    arrives. A failure on one page does not cancel the others; it is reported in the
+    returned errors instead. With a pack size above 1, consecutive pages are grouped
+    (see iter_page_packs) and each pack is extracted in one request; if that request
+    fails, the pack's pages are extracted one at a time.
+    
+    Args:
+        page_images (iterable): (page_number, image) tuples, image being a PageImage or a path;
+            the caller keeps ownership of PageImages and may close each once on_page reports it
+        pdf_path (str, optional): Path to the original PDF file, used for text extraction
+        max_workers (int, optional): Maximum number of requests in flight (default: VISION_MAX_CONCURRENCY)
+        on_page (callable, optional): Called as on_page(page_number, data, error) as each page
+            finishes, from the worker thread that extracted it
+        pack_size (int, optional): Maximum pages per request (default: VISION_PACK_SIZE)
+        token_budget (int, optional): Maximum image tokens per packed request (default: VISION_PACK_TOKEN_BUDGET)
+        
+    Returns:
+        tuple: Dictionary of 'page_<n>' keys to extracted data in page order,
+               dictionary of 'page_<n>' keys to error messages for pages that failed
+    """
+    max_workers = max(1, max_workers or VISION_MAX_CONCURRENCY)
+    pack_size = max(1, pack_size or VISION_PACK_SIZE)
+    logger.info(f"Extracting pages with up to {max_workers} concurrent requests, {pack_size} pages per request")
+    
+    results = {}
+    errors = {}
+    
+    def report(page_number, data, error):
+        if on_page:
+            try:
+                on_page(page_number, data, error)
+            except Exception as e:
+                logger.error(f"Page callback failed for page {page_number}: {str(e)}")
+    
+    def extract_page(page_number, image):
+        data, error = None, None
+        try:
+            data = extract_data_with_vision(image, pdf_path, page_number)
+            results[page_number] = data
+        except Exception as e:
+            logger.error(f"Extraction failed for page {page_number}: {str(e)}")
+            error = errors[page_number] = str(e)
+        report(page_number, data, error)
+    
+    def extract_pack(pack):
+        try:
+            pack_results, pack_errors = extract_pack_with_vision(pack, pdf_path)
+        except Exception as e:
+            # As with pages missing from a reply, a failed pack is retried one page at a time
+            logger.error(f"Extraction failed for pages {[n for n, _ in pack]}: {str(e)}; extracting them on their own")
+            for page_number, image in pack:
+                extract_page(page_number, image)
+            return
+        results.update(pack_results)
+        errors.update(pack_errors)
+        for page_number, _ in pack:
+            report(page_number, pack_results.get(page_number), pack_errors.get(page_number))
+    
+    page_numbers = []
+    
+    def tracked(page_images):
+        for page_number, image in page_images:
+            page_numbers.append(page_number)
+            yield page_number, image
+    
+    # Each task runs in a copy of the caller's context so stage timings reach its breakdown
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vision") as executor:
+        if pack_size > 1:
+            for pack in iter_page_packs(tracked(page_images), pack_size, token_budget):
+                executor.submit(contextvars.copy_context().run, extract_pack, pack)
+        else:
+            for page_number, image in tracked(page_images):
+                executor.submit(contextvars.copy_context().run, extract_page, page_number, image)
+    
+    # Rebuild in the order the pages were requested
+    extracted = {f'page_{n}': results[n] for n in page_numbers if n in results}
+    page_errors = {f'page_{n}': errors[n] for n in page_numbers if n in errors}
+    logger.info(f"Extracted {len(extracted)} pages, {len(page_errors)} failed")
+    return extracted, page_errors
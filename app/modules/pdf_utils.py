@@ -1,98 +1,340 @@
 import os
 import logging
-import tempfile
-from pdf2image import convert_from_path, exceptions
+import contextvars
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from modules.buffer_utils import PageImage
+from modules.metrics_utils import span
 import re
 import traceback
 
 logger = logging.getLogger(__name__)
 
-def convert_pdf_to_images(pdf_path, pages=None):
+# Named rasterization profiles. "standard" reproduces the original 300 DPI colour PNG output;
+# the others trade resolution and colour for smaller vision payloads.
+RENDER_PROFILES = {
+    'standard': {'dpi': 300, 'grayscale': False, 'max_long_edge': None, 'format': 'png', 'quality': None},
+    'balanced': {'dpi': 200, 'grayscale': True, 'max_long_edge': 2048, 'format': 'png', 'quality': None},
+    'compact': {'dpi': 150, 'grayscale': True, 'max_long_edge': 1600, 'format': 'jpeg', 'quality': 80},
+    'webp': {'dpi': 200, 'grayscale': True, 'max_long_edge': 2048, 'format': 'webp', 'quality': 75},
+}
+
+# Settings a custom profile dict may use, and the bounds its values are clamped to
+RENDER_PROFILE_KEYS = {'name', 'dpi', 'grayscale', 'max_long_edge', 'format', 'quality'}
+RENDER_FORMATS = {'png', 'jpeg', 'webp'}
+RENDER_DPI_RANGE = (24, 600)
+RENDER_MAX_LONG_EDGE = 8192
+
+# Profile used when a request does not choose one (override in .env)
+DEFAULT_RENDER_PROFILE = os.getenv("RENDER_PROFILE", "standard")
+
+# Number of poppler processes to run in parallel when rasterizing (override in .env)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 2)))
+
+# Pages rendered per poppler run; bounds the raw bitmaps held in memory at once (override in .env)
+RENDER_MAX_PAGES_PER_RUN = int(os.getenv("RENDER_MAX_PAGES_PER_RUN", "8"))
+
+# Raw bitmap bytes one poppler run may produce; pdf2image buffers a whole run's output, so
+# high-DPI colour renders get fewer pages per run, down to one (override in .env)
+RENDER_RUN_BUDGET_MB = float(os.getenv("RENDER_RUN_BUDGET_MB", "32"))
+
+@lru_cache(maxsize=None)
+def get_poppler_path():
+    """
+    Locate the bundled poppler binaries installed by install_poppler.py (probed once)
+    
+    Returns:
+        str: Path to the bundled binaries, or None to use poppler from the system PATH
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    poppler_path = os.path.join(project_root, "poppler", "poppler-23.11.0", "Library", "bin")
+    if not os.path.isdir(poppler_path):
+        logger.info("Bundled poppler not found, using poppler from PATH")
+        return None
+    logger.info(f"Using bundled poppler: {poppler_path}")
+    return poppler_path
+
+def get_render_profile(profile=None):
+    """
+    Resolve a rasterization profile
+    
+    Args:
+        profile (str or dict, optional): Profile name from RENDER_PROFILES, or a profile dict
+            (missing settings come from 'standard'; dpi, max_long_edge and quality are clamped).
+            Defaults to DEFAULT_RENDER_PROFILE.
+    
+    Returns:
+        dict: Profile settings, including its 'name'
+    
+    Raises:
+        ValueError: If the profile name is unknown, a dict has unknown settings or an unsupported
+            format, or the profile is neither a name nor a dict
+    """
+    if isinstance(profile, dict):
+        unknown = set(profile) - RENDER_PROFILE_KEYS
+        if unknown:
+            raise ValueError(f"Unknown render profile settings: {', '.join(sorted(map(str, unknown)))}")
+        resolved = {**RENDER_PROFILES['standard'], 'name': 'custom', **profile}
+        if str(resolved['format']).lower() not in RENDER_FORMATS:
+            raise ValueError(f"Unsupported render format: {resolved['format']}. "
+                             f"Available: {', '.join(sorted(RENDER_FORMATS))}")
+        try:
+            resolved['format'] = resolved['format'].lower()
+            resolved['dpi'] = min(max(int(resolved['dpi']), RENDER_DPI_RANGE[0]), RENDER_DPI_RANGE[1])
+            resolved['grayscale'] = bool(resolved['grayscale'])
+            if resolved['max_long_edge']:
+                resolved['max_long_edge'] = min(max(int(resolved['max_long_edge']), 64), RENDER_MAX_LONG_EDGE)
+            if resolved['quality']:
+                resolved['quality'] = min(max(int(resolved['quality']), 1), 100)
+        except (TypeError, ValueError):
+            raise ValueError('Render profile dpi, max_long_edge and quality must be numbers')
+        return resolved
+    if profile is not None and not isinstance(profile, str):
+        raise ValueError(f"Render profile must be a name or a dict, not {type(profile).__name__}")
+    name = (profile or DEFAULT_RENDER_PROFILE).lower()
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name}. Available: {', '.join(RENDER_PROFILES)}")
+    return {'name': name, **RENDER_PROFILES[name]}
+
+def encode_page_image(image, profile, page_number=None):
+    """
+    Downscale and encode a rendered page into an in-memory buffer according to a profile
+    
+    Args:
+        image (PIL.Image.Image): Page image produced by poppler
+        profile (dict): Profile from get_render_profile
+        page_number (int, optional): PDF page the image was rendered from
+    
+    Returns:
+        PageImage: The encoded page; the caller closes it
+    """
+    from PIL import Image  # Pillow is installed with pdf2image
+    
+    fmt = profile.get('format', 'png').lower()
+    max_long_edge = profile.get('max_long_edge')
+    if max_long_edge and max(image.size) > max_long_edge:
+        image.thumbnail((max_long_edge, max_long_edge), Image.LANCZOS)
+    if profile.get('grayscale') and image.mode != 'L':
+        image = image.convert('L')
+    elif fmt == 'jpeg' and image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    save_options = {}
+    if max_long_edge or fmt != 'png':
+        save_options['optimize'] = True
+    if profile.get('quality') and fmt in ('jpeg', 'webp'):
+        save_options['quality'] = profile['quality']
+    return PageImage.from_pil(image, fmt, page_number, **save_options)
+
+def group_page_ranges(pages):
+    """
+    Merge page numbers into sorted, contiguous ranges
+    
+    Args:
+        pages (list): Page numbers (1-indexed), in any order and possibly with duplicates
+    
+    Returns:
+        list: List of (first_page, last_page) tuples, inclusive
+    """
+    ranges = []
+    for page in sorted(set(pages)):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
+def split_page_ranges(ranges, workers, max_chunk=None):
+    """
+    Split contiguous page ranges into roughly equal chunks so they can be rendered in parallel
+    
+    Args:
+        ranges (list): List of (first_page, last_page) tuples from group_page_ranges
+        workers (int): Number of workers the chunks will be spread across
+        max_chunk (int, optional): Upper bound on pages per chunk
+    
+    Returns:
+        list: List of (first_page, last_page) tuples, each rendered by one poppler invocation
+    """
+    total_pages = sum(last - first + 1 for first, last in ranges)
+    if not total_pages:
+        return []
+    chunk_size = max(1, -(-total_pages // max(1, workers)))  # Ceiling division
+    if max_chunk:
+        chunk_size = min(chunk_size, max_chunk)
+    chunks = []
+    for first, last in ranges:
+        while first <= last:
+            chunk_last = min(last, first + chunk_size - 1)
+            chunks.append((first, chunk_last))
+            first = chunk_last + 1
+    return chunks
+
+def pages_per_run(profile):
+    """
+    Pages one poppler run may render under RENDER_RUN_BUDGET_MB, assuming letter-sized pages
+    
+    Args:
+        profile (dict): Profile from get_render_profile
+    
+    Returns:
+        int: Between 1 and RENDER_MAX_PAGES_PER_RUN
+    """
+    channels = 1 if profile['grayscale'] else 3
+    page_bytes = (8.5 * profile['dpi']) * (11 * profile['dpi']) * channels
+    return max(1, min(RENDER_MAX_PAGES_PER_RUN, int(RENDER_RUN_BUDGET_MB * 1024 * 1024 // page_bytes)))
+
+def _render_page_range(pdf_path, first_page, last_page, poppler_path, profile):
+    """Render one contiguous page range with a single pdftoppm invocation, entirely in memory"""
+    from pdf2image import convert_from_path, exceptions  # Import here to avoid startup cost if not used
+    
+    # Without an output folder pdftoppm streams the pages over stdout, so nothing touches disk
+    with span('render'):
+        images = convert_from_path(
+            pdf_path,
+            dpi=profile['dpi'],
+            thread_count=1,
+            grayscale=profile['grayscale'],
+            first_page=first_page,
+            last_page=last_page,
+            poppler_path=poppler_path  # Explicitly set poppler path
+        )
+    try:
+        if len(images) != last_page - first_page + 1:
+            raise exceptions.PDFPageCountError(
+                f"Expected {last_page - first_page + 1} images for pages {first_page}-{last_page}, got {len(images)}"
+            )
+        rendered = []
+        try:
+            for page_number, image in zip(range(first_page, last_page + 1), images):
+                with span('encode_image'):
+                    rendered.append((page_number, encode_page_image(image, profile, page_number)))
+        except Exception:
+            for _, page_image in rendered:
+                page_image.close()
+            raise
+        return rendered
+    finally:
+        for image in images:
+            image.close()
+
+def iter_pdf_images(pdf_path, pages, poppler_path=None, max_workers=None, profile=None):
     """
-    Convert PDF pages to images
+    Rasterize PDF pages in parallel, yielding each page as soon as its range is rendered
+    
+    Selected pages are merged into contiguous ranges and split into at most max_workers
+    chunks (of at most pages_per_run pages), so each poppler process parses the PDF once
+    for a whole run of pages. At most max_workers runs are in flight: the next run starts
+    only once a finished one is handed to the caller, so a slow consumer holds back
+    rendering instead of piling up pages. Pages are kept in memory; the caller owns
+    each yielded image and must close it. Images not yet yielded when the generator is
+    closed early are released.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        pages (list): Page numbers to render (1-indexed)
+        poppler_path (str, optional): Directory containing the poppler binaries (default: system PATH)
+        max_workers (int, optional): Number of poppler processes to run at once (default: RENDER_WORKERS)
+        profile (str or dict, optional): Rasterization profile (default: DEFAULT_RENDER_PROFILE)
+    
+    Yields:
+        tuple: (page_number, PageImage) in completion order
+    """
+    max_workers = max(1, max_workers or RENDER_WORKERS)
+    profile = get_render_profile(profile)
+    chunks = split_page_ranges(group_page_ranges(pages), max_workers, pages_per_run(profile))
+    logger.info(f"Rendering {len(chunks)} page ranges with {min(max_workers, len(chunks))} workers: {chunks}")
+    if not chunks:
+        return
+    
+    pending = []
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix="render")
+    remaining = iter(chunks)
+    in_flight = set()
+    
+    def submit_next():
+        chunk = next(remaining, None)
+        if chunk:
+            in_flight.add(executor.submit(
+                contextvars.copy_context().run, _render_page_range, pdf_path, chunk[0], chunk[1], poppler_path, profile
+            ))
+    
+    for _ in range(max_workers):
+        submit_next()
+    try:
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            future = next(iter(done))
+            in_flight.discard(future)
+            pending = future.result()
+            submit_next()
+            while pending:
+                yield pending.pop(0)
+    finally:
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=True)
+        # Release pages rendered but never handed to the caller
+        for future in in_flight:
+            if not future.cancelled() and future.exception() is None:
+                pending.extend(future.result())
+        for _, page_image in pending:
+            page_image.close()
+
+def convert_pdf_to_images(pdf_path, pages=None, profile=None):
+    """
+    Convert PDF pages to in-memory images
     
     Args:
         pdf_path (str): Path to the PDF file
         pages (list, optional): List of page numbers to convert (1-indexed). If None, converts all pages.
+        profile (str or dict, optional): Rasterization profile (default: DEFAULT_RENDER_PROFILE)
     
     Returns:
-        list: List of paths to the generated images
+        list: PageImage objects in the order the pages were requested; the caller closes them
     """
+    from pdf2image import exceptions  # Import here to avoid startup cost if not used
+    
+    rendered = {}
+    poppler_path = get_poppler_path()
     try:
         logger.info(f"Converting PDF to images: {pdf_path}")
         logger.info(f"Selected pages: {pages}")
+        profile = get_render_profile(profile)
+        logger.info(f"Render profile: {profile}")
         
-        # Log environment information
-        logger.info(f"Current PATH: {os.environ['PATH']}")
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        poppler_path = os.path.join(project_root, "poppler", "poppler-23.11.0", "Library", "bin")
-        logger.info(f"Poppler path exists: {os.path.exists(poppler_path)}")
-        logger.info(f"Poppler path contents: {os.listdir(poppler_path) if os.path.exists(poppler_path) else 'Not found'}")
+        if not pages:
+            pages = list(range(1, get_pdf_page_count(pdf_path) + 1))
         
-        # Create temporary directory for images
-        output_dir = tempfile.mkdtemp(prefix="pdf_images_")
-        logger.info(f"Created temp directory: {output_dir}")
+        # Convert PDF to images, batching contiguous pages into single poppler runs
+        for page_num, page_image in iter_pdf_images(pdf_path, pages, poppler_path, profile=profile):
+            rendered[page_num] = page_image
+        missing = [page_num for page_num in pages if page_num not in rendered]
+        if missing:
+            raise exceptions.PDFPageCountError(f"Pages out of range: {missing}")
+        images = []
+        for page_num in pages:
+            # A page selected twice gets its own copy so each image can be closed independently
+            image = rendered[page_num]
+            images.append(image.copy() if any(image is other for other in images) else image)
         
-        # Convert PDF to images
-        if pages:
-            # Process each page individually and combine the results
-            images = []
-            for page_num in pages:
-                logger.info(f"Processing page {page_num}")
-                # Convert from 1-indexed (user input) to 0-indexed (pdf2image)
-                page_idx = page_num - 1
-                
-                try:
-                    page_images = convert_from_path(
-                        pdf_path,
-                        dpi=300,  # Higher DPI for better text recognition
-                        fmt="png",
-                        output_folder=output_dir,
-                        paths_only=True,
-                        thread_count=2,
-                        use_pdftocairo=True,
-                        grayscale=False,
-                        first_page=page_idx + 1,  # pdf2image uses 1-indexed for first_page
-                        last_page=page_idx + 1,    # pdf2image uses 1-indexed for last_page
-                        poppler_path=poppler_path  # Explicitly set poppler path
-                    )
-                    logger.info(f"Successfully converted page {page_num}")
-                    images.extend(page_images)
-                except Exception as e:
-                    logger.error(f"Error converting page {page_num}: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    raise
-        else:
-            # Convert all pages
-            images = convert_from_path(
-                pdf_path,
-                dpi=300,  # Higher DPI for better text recognition
-                fmt="png",
-                output_folder=output_dir,
-                paths_only=True,
-                thread_count=2,
-                use_pdftocairo=True,
-                grayscale=False,
-                poppler_path=poppler_path  # Explicitly set poppler path
-            )
-        
-        logger.info(f"Generated {len(images)} images from PDF")
-        logger.info(f"Image paths: {images}")
+        logger.info(f"Generated {len(images)} images from PDF ({sum(image.nbytes for image in images)} bytes in memory)")
         return images
     
     except exceptions.PDFPageCountError as e:
+        for page_image in rendered.values():
+            page_image.close()
         logger.error(f"PDF page count error: {str(e)}")
         logger.error(traceback.format_exc())
         raise ValueError(f"Invalid page selection: {str(e)}")
     
     except exceptions.PDFInfoNotInstalledError:
-        logger.error("pdftoppm or pdftocairo is not installed")
-        logger.error(f"PATH: {os.environ['PATH']}")
-        logger.error(f"Poppler path: {poppler_path}")
+        logger.error(f"pdftoppm or pdftocairo is not installed (poppler path: {poppler_path or 'system PATH'})")
         logger.error(traceback.format_exc())
         raise RuntimeError("PDF conversion tools not installed. Please install poppler.")
     
     except Exception as e:
+        for page_image in rendered.values():
+            page_image.close()
         logger.error(f"Error converting PDF to images: {str(e)}")
         logger.error(traceback.format_exc())
         raise
@@ -118,6 +360,32 @@ def get_pdf_page_count(pdf_path):
         logger.error(f"Error getting PDF page count: {str(e)}")
         raise
 
+def find_parenthetical_codes(text):
+    """
+    Identify GIFI codes whose values appear in parentheses in page text.
+    
+    Args:
+        text (str): Extracted page text
+        
+    Returns:
+        dict: Dictionary mapping GIFI codes to bool indicating if value is in parentheses
+    """
+    parenthetical_values = {}
+    
+    # Look for patterns like:
+    # 1000 ($1,234) or 1000 (1,234)
+    # 1000............($1,234)
+    # 1000 (1234)
+    # Also handles whitespace and dots between code and value
+    pattern = r'(\d{4})[\s.]+\(([\$\s]?[\d,]+)\)'
+    for match in re.finditer(pattern, text or ''):
+        gifi_code = match.group(1)
+        value = match.group(2)
+        logger.debug(f"Found parenthetical value for GIFI {gifi_code}: {value}")
+        parenthetical_values[gifi_code] = True
+    
+    return parenthetical_values
+
 def extract_parenthetical_values(pdf_path, page_number=1):
     """
     Extract text from PDF and identify values that appear in parentheses.
@@ -130,34 +398,192 @@ def extract_parenthetical_values(pdf_path, page_number=1):
         dict: Dictionary mapping GIFI codes to bool indicating if value is in parentheses
     """
     try:
-        import pdfplumber  # Import here to avoid startup cost if not used
+        from modules.document_utils import get_document_session  # Imported here to avoid a circular import
         
-        parenthetical_values = {}
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            page = pdf.pages[page_number - 1]
-            text = page.extract_text()
-            
-            # Look for patterns like:
-            # 1000 ($1,234) or 1000 (1,234)
-            # 1000............($1,234)
-            # 1000 (1234)
-            # Also handles whitespace and dots between code and value
-            pattern = r'(\d{4})[\s.]+\(([\$\s]?[\d,]+)\)'
-            matches = re.finditer(pattern, text)
-            
-            # Debug logging
-            logger.info(f"Extracted text from page {page_number}:")
-            logger.info(text[:500])  # Show first 500 chars
-            
-            for match in matches:
-                gifi_code = match.group(1)
-                value = match.group(2)
-                logger.info(f"Found parenthetical value for GIFI {gifi_code}: {value}")
-                parenthetical_values[gifi_code] = True
-                
-        return parenthetical_values
+        return get_document_session(pdf_path).parenthetical_flags(page_number)
         
     except Exception as e:
         logger.error(f"Error extracting parenthetical values: {str(e)}")
         return {}
+
+# A page's text layer is trusted only if it has at least this many characters (override in .env)
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "50"))
+
+# ... and at least this many GIFI code lines, making up at least this share of the lines that
+# end in an amount, so statements without GIFI codes go to vision (override in .env)
+TEXT_LAYER_MIN_CODES = int(os.getenv("TEXT_LAYER_MIN_CODES", "2"))
+TEXT_LAYER_MIN_CODE_SHARE = float(os.getenv("TEXT_LAYER_MIN_CODE_SHARE", "0.5"))
+
+GIFI_CODE_PATTERN = re.compile(r'^\d{4}$')
+AMOUNT_PATTERN = re.compile(r'^\(?-?\$?[\d,]*\d(\.\d{1,2})?\)?$')
+LEADER_PATTERN = re.compile(r'\.{2,}')
+ZERO_DASHES = {'-', '\u2013', '\u2014'}  # Statements often print nil amounts as a dash
+MONTHS = {'jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec'}
+
+def _split_leaders(words):
+    """Split tokens joined by dot leaders (e.g. '1000......12,345') into separate word boxes"""
+    split_words = []
+    for word in words:
+        text = word['text']
+        width = (word['x1'] - word['x0']) / max(1, len(text))
+        bounds = []
+        start = 0
+        for match in LEADER_PATTERN.finditer(text):
+            bounds.append((start, match.start()))
+            start = match.end()
+        bounds.append((start, len(text)))
+        for piece_start, piece_end in bounds:
+            piece = text[piece_start:piece_end].strip('.')
+            if piece:
+                split_words.append({
+                    **word,
+                    'text': piece,
+                    'x0': word['x0'] + piece_start * width,
+                    'x1': word['x0'] + piece_end * width
+                })
+    return split_words
+
+def _group_lines(words, tolerance=3):
+    """Group word boxes into text lines by their vertical position"""
+    lines = []
+    for word in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if lines and abs(word['top'] - lines[-1][0]['top']) <= tolerance:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return [sorted(line, key=lambda w: w['x0']) for line in lines]
+
+def _find_current_year_column(lines):
+    """Return the (x0, x1) span of a 'Current Year' column header, if the page has one"""
+    for line in lines:
+        for i, word in enumerate(line):
+            if word['text'].lower().strip(':') != 'current':
+                continue
+            x0, x1 = word['x0'], word['x1']
+            if i + 1 < len(line) and line[i + 1]['text'].lower().startswith('year'):
+                x1 = line[i + 1]['x1']
+            return x0, x1
+    return None
+
+def _is_year(text):
+    return text.isdigit() and len(text) == 4 and 1900 <= int(text) <= 2100
+
+def _is_date_part(text):
+    """A month name or day of the month, as in 'December 31, 2024'"""
+    text = text.strip('.,').lower()
+    return (text.isalpha() and text[:3] in MONTHS) or (text.isdigit() and 1 <= int(text) <= 31)
+
+def _count_amount_lines(lines):
+    """Lines ending in an amount of three or more digits (or a dash), i.e. statement rows"""
+    count = 0
+    for line in lines:
+        last = line[-1]['text'].replace('$', '')
+        is_amount = last in ZERO_DASHES or (AMOUNT_PATTERN.match(last) and sum(c.isdigit() for c in last) >= 3)
+        if len(line) > 1 and is_amount:
+            count += 1
+    return count
+
+def parse_gifi_words(words):
+    """
+    Pull GIFI code/value pairs out of positioned words from a PDF text layer
+    
+    Each line is scanned for a four-digit GIFI code followed by amounts. When the page
+    has a "Current Year" column header, the amount closest to that column is used;
+    otherwise the first amount to the right of the code is taken.
+    
+    Args:
+        words (list): pdfplumber word dicts with 'text', 'x0', 'x1' and 'top'
+    
+    Returns:
+        tuple: Dictionary mapping GIFI codes to unsigned values,
+               dictionary mapping GIFI codes to True for values shown in parentheses
+    """
+    lines = _group_lines(_split_leaders(words))
+    column = _find_current_year_column(lines)
+    values = {}
+    parenthetical_values = {}
+    
+    for line in lines:
+        texts = [w['text'] for w in line]
+        if sum(t.lower() in ('current', 'prior', 'year') for t in texts) >= 2:
+            continue  # Header row
+        for i, word in enumerate(line):
+            code = word['text'].strip('.:')
+            if not GIFI_CODE_PATTERN.match(code) or not 1000 <= int(code) <= 9999:
+                continue
+            amounts = [
+                w for w in line[i + 1:]
+                if AMOUNT_PATTERN.match(w['text'].replace('$', '')) or (column and w['text'] in ZERO_DASHES)
+            ]
+            if not amounts:
+                continue
+            if column:
+                # Take the amount nearest the Current Year header; skip the line if that column is blank
+                center = (column[0] + column[1]) / 2
+                amount = min(amounts, key=lambda w: abs((w['x0'] + w['x1']) / 2 - center))
+                if abs((amount['x0'] + amount['x1']) / 2 - center) > max(40, column[1] - column[0]):
+                    break
+            else:
+                amount = amounts[0]
+            raw = amount['text'].replace('$', '')
+            clean = '0' if raw in ZERO_DASHES else raw.replace(',', '').replace('(', '').replace(')', '')
+            if _is_year(code) and (_is_year(clean) or (i and _is_date_part(line[i - 1]['text']))):
+                continue  # Column headings like '2024 2023' or a date, not a code and value
+            if code not in values:
+                values[code] = clean
+                if raw.startswith('(') and raw.endswith(')'):
+                    parenthetical_values[code] = True
+            break  # One code per line
+    return values, parenthetical_values
+
+def extract_text_layer_values(pdf_path, page_number=1):
+    """
+    Extract GIFI codes and values directly from a PDF page's text layer
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        page_number (int): Page number to extract from (1-based)
+    
+    Returns:
+        tuple: (values, parenthetical_values) as returned by parse_gifi_words,
+               or None if the page has no usable text layer and needs vision extraction
+    """
+    try:
+        from modules.document_utils import get_document_session  # Imported here to avoid a circular import
+        
+        return get_document_session(pdf_path).text_layer_values(page_number)
+    
+    except Exception as e:
+        logger.warning(f"Text layer extraction failed for page {page_number}, falling back to vision: {str(e)}")
+        return None
+
+def evaluate_text_layer(words, char_count, page_number=1):
+    """
+    Decide whether a page's text layer is usable and, if so, extract its GIFI values
+    
+    Args:
+        words (list): pdfplumber word dicts for the page
+        char_count (int): Number of characters in the page's text layer
+        page_number (int): Page number, for logging
+    
+    Returns:
+        tuple: (values, parenthetical_values), or None if the text layer is not usable
+    """
+    if char_count < TEXT_LAYER_MIN_CHARS:
+        logger.info(f"Page {page_number}: no usable text layer ({char_count} characters)")
+        return None
+    if sum('(cid:' in w['text'] for w in words) > len(words) * 0.1:
+        logger.info(f"Page {page_number}: text layer uses unmapped glyphs, not usable")
+        return None
+    values, parenthetical_values = parse_gifi_words(words)
+    if not values:
+        logger.info(f"Page {page_number}: text layer has no GIFI code/value pairs")
+        return None
+    # A few four-digit numbers followed by amounts are not enough to trust the page without vision
+    amount_lines = _count_amount_lines(_group_lines(_split_leaders(words)))
+    if len(values) < TEXT_LAYER_MIN_CODES or len(values) < amount_lines * TEXT_LAYER_MIN_CODE_SHARE:
+        logger.info(f"Page {page_number}: only {len(values)} of {amount_lines} amount lines have a GIFI code, "
+                    f"not trusting the text layer")
+        return None
+    logger.info(f"Page {page_number}: extracted {len(values)} values from text layer")
+    return values, parenthetical_values
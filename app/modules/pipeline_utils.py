@@ -0,0 +1,230 @@
+import os
+import sqlite3
+import logging
+from datetime import datetime
+from modules.docx_utils import extract_text_from_docx
+from modules.document_utils import get_document_session, get_file_hash
+from modules.extraction_utils import extract_pdf_pages
+from modules.mapping_utils import map_extracted_data_to_cell_ids
+from modules.csv_utils import generate_csv
+from modules.metrics_utils import span, PIPELINES_IN_FLIGHT
+from modules.checkpoint_utils import get_page_checkpoints
+from modules.results_utils import get_results_db, record_pipeline_results
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionFailedError(RuntimeError):
+    """Raised when no selected page could be extracted"""
+
+    def __init__(self, message, page_errors):
+        super().__init__(message)
+        self.page_errors = page_errors
+
+
+class ExtractionNotStoredError(LookupError):
+    """Raised when a document's page results are not stored, so it must be processed before remapping"""
+
+    def __init__(self, message, missing_pages):
+        super().__init__(message)
+        self.missing_pages = missing_pages
+
+
+def _combine_pages(extracted_data):
+    """Merge per-page GIFI values into one dict (later pages win); non-dict entries such as Word text are skipped"""
+    return {
+        k: v for page_data in extracted_data.values() if isinstance(page_data, dict) for k, v in page_data.items()
+    }
+
+
+def _write_dictionary_csv(mapped_data, dictionary_name, save_directory):
+    """
+    Returns:
+        tuple: (csv_filename, csv_path) of the CSV written for this dictionary
+    """
+    csv_filename = f"tax_form_data_{dictionary_name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.csv"
+    csv_path = os.path.join(save_directory, csv_filename)
+    generate_csv(mapped_data, csv_path)
+    return csv_filename, csv_path
+
+
+@PIPELINES_IN_FLIGHT.track_inprogress()
+@span('pipeline')
+def run_pipeline(filepath, filetype, pages=None, dictionary_name='GIFI', save_directory=None,
+                 render_profile=None, max_workers=None, use_text_layer=None, progress=None,
+                 pack_size=None, crop_roi=None, resume=True):
+    """
+    Run the full extract -> map -> CSV pipeline for one uploaded document
+
+    Args:
+        filepath (str): Path to the uploaded file
+        filetype (str): 'pdf', 'docx' or 'doc'
+        pages (list, optional): PDF page numbers to process (1-indexed). Defaults to all pages.
+        dictionary_name (str): Mapping dictionary to use (default: 'GIFI')
+        save_directory (str, optional): Where to write the CSV (default: the file's folder)
+        render_profile (str or dict, optional): Rasterization profile for vision pages
+        max_workers (int, optional): Maximum vision requests in flight
+        use_text_layer (bool, optional): Read digital PDFs from their text layer when possible
+        progress (callable, optional): Called as progress(state, details) where state is one of
+            'extracting', 'rendering', 'page_rendered', 'page_extracted', 'page_failed', 'mapping'
+            or 'writing'. 'page_extracted' details include the page's mapped_data and
+            mapping_warnings. May be called from worker threads.
+        pack_size (int, optional): Maximum pages per vision request
+        crop_roi (bool, optional): Crop rendered pages to their code and value regions
+        resume (bool): Reuse page results checkpointed by an earlier run of the same document
+
+    Returns:
+        dict: extracted_data, mapped_data, mapping_warnings, page_errors, page_sources,
+              page_roi (crop statistics per vision page), resumed_pages (pages taken from
+              checkpoints), skipped_pages (pages skipped as blank), csv_filename and csv_path
+
+    Raises:
+        ValueError: If the file type is not supported
+        ExtractionFailedError: If every selected page failed extraction
+    """
+    report = progress or (lambda state, details: None)
+    page_roi = {}
+    resumed_pages = []
+
+    def notify(state, details):
+        if state == 'page_rendered' and details.get('roi'):
+            page_roi[f"page_{details['page']}"] = details['roi']
+        if state == 'page_extracted' and details.get('resumed'):
+            resumed_pages.append(details['page'])
+        # Attach this page's mapped rows so streaming clients can show partial results
+        if progress and state == 'page_extracted':
+            mapped, warnings = map_extracted_data_to_cell_ids(details['data'], dictionary_name)
+            details = {**details, 'mapped_data': mapped, 'mapping_warnings': warnings}
+        report(state, details)
+
+    extracted_data = {}
+    page_errors = {}
+    page_sources = {}
+
+    if filetype == 'pdf':
+        logger.info(f"Processing PDF with selected pages: {pages}")
+        if not pages:
+            pages = list(range(1, get_document_session(filepath).page_count + 1))
+        notify('extracting', {'pages_done': 0, 'pages_total': len(pages)})
+        extracted_data, page_errors, page_sources = extract_pdf_pages(
+            filepath,
+            pages,
+            profile=render_profile,
+            max_workers=max_workers,
+            use_text_layer=use_text_layer,
+            on_event=notify,
+            pack_size=pack_size,
+            crop_roi=crop_roi,
+            resume=resume
+        )
+        if page_errors and not extracted_data:
+            logger.error(f"All pages failed extraction: {page_errors}")
+            raise ExtractionFailedError('Extraction failed for all pages', page_errors)
+    elif filetype in ['docx', 'doc']:
+        notify('extracting', {'pages_done': 0, 'pages_total': 1})
+        extracted_data['text'] = extract_text_from_docx(filepath)
+    else:
+        raise ValueError('Unsupported file type')
+
+    # Map extracted data to cell IDs using selected dictionary
+    notify('mapping', {})
+    combined_data = _combine_pages(extracted_data)
+    mapped_data, mapping_warnings = map_extracted_data_to_cell_ids(combined_data, dictionary_name)
+    logger.info(f"Mapped {len(mapped_data)} items to cell IDs using {dictionary_name}")
+
+    # Determine save directory
+    notify('writing', {})
+    if not save_directory:
+        save_directory = os.path.dirname(filepath)
+
+    csv_filename, csv_path = _write_dictionary_csv(mapped_data, dictionary_name, save_directory)
+    logger.info(f"Processing complete. CSV saved to {csv_path}")
+    record_pipeline_results(get_file_hash(filepath), os.path.basename(filepath), filetype, dictionary_name,
+                            extracted_data, mapped_data, mapping_warnings, page_sources)
+
+    return {
+        'extracted_data': extracted_data,
+        'mapped_data': mapped_data,
+        'mapping_warnings': mapping_warnings,
+        'page_errors': page_errors,
+        'page_sources': page_sources,
+        'page_roi': page_roi,
+        'resumed_pages': sorted(resumed_pages),
+        'skipped_pages': sorted(int(key.split('_')[1]) for key, source in page_sources.items() if source == 'blank'),
+        'csv_filename': csv_filename,
+        'csv_path': csv_path
+    }
+
+
+@span('remap')
+def remap_document(document_id, dictionaries, save_directory, pages=None):
+    """
+    Map a processed document's stored page results with other dictionaries, without extracting again
+
+    Page results come from page checkpoints (see checkpoint_utils) and, for pages whose
+    checkpoints expired or were made by another model, from the results database (see
+    results_utils), which keeps them for good. Only the mapping and CSV stages run.
+
+    Args:
+        document_id (str): SHA-256 of the document (the document_id returned by /upload)
+        dictionaries (list): Mapping dictionaries to produce outputs for
+        save_directory (str): Where to write the CSVs
+        pages (list, optional): Page numbers to include. Defaults to every successfully extracted page.
+
+    Returns:
+        dict: document_id, pages, page_sources and results (dictionary name -> mapped_data,
+              mapping_warnings, csv_filename and csv_path)
+
+    Raises:
+        ExtractionNotStoredError: If page results are not stored (or both stores are disabled)
+    """
+    checkpoints = get_page_checkpoints()
+    results_db = get_results_db()
+    if not checkpoints and not results_db:
+        raise ExtractionNotStoredError('Page checkpoints and the results database are disabled, '
+                                       'so there are no stored results', pages or [])
+    known_pages = set()
+    stored = {}
+    if results_db:
+        try:
+            stored.update(results_db.extracted_pages(document_id))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read stored results for {document_id[:12]}: {str(e)}")
+    if checkpoints:
+        # Checkpoints hold the current model's results, so they win over older database rows
+        known_pages.update(checkpoints.stored_pages(document_id))
+        stored.update(checkpoints.completed_pages(document_id, sorted(known_pages)))
+    requested = bool(pages)
+    if not requested:
+        pages = sorted(known_pages | set(stored))
+    stored = {page_num: stored[page_num] for page_num in pages if page_num in stored}
+    missing = [page_num for page_num in pages if page_num not in stored]
+    # Selected pages must all be stored; by default pages that failed are left out, as /process does
+    if not stored or (requested and missing):
+        raise ExtractionNotStoredError('Pages have not been extracted; process the document first', missing)
+    if missing:
+        logger.warning(f"Remapping without pages that failed or expired: {missing}")
+
+    extracted_data = {f'page_{page_num}': stored[page_num]['data'] for page_num in sorted(stored)}
+    page_sources = {f'page_{page_num}': stored[page_num]['source'] for page_num in sorted(stored)}
+    combined_data = _combine_pages(extracted_data)
+    results = {}
+    for dictionary_name in dictionaries:
+        mapped_data, mapping_warnings = map_extracted_data_to_cell_ids(combined_data, dictionary_name)
+        csv_filename, csv_path = _write_dictionary_csv(mapped_data, dictionary_name, save_directory)
+        record_pipeline_results(document_id, None, None, dictionary_name, extracted_data, mapped_data,
+                                mapping_warnings, page_sources)
+        results[dictionary_name] = {
+            'mapped_data': mapped_data,
+            'mapping_warnings': mapping_warnings,
+            'csv_filename': csv_filename,
+            'csv_path': csv_path
+        }
+    logger.info(f"Remapped {len(stored)} stored pages of {document_id[:12]} with {', '.join(dictionaries)}")
+    return {
+        'document_id': document_id,
+        'pages': sorted(stored),
+        'missing_pages': missing,
+        'page_sources': page_sources,
+        'results': results
+    }
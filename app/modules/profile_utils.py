@@ -0,0 +1,278 @@
+import os
+import time
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from modules.document_utils import get_document_session
+
+logger = logging.getLogger(__name__)
+
+# Profile documents in the background as soon as they are uploaded (override in .env)
+DOCUMENT_PROFILE_ENABLED = os.getenv("DOCUMENT_PROFILE_ENABLED", "true").lower() in ("1", "true", "yes")
+DOCUMENT_PROFILE_DIR = os.getenv(
+    "DOCUMENT_PROFILE_DIR", os.path.join(tempfile.gettempdir(), 'tax_form_uploads', '.profiles')
+)
+
+# Documents profiled in parallel (override in .env)
+DOCUMENT_PROFILE_WORKERS = int(os.getenv("DOCUMENT_PROFILE_WORKERS", "2"))
+
+# Skip the vision API for pages the profile found blank; off unless enabled (override in .env)
+SKIP_BLANK_PAGES = os.getenv("SKIP_BLANK_PAGES", "false").lower() in ("1", "true", "yes")
+
+# Bump when the profile contents change so stale profiles are recomputed
+PROFILE_VERSION = 2
+
+# Low-resolution rendering used for thumbnails and blank-page detection
+THUMBNAIL_PROFILE = {'dpi': 24, 'grayscale': True, 'max_long_edge': 256, 'format': 'jpeg', 'quality': 70}
+
+# Pages without a text layer whose thumbnail has less than this share of dark pixels are
+# re-rendered at BLANK_CONFIRM_PROFILE; a thumbnail is too coarse to call a page blank on its own
+BLANK_CANDIDATE_INK_RATIO = 0.01
+
+# Lossless rendering used to confirm a blank page, so faint and sparse lines are not averaged away
+BLANK_CONFIRM_PROFILE = {'dpi': 100, 'grayscale': True, 'max_long_edge': None, 'format': 'png', 'quality': None}
+
+# A candidate is blank only if less than this share of its confirmation pixels are darker than
+# BLANK_CONFIRM_DARKNESS (a header plus one statement line is around 0.0015; scanner specks 0.0001)
+BLANK_CONFIRM_INK_RATIO = 0.0003
+BLANK_CONFIRM_DARKNESS = 230
+
+
+def _ink_ratio(page_image, darkness=200):
+    """Share of pixels darker than `darkness` (0-255) in a rendered page"""
+    image = page_image.open()
+    try:
+        histogram = image.convert('L').histogram()
+    finally:
+        image.close()
+    return sum(histogram[:darkness]) / max(1, sum(histogram))
+
+
+def _confirm_blank(page_image):
+    """Whether a page rendered with BLANK_CONFIRM_PROFILE has (almost) no ink"""
+    return _ink_ratio(page_image, BLANK_CONFIRM_DARKNESS) < BLANK_CONFIRM_INK_RATIO
+
+
+def profile_document(pdf_path, thumbnail_dir=None, on_page_count=None):
+    """
+    Build a cheap profile of a PDF for planning the extraction
+
+    Args:
+        pdf_path (str): Path to the PDF
+        thumbnail_dir (str, optional): Where to save page thumbnails (page_<n>.jpeg); skipped if None
+        on_page_count (callable, optional): Called with the page count as soon as it is known
+
+    Returns:
+        dict: document_id, page_count, pages (per page: text_layer, char_count, gifi_codes,
+              blank, hash, thumbnail), text_layer_pages, vision_pages, blank_pages,
+              duplicate_pages ('page_<n>' -> earlier identical page) and seconds
+    """
+    start = time.perf_counter()
+    session = get_document_session(pdf_path)
+    page_count = session.page_count
+    if on_page_count:
+        on_page_count(page_count)
+
+    pages = {}
+    for page_number in range(1, page_count + 1):
+        text_result = session.text_layer_values(page_number)
+        pages[page_number] = {
+            'page': page_number,
+            'text_layer': text_result is not None,
+            'char_count': session.page_char_count(page_number),
+            # Only known without the vision API when the text layer is usable
+            'gifi_codes': len(text_result[0]) if text_result else None,
+            'blank': None,
+            'hash': None,
+            'thumbnail': False
+        }
+
+    # Thumbnails need poppler; a profile without them is still useful
+    try:
+        if thumbnail_dir:
+            os.makedirs(thumbnail_dir, exist_ok=True)
+        for page_number, page_image in session.iter_render(list(pages), THUMBNAIL_PROFILE):
+            with page_image:
+                page = pages[page_number]
+                with page_image.view() as data:
+                    page['hash'] = hashlib.sha256(data).hexdigest()
+                    if thumbnail_dir:
+                        with open(os.path.join(thumbnail_dir, f"page_{page_number}.jpeg"), 'wb') as f:
+                            f.write(data)
+                        page['thumbnail'] = True
+                page['blank'] = False
+                if page['char_count'] == 0 and _ink_ratio(page_image) < BLANK_CANDIDATE_INK_RATIO:
+                    page['blank'] = None  # Unknown until confirmed below
+        candidates = [n for n, page in pages.items() if page['hash'] is not None and page['blank'] is None]
+        for page_number, page_image in session.iter_render(candidates, BLANK_CONFIRM_PROFILE):
+            with page_image:
+                pages[page_number]['blank'] = _confirm_blank(page_image)
+    except Exception as e:
+        logger.warning(f"Could not render thumbnails for {pdf_path}: {str(e)}")
+
+    seen = {}
+    duplicate_pages = {}
+    for page_number, page in pages.items():
+        if page['hash'] is None:
+            # Without a thumbnail, fall back to the text layer so repeated digital pages are still found
+            text = session.page_text(page_number)
+            page['hash'] = hashlib.sha256(text.encode('utf-8')).hexdigest() if text.strip() else None
+        if page['hash'] in seen:
+            duplicate_pages[f'page_{page_number}'] = seen[page['hash']]
+        elif page['hash']:
+            seen[page['hash']] = page_number
+
+    return {
+        'document_id': session.file_hash,
+        'version': PROFILE_VERSION,
+        'status': 'done',
+        'page_count': page_count,
+        'pages': list(pages.values()),
+        'text_layer_pages': [n for n, page in pages.items() if page['text_layer']],
+        'vision_pages': [n for n, page in pages.items() if not page['text_layer'] and not page['blank']],
+        'blank_pages': [n for n, page in pages.items() if page['blank']],
+        'duplicate_pages': duplicate_pages,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+
+class DocumentProfiler:
+    """
+    Profiles uploaded PDFs on a background thread pool and keeps the results with the upload.
+
+    Each profile is <root>/<sha256>.json with thumbnails in <root>/<sha256>/. While a
+    document is being profiled its page count is available as soon as the PDF is parsed.
+    Profiles are kept in memory (the most recent ones) and on disk, so they survive a restart.
+
+    Args:
+        root (str): Directory for profiles and thumbnails
+        max_workers (int): Documents profiled in parallel
+    """
+
+    def __init__(self, root, max_workers):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="profile")
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._profiles = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, file_hash):
+        if not str(file_hash).isalnum():
+            raise KeyError(file_hash)
+        return os.path.join(self.root, f"{file_hash}.json")
+
+    def thumbnail_path(self, file_hash, page_number):
+        """
+        Returns:
+            str: Path of the page's thumbnail, or None if there is none
+        """
+        path = os.path.join(os.path.dirname(self._path(file_hash)), file_hash, f"page_{int(page_number)}.jpeg")
+        return path if os.path.exists(path) else None
+
+    def _remember(self, file_hash, profile):
+        with self._lock:
+            self._profiles[file_hash] = profile
+            self._profiles.move_to_end(file_hash)
+            while len(self._profiles) > 256:
+                self._profiles.popitem(last=False)
+
+    def submit(self, pdf_path, file_hash):
+        """
+        Start profiling a PDF unless it is already profiled or in progress
+
+        A profile that failed (e.g. the file was briefly unreadable) is attempted again.
+
+        Args:
+            pdf_path (str): Path to the PDF
+            file_hash (str): SHA-256 of the PDF
+        """
+        profile = self.get(file_hash, include_pending=False)
+        if profile and profile.get('status') != 'failed':
+            return
+        with self._lock:
+            if file_hash in self._pending:
+                return
+            self._profiles.pop(file_hash, None)  # Any failed attempt
+            self._pending[file_hash] = {'document_id': file_hash, 'status': 'profiling', 'page_count': None}
+        self._executor.submit(self._run, pdf_path, file_hash)
+
+    def _run(self, pdf_path, file_hash):
+        def on_page_count(page_count):
+            with self._lock:
+                self._pending[file_hash]['page_count'] = page_count
+        try:
+            profile = profile_document(pdf_path, os.path.join(self.root, file_hash), on_page_count)
+            temp_path = f"{self._path(file_hash)}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(profile, f)
+            os.replace(temp_path, self._path(file_hash))
+            self._remember(file_hash, profile)
+            logger.info(f"Profiled {file_hash[:12]}: {profile['page_count']} pages, "
+                        f"{len(profile['text_layer_pages'])} with a text layer, {len(profile['blank_pages'])} blank "
+                        f"({profile['seconds']:.2f}s)")
+        except Exception as e:
+            logger.error(f"Error profiling {pdf_path}: {str(e)}")
+            self._remember(file_hash, {'document_id': file_hash, 'status': 'failed', 'error': str(e)})
+        finally:
+            with self._lock:
+                self._pending.pop(file_hash, None)
+
+    def get(self, file_hash, include_pending=True):
+        """
+        Args:
+            file_hash (str): SHA-256 of the PDF
+            include_pending (bool): Return the partial profile ('status': 'profiling') of a document in progress
+
+        Returns:
+            dict: The profile, or None if the document has not been profiled
+        """
+        with self._lock:
+            if file_hash in self._profiles:
+                self._profiles.move_to_end(file_hash)
+                return self._profiles[file_hash]
+            if include_pending and file_hash in self._pending:
+                return dict(self._pending[file_hash])
+        try:
+            with open(self._path(file_hash), 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+        except (OSError, ValueError, KeyError):
+            return None
+        if profile.get('version') != PROFILE_VERSION:
+            return None
+        self._remember(file_hash, profile)
+        return profile
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_document_profiler():
+    """
+    Get the shared document profiler, creating it on first use
+
+    Returns:
+        DocumentProfiler: The shared profiler, or None if profiling is disabled
+    """
+    global _profiler
+    if not DOCUMENT_PROFILE_ENABLED:
+        return None
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = DocumentProfiler(DOCUMENT_PROFILE_DIR, DOCUMENT_PROFILE_WORKERS)
+        return _profiler
+
+
+def get_document_profile(file_hash):
+    """
+    Returns:
+        dict: The finished profile of a document, or None if profiling is disabled, pending or failed
+    """
+    profiler = get_document_profiler()
+    profile = profiler.get(file_hash, include_pending=False) if profiler else None
+    return profile if profile and profile.get('status') == 'done' else None
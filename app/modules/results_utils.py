@@ -0,0 +1,351 @@
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from contextlib import closing
+from modules.mapping_utils import get_mapping_entry
+
+logger = logging.getLogger(__name__)
+
+# Results database settings (override in .env)
+RESULTS_DB_ENABLED = os.getenv("RESULTS_DB_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", os.path.join(tempfile.gettempdir(), 'tax_form_results.sqlite3'))
+
+# Largest page a query endpoint returns
+MAX_QUERY_LIMIT = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_hash TEXT PRIMARY KEY,
+    filename TEXT,
+    filetype TEXT,
+    processed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extracted_values (
+    document_hash TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    gifi_code TEXT NOT NULL,
+    value TEXT,
+    numeric_value REAL,
+    source TEXT,
+    PRIMARY KEY (document_hash, page, gifi_code)
+);
+CREATE INDEX IF NOT EXISTS idx_extracted_code_value ON extracted_values (gifi_code, numeric_value);
+CREATE TABLE IF NOT EXISTS document_pages (
+    document_hash TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    source TEXT,
+    PRIMARY KEY (document_hash, page)
+);
+CREATE TABLE IF NOT EXISTS mapped_values (
+    document_hash TEXT NOT NULL,
+    dictionary TEXT NOT NULL,
+    cell_id TEXT NOT NULL,
+    gifi_code TEXT,
+    page INTEGER,
+    value TEXT,
+    numeric_value REAL,
+    PRIMARY KEY (document_hash, dictionary, cell_id)
+);
+CREATE INDEX IF NOT EXISTS idx_mapped_cell_value ON mapped_values (dictionary, cell_id, numeric_value);
+CREATE INDEX IF NOT EXISTS idx_mapped_code ON mapped_values (gifi_code);
+CREATE TABLE IF NOT EXISTS mapping_warnings (
+    document_hash TEXT NOT NULL,
+    dictionary TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_warnings_document ON mapping_warnings (document_hash, dictionary);
+"""
+
+# Columns each table can be filtered and grouped by; query parameters are checked against these
+TABLE_COLUMNS = {
+    'extracted_values': ['document_hash', 'page', 'gifi_code', 'value', 'numeric_value', 'source'],
+    'mapped_values': ['document_hash', 'dictionary', 'cell_id', 'gifi_code', 'page', 'value', 'numeric_value'],
+}
+GROUP_COLUMNS = {
+    'extracted_values': ['gifi_code', 'document_hash', 'page', 'source'],
+    'mapped_values': ['cell_id', 'dictionary', 'document_hash', 'gifi_code'],
+}
+
+
+def _numeric(value):
+    """Amounts are stored as integer strings after post-processing; anything else has no numeric value"""
+    try:
+        return float(str(value).replace(',', ''))
+    except (TypeError, ValueError):
+        return None
+
+
+class ResultsDatabase:
+    """
+    SQLite store of extracted and mapped values for reporting across documents.
+
+    Each processed document replaces its earlier rows (per page for extracted values, per
+    dictionary for mapped values) in one transaction. Amounts are also stored as numbers so
+    range filters and aggregates use the indexes instead of parsing CSVs.
+
+    Args:
+        path (str): Path to the database file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')  # Readers don't block the pipeline's writes
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per call, so Flask threads, job workers and CLI processes can share the file
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record_results(self, document_hash, filename, filetype, dictionary_name, extracted_data, mapped_data,
+                       mapping_warnings, page_sources=None):
+        """
+        Replace a document's stored values with the output of a pipeline run
+
+        Args:
+            document_hash (str): SHA-256 of the document
+            filename (str, optional): Name of the processed file (kept from an earlier run if None)
+            filetype (str, optional): 'pdf', 'docx' or 'doc' (kept from an earlier run if None)
+            dictionary_name (str): Dictionary the values were mapped with
+            extracted_data (dict): 'page_<n>' -> {GIFI code: value}; every page listed replaces its stored
+                rows, and non-dict entries are skipped
+            mapped_data (dict): Cell ID -> value
+            mapping_warnings (list): Mapping warnings for this dictionary
+            page_sources (dict, optional): 'page_<n>' -> 'text' or 'vision'
+        """
+        page_sources = page_sources or {}
+        extracted_rows = []
+        code_pages = {}
+        pages = set()
+        for key, page_data in extracted_data.items():
+            if not key.startswith('page_'):
+                continue
+            page = int(key[len('page_'):])
+            pages.add(page)  # Replaced even if the page now extracts nothing
+            if not isinstance(page_data, dict):
+                continue
+            for code, value in page_data.items():
+                extracted_rows.append((document_hash, page, str(code), value, _numeric(value), page_sources.get(key)))
+                code_pages[str(code)] = page
+
+        # Find the GIFI code (and its page) behind each cell so cells can be traced back to the statement
+        mapping = get_mapping_entry(dictionary_name)['mapping']
+        cell_codes = {mapping[code]: code for code in code_pages if code in mapping}
+        mapped_rows = [
+            (document_hash, dictionary_name, cell_id, cell_codes.get(cell_id),
+             code_pages.get(cell_codes.get(cell_id)), value, _numeric(value))
+            for cell_id, value in mapped_data.items()
+        ]
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT INTO documents (document_hash, filename, filetype, processed_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (document_hash) DO UPDATE SET processed_at = excluded.processed_at, '
+                'filename = COALESCE(excluded.filename, filename), filetype = COALESCE(excluded.filetype, filetype)',
+                (document_hash, filename, filetype, time.time())
+            )
+            conn.executemany(
+                'DELETE FROM extracted_values WHERE document_hash = ? AND page = ?',
+                [(document_hash, page) for page in sorted(pages)]
+            )
+            conn.executemany('INSERT INTO extracted_values VALUES (?, ?, ?, ?, ?, ?)', extracted_rows)
+            conn.executemany(
+                'INSERT OR REPLACE INTO document_pages VALUES (?, ?, ?)',
+                [(document_hash, page, page_sources.get(f'page_{page}')) for page in sorted(pages)]
+            )
+            conn.execute('DELETE FROM mapped_values WHERE document_hash = ? AND dictionary = ?',
+                         (document_hash, dictionary_name))
+            conn.executemany('INSERT INTO mapped_values VALUES (?, ?, ?, ?, ?, ?, ?)', mapped_rows)
+            conn.execute('DELETE FROM mapping_warnings WHERE document_hash = ? AND dictionary = ?',
+                         (document_hash, dictionary_name))
+            conn.executemany('INSERT INTO mapping_warnings VALUES (?, ?, ?)',
+                             [(document_hash, dictionary_name, message) for message in mapping_warnings])
+        logger.info(f"Stored {len(extracted_rows)} extracted and {len(mapped_rows)} mapped values "
+                    f"for {document_hash[:12]} ({dictionary_name})")
+
+    @staticmethod
+    def _where(table, filters, min_value=None, max_value=None):
+        """
+        Build a WHERE clause from equality filters and an amount range
+
+        Raises:
+            ValueError: If a filter is not a column of the table
+        """
+        clauses = []
+        params = []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            if column not in TABLE_COLUMNS[table]:
+                raise ValueError(f"Cannot filter {table} by {column}")
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        if min_value is not None:
+            clauses.append('numeric_value >= ?')
+            params.append(min_value)
+        if max_value is not None:
+            clauses.append('numeric_value <= ?')
+            params.append(max_value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def query(self, table, filters=None, min_value=None, max_value=None, limit=100, offset=0):
+        """
+        Page through stored values
+
+        Args:
+            table (str): 'extracted_values' or 'mapped_values'
+            filters (dict, optional): Column -> value equality filters (None values are ignored)
+            min_value (float, optional): Smallest amount to include
+            max_value (float, optional): Largest amount to include
+            limit (int): Rows per page (at most MAX_QUERY_LIMIT)
+            offset (int): Rows to skip
+
+        Returns:
+            dict: total (matching rows), limit, offset, next_offset (None on the last page) and rows
+
+        Raises:
+            ValueError: If the table or a filter column is unknown
+        """
+        if table not in TABLE_COLUMNS:
+            raise ValueError(f"Unknown table: {table}")
+        where, params = self._where(table, filters or {}, min_value, max_value)
+        limit = max(1, min(int(limit), MAX_QUERY_LIMIT))
+        offset = max(0, int(offset))
+        order = 'document_hash, page, gifi_code' if table == 'extracted_values' else 'document_hash, dictionary, cell_id'
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {', '.join(TABLE_COLUMNS[table])} FROM {table}{where} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return self._page(total, limit, offset, [dict(row) for row in rows])
+
+    def aggregate(self, table, group_by, filters=None, min_value=None, max_value=None, limit=100, offset=0):
+        """
+        Count, sum, min, max and average amounts per group
+
+        Args:
+            table (str): 'extracted_values' or 'mapped_values'
+            group_by (str): Column to group by (see GROUP_COLUMNS)
+            filters, min_value, max_value, limit, offset: As for query()
+
+        Returns:
+            dict: total (groups), limit, offset, next_offset and rows ordered by group
+
+        Raises:
+            ValueError: If the table, group column or a filter column is unknown
+        """
+        if table not in GROUP_COLUMNS:
+            raise ValueError(f"Unknown table: {table}")
+        if group_by not in GROUP_COLUMNS[table]:
+            raise ValueError(f"Cannot group {table} by {group_by}; use one of {', '.join(GROUP_COLUMNS[table])}")
+        where, params = self._where(table, filters or {}, min_value, max_value)
+        limit = max(1, min(int(limit), MAX_QUERY_LIMIT))
+        offset = max(0, int(offset))
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(DISTINCT {group_by}) FROM {table}{where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {group_by}, COUNT(*) AS count, COUNT(DISTINCT document_hash) AS documents, "
+                f"SUM(numeric_value) AS sum, MIN(numeric_value) AS min, MAX(numeric_value) AS max, "
+                f"AVG(numeric_value) AS avg FROM {table}{where} GROUP BY {group_by} ORDER BY {group_by} "
+                f"LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return self._page(total, limit, offset, [dict(row) for row in rows])
+
+    def extracted_pages(self, document_hash):
+        """
+        A document's stored page results, in the shape of page checkpoints (see checkpoint_utils)
+
+        Args:
+            document_hash (str): SHA-256 of the document
+
+        Returns:
+            dict: page number -> {'data': {GIFI code: value}, 'source'} for every recorded page
+        """
+        with closing(self._connect()) as conn:
+            pages = {
+                row['page']: {'data': {}, 'source': row['source']}
+                for row in conn.execute('SELECT page, source FROM document_pages WHERE document_hash = ?',
+                                        (document_hash,))
+            }
+            for row in conn.execute('SELECT page, gifi_code, value, source FROM extracted_values '
+                                    'WHERE document_hash = ? ORDER BY page, rowid', (document_hash,)):
+                pages.setdefault(row['page'], {'data': {}, 'source': row['source']})['data'][row['gifi_code']] = row['value']
+        return pages
+
+    def documents(self, limit=100, offset=0):
+        """
+        Returns:
+            dict: Paged documents, most recently processed first, with their dictionaries and value counts
+        """
+        limit = max(1, min(int(limit), MAX_QUERY_LIMIT))
+        offset = max(0, int(offset))
+        with closing(self._connect()) as conn:
+            total = conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+            rows = conn.execute(
+                "SELECT d.document_hash, d.filename, d.filetype, d.processed_at, "
+                "(SELECT COUNT(*) FROM extracted_values e WHERE e.document_hash = d.document_hash) AS extracted_values, "
+                "(SELECT GROUP_CONCAT(DISTINCT m.dictionary) FROM mapped_values m "
+                "WHERE m.document_hash = d.document_hash) AS dictionaries "
+                "FROM documents d ORDER BY d.processed_at DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        documents = []
+        for row in rows:
+            document = dict(row)
+            document['dictionaries'] = sorted(document['dictionaries'].split(',')) if document['dictionaries'] else []
+            documents.append(document)
+        return self._page(total, limit, offset, documents)
+
+    @staticmethod
+    def _page(total, limit, offset, rows):
+        return {
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'next_offset': offset + limit if offset + limit < total else None,
+            'rows': rows
+        }
+
+
+_results_db = None
+_results_db_lock = threading.Lock()
+
+
+def get_results_db():
+    """
+    Get the shared results database, creating its schema on first use
+
+    Returns:
+        ResultsDatabase: The shared database, or None if the results database is disabled
+    """
+    global _results_db
+    if not RESULTS_DB_ENABLED:
+        return None
+    with _results_db_lock:
+        if _results_db is None:
+            _results_db = ResultsDatabase(RESULTS_DB_PATH)
+        return _results_db
+
+
+def record_pipeline_results(document_hash, filename, filetype, dictionary_name, extracted_data, mapped_data,
+                            mapping_warnings, page_sources=None):
+    """
+    Store a pipeline run's values if the results database is enabled. Storage errors are
+    logged rather than raised so reporting never fails a document that was processed.
+    """
+    results_db = get_results_db()
+    if not results_db:
+        return
+    try:
+        results_db.record_results(document_hash, filename, filetype, dictionary_name, extracted_data, mapped_data,
+                                  mapping_warnings, page_sources)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Could not store results for {document_hash[:12]}: {str(e)}")
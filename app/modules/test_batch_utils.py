@@ -0,0 +1,65 @@
+import io
+import time
+import zipfile
+import pytest
+from benchmarks.synthetic import statement_rows, write_text_pdf
+from modules import checkpoint_utils, results_utils
+from modules.batch_utils import BatchLimitError, run_batch, store_archive, store_document
+from modules.job_utils import JobManager
+from modules.upload_utils import UploadStore
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, content in members.items():
+            zf.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+def test_store_archive_flattens_and_skips_unsupported(tmp_path):
+    store = UploadStore(str(tmp_path))
+    archive = make_zip({
+        'client/a.pdf': b'%PDF-a',
+        'client/2024/b.DOCX': b'docx',
+        'notes.txt': b'text',
+        '__MACOSX/client/._a.pdf': b'resource fork',
+        'copy/a.pdf': b'%PDF-a'
+    })
+    entries = store_archive(archive, store)
+    assert [(entry['filename'], entry['status']) for entry in entries] == [
+        ('a.pdf', 'stored'), ('b.DOCX', 'stored'), ('notes.txt', 'skipped'), ('a.pdf', 'stored')
+    ]
+    assert entries[0]['document_id'] == entries[3]['document_id']
+    assert entries[1]['filetype'] == 'docx'
+    assert open(entries[0]['path'], 'rb').read() == b'%PDF-a'
+
+def test_store_archive_limits(tmp_path):
+    store = UploadStore(str(tmp_path))
+    with pytest.raises(BatchLimitError):
+        store_archive(make_zip({'a.pdf': b'a', 'b.pdf': b'b'}), store, max_files=1)
+    with pytest.raises(BatchLimitError):
+        store_archive(make_zip({'a.pdf': b'0' * 10000}), store, max_uncompressed_bytes=1000)
+    with pytest.raises(zipfile.BadZipFile):
+        store_archive(io.BytesIO(b'not a zip'), store)
+
+def test_batch_job_reports_each_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint_utils, 'PAGE_CHECKPOINT_ENABLED', False)
+    monkeypatch.setattr(results_utils, 'RESULTS_DB_ENABLED', False)
+    store = UploadStore(str(tmp_path / 'store'))
+    entries = []
+    for seed in (1, 2):
+        path = str(tmp_path / f'statement_{seed}.pdf')
+        write_text_pdf(path, statement_rows(1, seed=seed))
+        with open(path, 'rb') as f:
+            entries.append(store_document(store, f, f'statement_{seed}.pdf'))
+    entries.append(store_document(store, io.BytesIO(b'text'), 'notes.txt'))
+
+    job = JobManager(max_workers=1).submit(run_batch, entries=entries, save_directory=str(tmp_path))
+    deadline = time.time() + 30
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.05)
+    assert job.state == 'done'
+    assert (job.documents_done, job.documents_total) == (2, 2)
+    done = [event['data'] for event in job.events if event['event'] == 'document_done']
+    assert sorted(data['filename'] for data in done) == ['statement_1.pdf', 'statement_2.pdf']
+    assert job.result['totals'] == {'done': 2, 'partial': 0, 'failed': 0, 'skipped': 1}
@@ -0,0 +1,53 @@
+import json
+import base64
+import pytest
+import requests
+from PIL import Image
+from benchmarks.fake_openai import FakeOpenAIServer
+from modules.buffer_utils import PageImage, JSONStreamBody
+
+def make_page(spool_bytes=None):
+    page = PageImage('image/png', (64, 64), 1, spool_bytes=spool_bytes)
+    Image.linear_gradient('L').resize((64, 64)).save(page, format='PNG')
+    return page
+
+def test_page_image_spills_to_disk_and_is_memory_mapped():
+    in_memory = make_page()
+    spilled = make_page(spool_bytes=100)
+    assert not in_memory.spilled
+    assert spilled.spilled
+    with in_memory.view() as a, spilled.view() as b:
+        assert bytes(a) == bytes(b)
+    with spilled.open() as image:
+        assert image.size == (64, 64)
+    in_memory.close()
+    spilled.close()
+    with pytest.raises(ValueError):
+        spilled.view()
+
+def test_streamed_body_matches_json_encoding():
+    with make_page() as page:
+        payload = {'messages': [{'content': [{'type': 'text', 'text': 'x'}, {'image_url': {'url': page}}]}]}
+        body = JSONStreamBody(payload)
+        data = body.getvalue()
+        assert len(body) == len(data)
+        url = json.loads(data)['messages'][0]['content'][1]['image_url']['url']
+        with page.view() as raw:
+            assert url == 'data:image/png;base64,' + base64.b64encode(raw).decode('ascii')
+        # Small reads and a rewind give the same bytes
+        chunks = []
+        while True:
+            chunk = body.read(1000)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        assert b''.join(chunks) == data
+        body.seek(0)
+        assert body.read() == data
+
+def test_streamed_body_is_sent_with_content_length():
+    with make_page() as page, FakeOpenAIServer() as fake:
+        body = JSONStreamBody({'model': 'm', 'messages': [{'role': 'user', 'content': [{'image_url': {'url': page}}]}]})
+        response = requests.post(fake.url, data=body, headers={'Content-Type': 'application/json'})
+        assert response.status_code == 200
+        assert fake.stats()['bytes_received'] == len(body)
@@ -0,0 +1,40 @@
+import os
+import time
+from modules.cache_utils import VisionCache, make_cache_key
+
+def test_cache_key_depends_on_every_part():
+    base = make_cache_key(b'image', 'gpt-4o', 'prompt', 1)
+    assert base == make_cache_key(b'image', 'gpt-4o', 'prompt', 1)
+    assert base != make_cache_key(b'image2', 'gpt-4o', 'prompt', 1)
+    assert base != make_cache_key(b'image', 'gpt-4o-mini', 'prompt', 1)
+    assert base != make_cache_key(b'image', 'gpt-4o', 'prompt', 2)
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = VisionCache(str(tmp_path), 1024 * 1024)
+    key = make_cache_key(b'page', 'model')
+    assert cache.get(key) is None
+    cache.set(key, {'1000': '123'})
+    assert cache.get(key) == {'1000': '123'}
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+def test_cache_persists_across_instances(tmp_path):
+    key = make_cache_key(b'page', 'model')
+    VisionCache(str(tmp_path), 1024 * 1024).set(key, {'2599': '0'})
+    assert VisionCache(str(tmp_path), 1024 * 1024).get(key) == {'2599': '0'}
+
+def test_lru_eviction(tmp_path):
+    value = {'1000': 'x' * 200}
+    cache = VisionCache(str(tmp_path), 800)
+    keys = [make_cache_key(str(i).encode()) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.set(key, value)
+        os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    # Touch the oldest entry so the second one becomes least recently used
+    assert cache.get(keys[0]) is not None
+    cache.set(keys[2], value)
+    cache.set(make_cache_key(b'overflow'), value)
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.stats()['size_bytes'] <= 800
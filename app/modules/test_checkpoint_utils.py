@@ -0,0 +1,55 @@
+import os
+import time
+from modules.checkpoint_utils import PageCheckpointStore
+
+def test_completed_pages_skip_failures(tmp_path):
+    store = PageCheckpointStore(str(tmp_path), 'v1', 3600)
+    store.save_result('abc', 1, {'1000': '5'}, 'text')
+    store.save_failure('abc', 2, 'timeout')
+    completed = store.completed_pages('abc', [1, 2, 3])
+    assert list(completed) == [1]
+    assert completed[1]['data'] == {'1000': '5'}
+    assert completed[1]['source'] == 'text'
+    assert store.load('abc', 2) is None
+    assert store.load('abc', 2, include_failed=True)['error'] == 'timeout'
+
+def test_failure_never_overwrites_a_result(tmp_path):
+    store = PageCheckpointStore(str(tmp_path), 'v1', 3600)
+    store.save_failure('abc', 1, 'timeout')
+    store.save_result('abc', 1, {'1000': '5'}, 'vision')
+    store.save_failure('abc', 1, 'rate limited')
+    record = store.load('abc', 1)
+    assert record['status'] == 'done'
+    assert record['attempts'] == 2
+    assert store.document_status('abc') == {
+        'page_1': {'status': 'done', 'source': 'vision', 'error': None, 'attempts': 2}
+    }
+
+def test_other_versions_and_expired_checkpoints_are_ignored(tmp_path):
+    PageCheckpointStore(str(tmp_path), 'v1', 3600).save_result('abc', 1, {'1000': '5'}, 'text')
+    assert PageCheckpointStore(str(tmp_path), 'v2', 3600).load('abc', 1) is None
+
+    store = PageCheckpointStore(str(tmp_path), 'v1', 60)
+    path = store._path('abc', 1)
+    os.utime(path, (time.time() - 120, time.time() - 120))
+    assert store.sweep() == 1
+    assert store.load('abc', 1) is None
+
+def test_changed_extraction_options_re_extract(tmp_path, monkeypatch):
+    from benchmarks.synthetic import statement_rows, write_text_pdf
+    from modules import extraction_utils
+    store = PageCheckpointStore(str(tmp_path / 'checkpoints'), 'v1', 3600)
+    monkeypatch.setattr(extraction_utils, 'get_page_checkpoints', lambda: store)
+    path = str(tmp_path / 'statement.pdf')
+    write_text_pdf(path, statement_rows(2, seed=5))
+
+    def resumed_pages(profile):
+        events = []
+        extraction_utils.extract_pdf_pages(path, [1, 2], profile=profile, on_event=lambda *event: events.append(event))
+        return [details['page'] for event, details in events if details.get('resumed')]
+
+    assert resumed_pages('standard') == []
+    assert resumed_pages('standard') == [1, 2]
+    assert resumed_pages('compact') == []
+    assert resumed_pages({'dpi': 300}) == []
+    assert resumed_pages({'dpi': 300}) == [1, 2]
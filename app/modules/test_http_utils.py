@@ -0,0 +1,99 @@
+import pytest
+import requests
+from benchmarks.fake_openai import FakeOpenAIServer
+from modules.http_utils import RetryingClient, CircuitBreaker, CircuitOpenError, parse_retry_after
+
+def make_client(**kwargs):
+    delays = []
+    kwargs.setdefault('backoff_base', 0.01)
+    client = RetryingClient(sleep=delays.append, **kwargs)
+    return client, delays
+
+def test_keep_alive_reuses_one_connection():
+    client, _ = make_client()
+    with FakeOpenAIServer() as fake:
+        for _ in range(3):
+            assert client.post(fake.url, json={'model': 'm'}).status_code == 200
+        assert fake.stats()['requests'] == 3
+        assert fake.stats()['connections'] == 1
+
+def test_throttled_request_honours_retry_after():
+    client, delays = make_client()
+    with FakeOpenAIServer() as fake:
+        fake.inject_errors(429, count=2, retry_after='2')
+        response = client.post(fake.url, json={})
+        assert response.status_code == 200
+        assert fake.stats()['requests'] == 3
+    assert len(delays) == 2
+    assert all(delay >= 2 for delay in delays)
+    assert client.breaker.failures == 0  # Throttling does not trip the breaker
+
+def test_server_errors_give_up_after_max_retries():
+    client, delays = make_client(max_retries=2)
+    with FakeOpenAIServer() as fake:
+        fake.inject_errors(503, count=5)
+        response = client.post(fake.url, json={})
+        assert response.status_code == 503
+        assert fake.stats()['requests'] == 3
+    assert len(delays) == 2
+    with pytest.raises(requests.HTTPError):
+        response.raise_for_status()
+
+def test_client_errors_are_not_retried():
+    client, delays = make_client()
+    with FakeOpenAIServer() as fake:
+        fake.inject_errors(400)
+        assert client.post(fake.url, json={}).status_code == 400
+        assert fake.stats()['requests'] == 1
+    assert delays == []
+
+def test_slow_responses_time_out_and_retry():
+    client, delays = make_client(max_retries=1, timeout=0.1)
+    with FakeOpenAIServer(latency=0.5) as fake:
+        with pytest.raises(requests.Timeout):
+            client.post(fake.url, json={})
+    assert len(delays) == 1
+
+def test_circuit_opens_after_repeated_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    client, _ = make_client(max_retries=5, breaker=breaker)
+    with FakeOpenAIServer() as fake:
+        fake.inject_errors(500, count=10)
+        with pytest.raises(CircuitOpenError):
+            client.post(fake.url, json={})
+        assert fake.stats()['requests'] == 3
+        with pytest.raises(CircuitOpenError):
+            client.post(fake.url, json={})
+        assert fake.stats()['requests'] == 3
+    assert breaker.state == 'open'
+
+def test_half_open_trial_closes_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == 'half_open'
+    client, _ = make_client(breaker=breaker)
+    with FakeOpenAIServer() as fake:
+        assert client.post(fake.url, json={}).status_code == 200
+    assert breaker.state == 'closed'
+
+def test_throttled_half_open_trial_releases_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    client, _ = make_client(max_retries=0, breaker=breaker)
+    with FakeOpenAIServer() as fake:
+        fake.inject_errors(429, count=1)
+        assert client.post(fake.url, json={}).status_code == 429
+        assert breaker.state == 'half_open'
+        assert client.post(fake.url, json={}).status_code == 200
+    assert breaker.state == 'closed'
+    client.session.post = lambda *args, **kwargs: 1 / 0
+    breaker.record_failure()
+    with pytest.raises(ZeroDivisionError):
+        client.post('http://unused', json={})
+    assert not breaker._trial_in_flight
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
@@ -0,0 +1,55 @@
+import numpy as np
+from PIL import Image
+from modules.buffer_utils import PageImage
+from modules.image_utils import find_content_bbox, locate_gifi_columns, crop_page_image
+
+def word(text, x0, top, width=30):
+    return {'text': text, 'x0': x0, 'x1': x0 + width, 'top': top, 'bottom': top + 10}
+
+# Letter page in points: code at x=72, description, Current Year at x=400, Prior Year at x=500
+STATEMENT_WORDS = [
+    word('Current', 400, 100), word('Year', 432, 100), word('Prior', 500, 100), word('Year', 532, 100),
+    word('1001', 72, 130), word('Cash', 110, 130), word('12,500', 400, 130), word('11,000', 500, 130),
+    word('1741', 72, 150), word('Amortization', 110, 150, 60), word('(3,200)', 400, 150), word('(2,900)', 500, 150),
+    word('3600', 72, 170), word('Retained', 110, 170, 45), word('9,300', 400, 170), word('8,100', 500, 170),
+]
+
+def test_content_bbox_ignores_specks():
+    gray = np.full((100, 80), 255, dtype=np.uint8)
+    gray[20:40, 10:50] = 0
+    gray[90, 75] = 0  # Single speck
+    assert find_content_bbox(gray) == (10, 20, 50, 40)
+    assert find_content_bbox(np.full((10, 10), 255, dtype=np.uint8)) is None
+
+def test_locate_gifi_columns():
+    code_box, value_box = locate_gifi_columns(STATEMENT_WORDS)
+    assert code_box == (72, 100, 102, 180)
+    assert value_box == (400, 100, 462, 180)
+    assert locate_gifi_columns(STATEMENT_WORDS[4:]) is None  # No Current Year header
+
+def test_trim_whitespace():
+    pixels = np.full((1100, 850), 255, dtype=np.uint8)
+    pixels[200:500, 100:700] = 0
+    page = PageImage.from_pil(Image.fromarray(pixels))
+    cropped, stats = crop_page_image(page, profile={'dpi': 100})
+    assert stats['method'] == 'trim'
+    assert stats['cropped_pixels'] < stats['original_pixels'] / 2
+    assert stats['cropped_bytes'] <= stats['original_bytes']
+    assert cropped.size == (600 + 2 * 11, 300 + 2 * 11)
+    with cropped.open() as image:
+        assert image.size == cropped.size
+
+def test_column_crop_uses_word_boxes():
+    page = PageImage.from_pil(Image.new('RGB', (1224, 1584), 'white'))  # 612x792 pt page at 2 px/pt
+    cropped, stats = crop_page_image(page, STATEMENT_WORDS, (612, 792))
+    assert stats['method'] == 'columns'
+    with cropped.open() as image:
+        assert image.mode == 'RGB'
+        assert image.width < 1224 / 4
+        assert image.height < 1584 / 4
+
+def test_blank_page_is_sent_unchanged():
+    page = PageImage.from_pil(Image.new('L', (200, 300), 255))
+    cropped, stats = crop_page_image(page)
+    assert cropped is page
+    assert stats['method'] == 'none'
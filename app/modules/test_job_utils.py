@@ -0,0 +1,22 @@
+import time
+from modules.job_utils import Job, JobManager
+
+def test_events_resume_after_last_seen():
+    job = Job()
+    job.update('extracting', pages_total=2)
+    job.progress('page_extracted', {'page': 1, 'data': {'1000': 5.0}})
+    job.update('done', result={'csv_filename': 'out.csv'})
+    messages = list(job.stream_events(after=1))
+    assert [message.split('\n')[1] for message in messages] == ['event: page_extracted', 'event: done']
+
+def test_reconnect_after_finished_job_ends_stream():
+    manager = JobManager(max_workers=1)
+    job = manager.submit(lambda progress: {'ok': True})
+    deadline = time.time() + 5
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    last_event_id = job.events[-1]['id']
+    start = time.perf_counter()
+    assert list(job.stream_events(after=last_event_id)) == []
+    assert list(job.stream_events(after=last_event_id + 5)) == []
+    assert time.perf_counter() - start < 1
@@ -50,3 +50,27 @@ def test_invalid_mapping_structure(tmp_path):
             load_mapping('BAD')
     finally:
         mapping_utils.Path = mapping_utils.Path.__class__
+
+def test_mapping_registry_uses_sidecar_and_mtime(tmp_path, monkeypatch):
+    import pandas as pd
+    from modules import mapping_utils
+    monkeypatch.setattr(mapping_utils, 'MAPPING_DIR', tmp_path)
+    monkeypatch.setattr(mapping_utils, '_registry', {})
+    xlsx = tmp_path / 'TEST_map.xlsx'
+    pd.DataFrame({'cell': ['A1', 'A2'], 'code': ['1000', '1001']}).to_excel(xlsx, index=False)
+
+    assert mapping_utils.load_mapping('TEST') == {'1000': 'A1', '1001': 'A2'}
+    assert (tmp_path / 'TEST_map.index.json').exists()
+
+    # A fresh process loads from the sidecar without parsing Excel
+    parse_xlsx = mapping_utils._parse_mapping_xlsx
+    monkeypatch.setattr(mapping_utils, '_registry', {})
+    monkeypatch.setattr(mapping_utils, '_parse_mapping_xlsx', lambda path: pytest.fail('XLSX parsed despite sidecar'))
+    assert mapping_utils.load_mapping('TEST')['1001'] == 'A2'
+
+    # Editing the workbook invalidates the compiled entry
+    monkeypatch.setattr(mapping_utils, '_parse_mapping_xlsx', parse_xlsx)
+    pd.DataFrame({'cell': ['B1'], 'code': ['1000']}).to_excel(xlsx, index=False)
+    os.utime(xlsx, ns=(0, 10 ** 9))
+    assert mapping_utils.load_mapping('TEST') == {'1000': 'B1'}
+    assert list(mapping_utils.list_available_mappings()) == ['TEST']
@@ -0,0 +1,52 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from modules import metrics_utils
+from modules.metrics_utils import Counter, Gauge, Histogram, span, collect_timings, STAGE_SECONDS
+
+def test_counter_and_gauge_render():
+    counter = Counter('test_pages_total', 'Pages seen', ['source'])
+    counter.inc(source='text')
+    counter.inc(2, source='vision "hi"\n')
+    gauge = Gauge('test_in_flight', 'Work in flight')
+    with gauge.track_inprogress():
+        assert gauge.value() == 1
+    assert gauge.value() == 0
+    text = metrics_utils.render_metrics()
+    assert '# TYPE test_pages_total counter' in text
+    assert 'test_pages_total{source="text"} 1' in text
+    assert 'test_pages_total{source="vision \\"hi\\"\\n"} 2' in text
+    assert 'test_in_flight 0' in text
+    with pytest.raises(ValueError):
+        counter.inc(stage='x')
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('test_latency_seconds', 'Latency', ['stage'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage='render')
+    text = metrics_utils.render_metrics()
+    assert 'test_latency_seconds_bucket{stage="render",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="render",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{stage="render",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{stage="render"} 3' in text
+    assert histogram.value(stage='render') == (3, 5.55)
+
+def test_timings_collected_across_worker_threads():
+    before, _ = STAGE_SECONDS.value(stage='test_stage')
+
+    def work():
+        with span('test_stage'):
+            pass
+
+    with collect_timings() as timings:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for _ in range(3):
+                executor.submit(contextvars.copy_context().run, work)
+        work()
+    assert timings['test_stage']['count'] == 4
+    assert timings['total']['count'] == 1
+    assert STAGE_SECONDS.value(stage='test_stage')[0] == before + 4
+
+    # Outside a collection block spans are only observed in the histogram
+    work()
+    assert timings['test_stage']['count'] == 4
@@ -0,0 +1,70 @@
+import pytest
+from PIL import Image
+from benchmarks.fake_openai import FakeOpenAIServer
+from modules import cache_utils, openai_utils
+from modules.openai_utils import estimate_image_tokens, iter_page_packs, extract_pages_with_vision
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    monkeypatch.setattr(cache_utils, 'VISION_CACHE_ENABLED', False)
+    with FakeOpenAIServer(response={'1000': '125', '3600': '90'}) as fake:
+        monkeypatch.setattr(openai_utils, 'OPENAI_API_URL', fake.url)
+        yield fake
+
+def make_pages(tmp_path, count, size=(1700, 2200)):
+    pages = []
+    for page_number in range(1, count + 1):
+        path = tmp_path / f"p{page_number}.png"
+        Image.new('L', size, 255).save(path)
+        pages.append((page_number, str(path)))
+    return pages
+
+def test_estimate_image_tokens():
+    assert estimate_image_tokens(512, 512) == 255
+    # A letter page at 200 DPI is fitted to 768x994: 2x2 tiles
+    assert estimate_image_tokens(1700, 2200) == 765
+
+def test_packs_respect_size_and_token_budget(tmp_path):
+    pages = make_pages(tmp_path, 5)
+    assert [len(p) for p in iter_page_packs(pages, pack_size=2, token_budget=10000)] == [2, 2, 1]
+    assert [len(p) for p in iter_page_packs(pages, pack_size=5, token_budget=1600)] == [2, 2, 1]
+
+def test_packed_extraction_splits_reply_per_page(tmp_path, fake_api):
+    pages = make_pages(tmp_path, 5)
+    seen = []
+    extracted, errors = extract_pages_with_vision(
+        pages, pack_size=5, token_budget=10000, on_page=lambda n, data, error: seen.append(n)
+    )
+    assert fake_api.stats()['requests'] == 1
+    assert list(extracted) == [f'page_{n}' for n in range(1, 6)]
+    assert extracted['page_3'] == {'1000': '125', '3600': '90'}
+    assert errors == {}
+    assert sorted(seen) == [1, 2, 3, 4, 5]
+
+def test_pages_missing_from_packed_reply_are_retried_alone(tmp_path, fake_api):
+    pages = make_pages(tmp_path, 3)
+
+    def reply(body):
+        # Answer packed requests for page 1 only
+        if body['messages'][0]['content'] == openai_utils.PACKED_SYSTEM_PROMPT:
+            return {'page_1': {'1000': '1'}}
+        return {'1000': '2'}
+
+    fake_api.response = reply
+    fake_api.build_payload = reply
+    extracted, errors = extract_pages_with_vision(pages, pack_size=3, token_budget=10000)
+    assert fake_api.stats()['requests'] == 3
+    assert extracted == {'page_1': {'1000': '1'}, 'page_2': {'1000': '2'}, 'page_3': {'1000': '2'}}
+    assert errors == {}
+
+def test_failed_pack_is_retried_page_by_page(tmp_path, fake_api):
+    pages = make_pages(tmp_path, 3)
+    fake_api.inject_errors(400)
+    seen = []
+    extracted, errors = extract_pages_with_vision(
+        pages, pack_size=3, token_budget=10000, on_page=lambda n, data, error: seen.append((n, error))
+    )
+    assert fake_api.stats()['requests'] == 4
+    assert list(extracted) == ['page_1', 'page_2', 'page_3']
+    assert errors == {}
+    assert sorted(seen) == [(1, None), (2, None), (3, None)]
@@ -0,0 +1,94 @@
+from modules import pdf_utils
+from modules.pdf_utils import group_page_ranges, split_page_ranges
+
+def test_group_page_ranges_merges_contiguous_pages():
+    assert group_page_ranges([7, 1, 2, 3, 5, 6, 2]) == [(1, 3), (5, 7)]
+    assert group_page_ranges([]) == []
+
+def test_split_page_ranges_spreads_work_across_workers():
+    chunks = split_page_ranges([(1, 10), (20, 21)], 4)
+    # Every page is covered exactly once and no chunk exceeds ceil(12 / 4) pages
+    covered = [p for first, last in chunks for p in range(first, last + 1)]
+    assert covered == list(range(1, 11)) + [20, 21]
+    assert all(last - first + 1 <= 3 for first, last in chunks)
+
+def test_split_page_ranges_single_worker_keeps_ranges():
+    assert split_page_ranges([(1, 10), (20, 21)], 1) == [(1, 10), (20, 21)]
+
+def _word(text, x0, top):
+    return {'text': text, 'x0': x0, 'x1': x0 + len(text) * 5, 'top': top}
+
+def test_parse_gifi_words_uses_current_year_column():
+    from modules.pdf_utils import parse_gifi_words
+    words = [
+        _word('Current', 300, 10), _word('Year', 340, 10), _word('Prior', 400, 10), _word('Year', 430, 10),
+        _word('2024', 300, 20), _word('2023', 400, 20),
+        _word('Cash', 10, 30), _word('1001', 100, 30), _word('12,345', 300, 30), _word('9,000', 400, 30),
+        _word('Amortization', 10, 40), _word('1741', 100, 40), _word('(5,000)', 300, 40), _word('(4,000)', 400, 40),
+        _word('Deficit', 10, 50), _word('3600......', 100, 50), _word('$(1,200)', 300, 50), _word('800', 400, 50),
+        _word('Other', 10, 60), _word('8299', 100, 60), _word('-', 305, 60), _word('77', 400, 60),
+    ]
+    values, parenthetical = parse_gifi_words(words)
+    assert values == {'1001': '12345', '1741': '5000', '3600': '1200', '8299': '0'}
+    assert parenthetical == {'1741': True, '3600': True}
+
+def test_parse_gifi_words_without_header_takes_first_amount():
+    from modules.pdf_utils import parse_gifi_words
+    words = [_word('1000......12,345', 10, 10), _word('10,000', 200, 10), _word('Notes', 10, 30), _word('page', 50, 30)]
+    assert parse_gifi_words(words) == ({'1000': '12345'}, {})
+
+def test_text_layer_without_gifi_codes_is_not_trusted():
+    from modules.pdf_utils import evaluate_text_layer, parse_gifi_words
+    dated = [_word('Balance,', 10, 10), _word('December', 60, 10), _word('31', 110, 10), _word('2024', 130, 10),
+             _word('45,000', 300, 10)]
+    assert parse_gifi_words(dated) == ({}, {})
+    # One code-like number among ordinary statement rows
+    words = [_word('Revenue', 10, 10), _word('1200', 100, 10), _word('45,000', 300, 10),
+             _word('Salaries', 10, 20), _word('(30,000)', 300, 20),
+             _word('Rent', 10, 30), _word('12,000', 300, 30),
+             _word('Net', 10, 40), _word('income', 40, 40), _word('3,000', 300, 40)]
+    assert parse_gifi_words(words) == ({'1200': '45000'}, {})
+    assert evaluate_text_layer(words, 200) is None
+    coded = [_word('Cash', 10, 10), _word('1001', 100, 10), _word('12,345', 300, 10),
+             _word('Inventory', 10, 20), _word('1120', 100, 20), _word('(500)', 300, 20),
+             _word('Total', 10, 30), _word('11,845', 300, 30)]
+    assert evaluate_text_layer(coded, 200) == ({'1001': '12345', '1120': '500'}, {'1120': True})
+
+def test_render_profiles_are_validated():
+    import pytest
+    assert pdf_utils.get_render_profile('Compact')['dpi'] == 150
+    custom = pdf_utils.get_render_profile({'dpi': 2400, 'format': 'JPEG', 'quality': 500})
+    assert (custom['dpi'], custom['format'], custom['quality']) == (600, 'jpeg', 100)
+    for profile in (5, ['standard'], 'huge', {'format': 'tiff'}, {'dpi': 'high'}, {'output_folder': '/tmp'}):
+        with pytest.raises(ValueError):
+            pdf_utils.get_render_profile(profile)
+
+def test_rendering_is_held_back_by_the_consumer(monkeypatch):
+    from PIL import Image
+    from modules.buffer_utils import PageImage
+    started = []
+
+    def render(pdf_path, first_page, last_page, poppler_path, profile):
+        started.extend(range(first_page, last_page + 1))
+        return [(page, PageImage.from_pil(Image.new('L', (4, 4)))) for page in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(pdf_utils, '_render_page_range', render)
+    assert pdf_utils.pages_per_run(pdf_utils.get_render_profile('standard')) == 1  # 300 DPI colour
+    assert pdf_utils.pages_per_run(pdf_utils.get_render_profile('compact')) == pdf_utils.RENDER_MAX_PAGES_PER_RUN
+    consumed = []
+    for page, page_image in pdf_utils.iter_pdf_images('x.pdf', list(range(1, 11)), max_workers=2, profile='standard'):
+        page_image.close()
+        consumed.append(page)
+        assert len(started) <= len(consumed) + 2
+    assert sorted(consumed) == list(range(1, 11))
+
+def test_poppler_path_is_probed_once(monkeypatch):
+    probes = []
+    monkeypatch.setattr(pdf_utils.os.path, 'isdir', lambda path: probes.append(path) or False)
+    pdf_utils.get_poppler_path.cache_clear()
+    try:
+        assert pdf_utils.get_poppler_path() is None  # Falls back to poppler on PATH
+        assert pdf_utils.get_poppler_path() is None
+        assert len(probes) == 1
+    finally:
+        pdf_utils.get_poppler_path.cache_clear()
@@ -0,0 +1,59 @@
+import pytest
+from modules import pipeline_utils, results_utils
+from modules.checkpoint_utils import PageCheckpointStore
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = PageCheckpointStore(str(tmp_path / 'checkpoints'), 'v1', 3600)
+    monkeypatch.setattr(pipeline_utils, 'get_page_checkpoints', lambda: store)
+    monkeypatch.setattr(results_utils, 'RESULTS_DB_ENABLED', False)
+    return store
+
+def test_remap_uses_stored_pages(store, tmp_path):
+    store.save_result('abc', 1, {'1000': '5'}, 'text')
+    store.save_result('abc', 2, {'3460': '-7', '1234': '1'}, 'vision')
+    store.save_failure('abc', 3, 'timeout')
+    result = pipeline_utils.remap_document('abc', ['GIFI'], str(tmp_path))
+    assert result['pages'] == [1, 2]
+    assert result['missing_pages'] == [3]
+    gifi = result['results']['GIFI']
+    assert gifi['mapped_data'] == {'GFGBA.Ttwgba62': '5', 'GFGIB.Ttwgib34': '-7'}
+    assert gifi['mapping_warnings'] == ['Code 1234 not found in GIFI mapping.']
+    assert open(gifi['csv_path']).read().count('\n') == 3
+
+def test_remap_requires_selected_pages_to_be_stored(store, tmp_path):
+    store.save_result('abc', 1, {'1000': '5'}, 'text')
+    with pytest.raises(pipeline_utils.ExtractionNotStoredError) as excinfo:
+        pipeline_utils.remap_document('abc', ['GIFI'], str(tmp_path), pages=[1, 2])
+    assert excinfo.value.missing_pages == [2]
+    with pytest.raises(pipeline_utils.ExtractionNotStoredError):
+        pipeline_utils.remap_document('unknown', ['GIFI'], str(tmp_path))
+
+def test_remap_records_results(store, tmp_path, monkeypatch):
+    results_db = results_utils.ResultsDatabase(str(tmp_path / 'results.sqlite3'))
+    monkeypatch.setattr(results_utils, 'RESULTS_DB_ENABLED', True)
+    monkeypatch.setattr(results_utils, '_results_db', results_db)
+    store.save_result('abc', 1, {'1000': '5'}, 'text')
+    for value in ('-7', '-9'):
+        store.save_result('abc', 2, {'1000': '5', '3460': value}, 'vision')
+        pipeline_utils.remap_document('abc', ['GIFI'], str(tmp_path))
+    assert results_db.query('extracted_values', {'document_hash': 'abc'})['total'] == 3
+    cells = results_db.query('mapped_values', {'document_hash': 'abc'})['rows']
+    assert {row['cell_id']: row['value'] for row in cells} == {'GFGBA.Ttwgba62': '5', 'GFGIB.Ttwgib34': '-9'}
+
+def test_remap_from_results_database_without_checkpoints(tmp_path, monkeypatch):
+    results_db = results_utils.ResultsDatabase(str(tmp_path / 'results.sqlite3'))
+    monkeypatch.setattr(results_utils, 'RESULTS_DB_ENABLED', True)
+    monkeypatch.setattr(results_utils, '_results_db', results_db)
+    results_db.record_results('abc', 'a.pdf', 'pdf', 'GIFI', {'page_1': {'1000': '5'}, 'page_2': {}},
+                              {'GFGBA.Ttwgba62': '5'}, [], {'page_1': 'text', 'page_2': 'vision'})
+    # Checkpoints expired, were made by another model, or are disabled
+    monkeypatch.setattr(pipeline_utils, 'get_page_checkpoints', lambda: None)
+    result = pipeline_utils.remap_document('abc', ['GIFI'], str(tmp_path))
+    assert result['pages'] == [1, 2]
+    assert result['missing_pages'] == []
+    assert result['page_sources'] == {'page_1': 'text', 'page_2': 'vision'}
+    assert result['results']['GIFI']['mapped_data'] == {'GFGBA.Ttwgba62': '5'}
+    with pytest.raises(pipeline_utils.ExtractionNotStoredError) as excinfo:
+        pipeline_utils.remap_document('abc', ['GIFI'], str(tmp_path), pages=[3])
+    assert excinfo.value.missing_pages == [3]
@@ -0,0 +1,73 @@
+import time
+from benchmarks.synthetic import expected_values, statement_rows, write_text_pdf
+from modules.profile_utils import (
+    BLANK_CANDIDATE_INK_RATIO, BLANK_CONFIRM_PROFILE, THUMBNAIL_PROFILE, DocumentProfiler,
+    _confirm_blank, _ink_ratio, profile_document
+)
+from modules.pdf_utils import encode_page_image, get_render_profile
+
+def test_profile_finds_text_layer_and_repeated_pages(tmp_path):
+    from PyPDF2 import PdfReader, PdfWriter
+    pages = statement_rows(2, seed=1)
+    source = str(tmp_path / 'source.pdf')
+    write_text_pdf(source, pages)
+    # Attach the first page again, as when a schedule is scanned twice
+    writer = PdfWriter()
+    reader = PdfReader(source)
+    for page in [reader.pages[0], reader.pages[1], reader.pages[0]]:
+        writer.add_page(page)
+    path = str(tmp_path / 'statement.pdf')
+    with open(path, 'wb') as f:
+        writer.write(f)
+    counts = []
+    profile = profile_document(path, on_page_count=counts.append)
+    assert counts == [3]
+    assert profile['page_count'] == 3
+    assert profile['text_layer_pages'] == [1, 2, 3]
+    assert profile['vision_pages'] == []
+    assert profile['duplicate_pages'] == {'page_3': 1}
+    assert profile['pages'][0]['gifi_codes'] == len(expected_values([pages[0]]))
+
+def test_profiler_persists_profiles(tmp_path):
+    path = str(tmp_path / 'statement.pdf')
+    write_text_pdf(path, statement_rows(1, seed=2))
+    profiler = DocumentProfiler(str(tmp_path / 'profiles'), 1)
+    profiler.submit(path, 'abc123')
+    deadline = time.time() + 30
+    while not profiler.get('abc123', include_pending=False) and time.time() < deadline:
+        time.sleep(0.05)
+    assert profiler.get('abc123')['status'] == 'done'
+    reloaded = DocumentProfiler(str(tmp_path / 'profiles'), 1).get('abc123')
+    assert reloaded['page_count'] == 1
+    assert DocumentProfiler(str(tmp_path / 'profiles'), 1).get('missing') is None
+
+def scanned_page(dpi, lines):
+    from PIL import Image, ImageDraw
+    image = Image.new('L', (int(8.5 * dpi), int(11 * dpi)), 255)
+    draw = ImageDraw.Draw(image)
+    for number, (text, shade) in enumerate(lines, start=1):
+        draw.text((dpi, number * dpi), text, fill=shade, font_size=max(4, int(10 * dpi / 72)))
+    return image
+
+def test_sparse_and_faint_pages_are_not_blank():
+    sparse = [('Synthetic Holdings Ltd. - Balance sheet', 0), ('1000 Cash and deposits 12,345.00', 0)]
+    faint = [('1000 Cash and deposits 12,345.00', 180)]
+    for lines in (sparse, faint):
+        with encode_page_image(scanned_page(24, lines), get_render_profile(THUMBNAIL_PROFILE)) as thumbnail:
+            assert _ink_ratio(thumbnail) < BLANK_CANDIDATE_INK_RATIO  # Too coarse to tell on its own
+        with encode_page_image(scanned_page(100, lines), get_render_profile(BLANK_CONFIRM_PROFILE)) as page:
+            assert not _confirm_blank(page)
+    with encode_page_image(scanned_page(100, []), get_render_profile(BLANK_CONFIRM_PROFILE)) as page:
+        assert _confirm_blank(page)
+
+def test_failed_profile_is_retried(tmp_path):
+    path = str(tmp_path / 'statement.pdf')
+    profiler = DocumentProfiler(str(tmp_path / 'profiles'), 1)
+    for expected in ('failed', 'done'):
+        if expected == 'done':
+            write_text_pdf(path, statement_rows(1, seed=3))  # The file turns up after the first attempt
+        profiler.submit(path, 'abc123')
+        deadline = time.time() + 30
+        while profiler.get('abc123')['status'] == 'profiling' and time.time() < deadline:
+            time.sleep(0.05)
+        assert profiler.get('abc123')['status'] == expected
@@ -0,0 +1,52 @@
+import pytest
+from modules.results_utils import ResultsDatabase
+
+@pytest.fixture
+def results_db(tmp_path):
+    results_db = ResultsDatabase(str(tmp_path / 'results.sqlite3'))
+    results_db.record_results(
+        'doc1', 'a.pdf', 'pdf', 'GIFI',
+        {'page_1': {'1000': '500', '3460': '-20'}, 'page_2': {'8299': '9000'}},
+        {'GFGBA.Ttwgba62': '500', 'GFGIB.Ttwgib34': '-20'},
+        ['Code 8299 not found in GIFI mapping.'],
+        {'page_1': 'text', 'page_2': 'vision'}
+    )
+    results_db.record_results('doc2', 'b.pdf', 'pdf', 'GIFI', {'page_1': {'8299': '150'}}, {}, [])
+    return results_db
+
+def test_query_filters_and_pages(results_db):
+    page = results_db.query('extracted_values', {'gifi_code': '8299'}, min_value=1000)
+    assert page['total'] == 1
+    assert page['rows'][0] == {'document_hash': 'doc1', 'page': 2, 'gifi_code': '8299', 'value': '9000',
+                               'numeric_value': 9000.0, 'source': 'vision'}
+
+    first = results_db.query('extracted_values', limit=2)
+    assert first['total'] == 4
+    assert first['next_offset'] == 2
+    second = results_db.query('extracted_values', limit=2, offset=first['next_offset'])
+    assert second['next_offset'] is None
+    assert len(first['rows'] + second['rows']) == 4
+
+    cells = results_db.query('mapped_values', {'cell_id': 'GFGIB.Ttwgib34'})
+    assert cells['rows'][0]['gifi_code'] == '3460'
+    assert cells['rows'][0]['page'] == 1
+    with pytest.raises(ValueError):
+        results_db.query('extracted_values', {'cell_id': 'x'})
+
+def test_aggregate_and_reprocessing_replaces_rows(results_db):
+    totals = results_db.aggregate('extracted_values', 'gifi_code', {'gifi_code': '8299'})
+    assert totals['rows'] == [{'gifi_code': '8299', 'count': 2, 'documents': 2, 'sum': 9150.0,
+                               'min': 150.0, 'max': 9000.0, 'avg': 4575.0}]
+
+    results_db.record_results('doc1', None, None, 'GIFI', {'page_2': {'8299': '10'}}, {}, [])
+    assert results_db.query('extracted_values', {'document_hash': 'doc1'})['total'] == 3  # Page 1 kept
+    assert results_db.query('mapped_values', {'document_hash': 'doc1'})['total'] == 0
+    assert results_db.documents()['rows'][0]['filename'] == 'a.pdf'
+
+def test_reprocessing_a_code_repeated_across_pages(tmp_path):
+    results_db = ResultsDatabase(str(tmp_path / 'results.sqlite3'))
+    extracted = {'page_1': {'1000': '5'}, 'page_2': {'1000': '5'}, 'page_3': {'8299': '1'}}
+    results_db.record_results('doc1', 'a.pdf', 'pdf', 'GIFI', extracted, {}, [])
+    results_db.record_results('doc1', 'a.pdf', 'pdf', 'GIFI', {**extracted, 'page_3': {}}, {}, [])
+    rows = results_db.query('extracted_values', {'document_hash': 'doc1'})['rows']
+    assert sorted((row['page'], row['gifi_code']) for row in rows) == [(1, '1000'), (2, '1000')]
@@ -0,0 +1,120 @@
+import io
+import json
+import os
+import hashlib
+import pytest
+from modules.upload_utils import ResumableUploads, UploadOffsetError, UploadStore, UploadVerificationError
+
+def test_same_name_different_content_is_kept_apart(tmp_path):
+    store = UploadStore(str(tmp_path))
+    first = store.save(io.BytesIO(b'%PDF-1 first'), 'statements.pdf')
+    second = store.save(io.BytesIO(b'%PDF-1 second'), 'statements.pdf')
+    assert first['path'] != second['path']
+    assert open(first['path'], 'rb').read() == b'%PDF-1 first'
+    assert first['path'].endswith(hashlib.sha256(b'%PDF-1 first').hexdigest() + '.pdf')
+
+def test_identical_uploads_are_deduplicated(tmp_path):
+    store = UploadStore(str(tmp_path))
+    first = store.save(io.BytesIO(b'same bytes'), 'a.pdf')
+    second = store.save(io.BytesIO(b'same bytes'), 'b.pdf')
+    assert not first['duplicate']
+    assert second['duplicate']
+    assert second['path'] == first['path']
+    entry = UploadStore(str(tmp_path)).get(first['sha256'])  # Index survives a restart
+    assert entry['filenames'] == ['a.pdf', 'b.pdf']
+    assert entry['upload_count'] == 2
+    assert entry['size'] == len(b'same bytes')
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([first['sha256'] + '.pdf', 'uploads.index.json',
+                                                           'uploads.index.json.lock'])
+
+def test_unknown_hash(tmp_path):
+    assert UploadStore(str(tmp_path)).get('0' * 64) is None
+
+class BrokenStream:
+    """Stream that fails after some bytes, like a dropped connection"""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def read(self, size=-1):
+        chunk = self.data.read(4)
+        if not chunk:
+            raise ConnectionError('client went away')
+        return chunk
+
+def test_resumable_upload_resumes_after_interruption(tmp_path):
+    store = UploadStore(str(tmp_path / 'store'))
+    content = b'%PDF-1 ' + bytes(range(256)) * 10
+    uploads = ResumableUploads(str(tmp_path / 'store' / '.resumable'))
+    upload_id = uploads.create('big.pdf', len(content), hashlib.sha256(content).hexdigest())['upload_id']
+    assert uploads.append(upload_id, 0, io.BytesIO(content[:1000]))['offset'] == 1000
+    with pytest.raises(ConnectionError):
+        uploads.append(upload_id, 1000, BrokenStream(content[1000:1500]))
+    # A restarted server rebuilds the running hash from disk
+    uploads = ResumableUploads(str(tmp_path / 'store' / '.resumable'))
+    assert uploads.status(upload_id)['offset'] == 1000
+    with pytest.raises(UploadOffsetError) as excinfo:
+        uploads.append(upload_id, 1500, io.BytesIO(content[1500:]))
+    assert excinfo.value.offset == 1000
+    with pytest.raises(UploadOffsetError):
+        uploads.complete(upload_id, store)
+    chunk = content[1000:]
+    assert uploads.append(upload_id, 1000, io.BytesIO(chunk), hashlib.sha256(chunk).hexdigest())['complete']
+    stored = uploads.complete(upload_id, store)
+    assert stored['sha256'] == hashlib.sha256(content).hexdigest()
+    assert open(stored['path'], 'rb').read() == content
+    with pytest.raises(KeyError):
+        uploads.status(upload_id)
+
+def test_resumable_upload_verification(tmp_path):
+    store = UploadStore(str(tmp_path / 'store'))
+    uploads = ResumableUploads(str(tmp_path / 'store' / '.resumable'))
+    upload_id = uploads.create('a.pdf', 10, hashlib.sha256(b'0123456789').hexdigest())['upload_id']
+    with pytest.raises(UploadVerificationError):
+        uploads.append(upload_id, 0, io.BytesIO(b'01234'), chunk_sha256='0' * 64)
+    with pytest.raises(UploadVerificationError):
+        uploads.append(upload_id, 0, io.BytesIO(b'0123456789abc'))  # Past the declared size
+    assert uploads.status(upload_id)['offset'] == 0
+    uploads.append(upload_id, 0, io.BytesIO(b'0123456780'))
+    with pytest.raises(UploadVerificationError):
+        uploads.complete(upload_id, store)  # Whole-file hash differs, so the upload is discarded
+    with pytest.raises(KeyError):
+        uploads.status(upload_id)
+    with pytest.raises(KeyError):
+        uploads.status('../../etc/passwd')
+
+def test_resumable_upload_shared_by_several_workers(tmp_path):
+    store = UploadStore(str(tmp_path / 'store'))
+    content = bytes(range(256)) * 12
+    # Two web processes serving chunks of the same upload, each with its own running hash
+    first = ResumableUploads(str(tmp_path / 'store' / '.resumable'))
+    second = ResumableUploads(str(tmp_path / 'store' / '.resumable'))
+    upload_id = first.create('big.pdf', len(content), hashlib.sha256(content).hexdigest())['upload_id']
+    first.append(upload_id, 0, io.BytesIO(content[:1000]))
+    second.append(upload_id, 1000, io.BytesIO(content[1000:2000]))
+    first.append(upload_id, 2000, io.BytesIO(content[2000:]))
+    stored = first.complete(upload_id, store)
+    assert stored['sha256'] == hashlib.sha256(content).hexdigest()
+    with pytest.raises(KeyError):
+        second.append(upload_id, len(content), io.BytesIO(b''))
+    assert os.listdir(str(tmp_path / 'store' / '.resumable')) == []
+
+def _store_uploads(root, names):
+    store = UploadStore(root)
+    for name in names:
+        store.save(io.BytesIO(name.encode()), name)
+
+def test_index_is_shared_by_several_processes(tmp_path):
+    import multiprocessing
+    root = str(tmp_path / 'store')
+    workers = [
+        multiprocessing.Process(target=_store_uploads, args=(root, [f'{worker}_{n}.pdf' for n in range(20)]))
+        for worker in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+    index = json.load(open(os.path.join(root, 'uploads.index.json')))
+    assert len(index) == 80
@@ -0,0 +1,439 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl  # POSIX only; without it uploads are only serialized within one process
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from an upload stream per iteration
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Metadata index kept alongside the stored files
+INDEX_FILENAME = 'uploads.index.json'
+
+# Chunk size suggested to resumable upload clients; each chunk must fit under MAX_CONTENT_LENGTH
+RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Resumable uploads with no new chunk for this long are discarded (override in .env)
+RESUMABLE_UPLOAD_MAX_AGE_HOURS = float(os.getenv("RESUMABLE_UPLOAD_MAX_AGE_HOURS", "24"))
+
+
+class UploadStore:
+    """
+    Content-addressed store for uploaded documents.
+
+    Each upload is streamed to disk while it is hashed and kept as <sha256>.<ext>, so
+    identical files are stored once and two clients uploading 'statements.pdf' never
+    overwrite each other. A JSON index records every original filename, the size and
+    upload times per document; updates to it hold an exclusive lock on <index>.lock, so
+    several web workers can share the store.
+
+    Args:
+        root (str): Directory holding the stored files and the index
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, file_hash, extension):
+        """
+        Args:
+            file_hash (str): SHA-256 hex digest of the document
+            extension (str): File extension without the dot
+
+        Returns:
+            str: Path the document is stored under
+        """
+        return os.path.join(self.root, f"{file_hash}.{extension.lower()}")
+
+    def save(self, stream, filename):
+        """
+        Store an upload, hashing it as it is written
+
+        Args:
+            stream (file-like): Readable binary stream with the upload's contents
+            filename (str): Sanitized original filename (its extension is kept)
+
+        Returns:
+            dict: Index entry for the document, plus 'path' and 'duplicate'
+        """
+        digest = hashlib.sha256()
+        size = 0
+        os.makedirs(self.root, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix='.upload_', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            return self.add_file(temp_path, digest.hexdigest(), size, filename)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def add_file(self, temp_path, file_hash, size, filename):
+        """
+        Move an already hashed file into the store (it is removed if the content is already stored)
+
+        Args:
+            temp_path (str): File to take over; must be on the same filesystem as the store
+            file_hash (str): SHA-256 hex digest of its contents
+            size (int): Size in bytes
+            filename (str): Sanitized original filename (its extension is kept)
+
+        Returns:
+            dict: Index entry for the document, plus 'path' and 'duplicate'
+        """
+        extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+        path = self.path_for(file_hash, extension)
+        duplicate = os.path.exists(path)
+        if duplicate:
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+        entry = self.record(file_hash, extension, size, filename)
+        logger.info(f"Stored upload {filename} as {os.path.basename(path)}" + (" (duplicate)" if duplicate else ""))
+        return {**entry, 'path': path, 'duplicate': duplicate}
+
+    def record(self, file_hash, extension, size, filename):
+        """
+        Add an upload of a stored document to the index
+
+        Args:
+            file_hash (str): SHA-256 hex digest of the document
+            extension (str): File extension without the dot
+            size (int): Size in bytes
+            filename (str): Original filename for this upload
+
+        Returns:
+            dict: The document's index entry
+        """
+        now = time.time()
+        with self._index_lock():
+            index = self._load()
+            entry = index.setdefault(file_hash, {
+                'sha256': file_hash,
+                'extension': extension,
+                'size': size,
+                'filenames': [],
+                'first_uploaded_at': now,
+                'upload_count': 0
+            })
+            if filename not in entry['filenames']:
+                entry['filenames'].append(filename)
+            entry['last_uploaded_at'] = now
+            entry['upload_count'] += 1
+            self._write(index)
+            return dict(entry)
+
+    def get(self, file_hash):
+        """
+        Args:
+            file_hash (str): SHA-256 hex digest of the document
+
+        Returns:
+            dict: Index entry plus 'path', or None if the document is not stored
+        """
+        with self._lock:
+            entry = self._load().get(file_hash)
+        if not entry:
+            return None
+        path = self.path_for(file_hash, entry['extension'])
+        return {**entry, 'path': path} if os.path.exists(path) else None
+
+    @contextmanager
+    def _index_lock(self):
+        """Serialize index updates across threads and (where fcntl exists) processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.index_path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)  # Released when the file is closed
+                yield
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.warning(f"Upload index {self.index_path} is unreadable, starting a new one: {str(e)}")
+            return {}
+
+    def _write(self, index):
+        """Replace the index atomically (lock held); readers see either the old or the new file"""
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix=f".{INDEX_FILENAME}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(index, f, indent=2)
+            os.replace(temp_path, self.index_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+class UploadOffsetError(ValueError):
+    """Raised when a chunk does not start at the upload's confirmed offset, or an incomplete upload is finished"""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadVerificationError(ValueError):
+    """Raised when a chunk or a finished upload does not match its declared size or SHA-256"""
+
+
+class ResumableUploads:
+    """
+    Chunked uploads written straight to disk, resumable after a dropped connection or a restart.
+
+    Each upload in progress is <root>/<upload id>.part plus a .json file with its filename,
+    declared size and optional SHA-256. The confirmed offset is the size of the .part file:
+    a chunk is streamed to the end of it UPLOAD_CHUNK_SIZE bytes at a time, synced to disk and
+    only then acknowledged; a chunk that fails verification or is cut off is truncated away.
+    The SHA-256 of the data so far is updated as chunks arrive, so finishing an upload never
+    re-reads it; it is rebuilt from the .part file when another process (or a restart) has
+    changed the file since. Chunks and completion for one upload are serialized with an
+    exclusive lock on <upload id>.lock, so several web workers can serve the same upload.
+    Memory use is one read buffer per request, whatever the file size.
+
+    Args:
+        root (str): Directory for uploads in progress; must be on the same filesystem as the UploadStore
+        max_age_seconds (float, optional): Uploads idle for longer are removed by sweep()
+            (default: RESUMABLE_UPLOAD_MAX_AGE_HOURS)
+    """
+
+    def __init__(self, root, max_age_seconds=None):
+        self.root = root
+        self.max_age_seconds = (max_age_seconds if max_age_seconds is not None
+                                else RESUMABLE_UPLOAD_MAX_AGE_HOURS * 3600)
+        self._lock = threading.Lock()
+        self._upload_locks = {}
+        self._digests = {}  # upload id -> (offset, SHA-256 of the first offset bytes)
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, upload_id):
+        if not re.fullmatch(r'[0-9a-f]{32}', str(upload_id)):
+            raise KeyError(upload_id)
+        base = os.path.join(self.root, upload_id)
+        return f"{base}.part", f"{base}.json"
+
+    @contextmanager
+    def _upload_lock(self, upload_id):
+        """Hold an upload exclusively, across threads and (where fcntl exists) processes"""
+        part_path = self._paths(upload_id)[0]
+        if fcntl is None:
+            with self._lock:
+                lock = self._upload_locks.setdefault(upload_id, threading.Lock())
+            with lock:
+                yield
+            return
+        lock_path = f"{os.path.splitext(part_path)[0]}.lock"
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)  # Released when the file is closed
+            if not os.path.exists(part_path):
+                # Finished or aborted while we waited; don't leave a lock file behind
+                self._remove(lock_path)
+                raise KeyError(upload_id)
+            yield
+
+    def _meta(self, upload_id):
+        part_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise KeyError(upload_id)
+        if not os.path.exists(part_path):
+            raise KeyError(upload_id)
+        return meta
+
+    def _digest(self, upload_id, part_path, offset):
+        """
+        Running SHA-256 of the confirmed data (lock held)
+
+        The cached digest is only used if it covers exactly `offset` bytes; otherwise another
+        process has appended since (or this one has not seen the upload) and it is rebuilt from disk.
+
+        Returns:
+            hashlib object: A copy the caller may update
+        """
+        cached = self._digests.get(upload_id)
+        if cached and cached[0] == offset:
+            return cached[1].copy()
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        self._digests[upload_id] = (offset, digest.copy())
+        return digest
+
+    def create(self, filename, size, sha256=None):
+        """
+        Start an upload
+
+        Args:
+            filename (str): Sanitized original filename
+            size (int): Total size in bytes
+            sha256 (str, optional): Expected SHA-256 hex digest of the whole file, checked when it completes
+
+        Returns:
+            dict: Upload status (see status())
+        """
+        upload_id = uuid.uuid4().hex
+        part_path, meta_path = self._paths(upload_id)
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'filename': filename, 'size': int(size), 'sha256': sha256.lower() if sha256 else None,
+                       'created_at': time.time()}, f)
+        self._digests[upload_id] = (0, hashlib.sha256())
+        logger.info(f"Started resumable upload {upload_id} for {filename} ({int(size)} bytes)")
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        """
+        Returns:
+            dict: upload_id, filename, size, offset (bytes confirmed so far) and complete
+
+        Raises:
+            KeyError: If the upload is unknown, finished or expired
+        """
+        meta = self._meta(upload_id)
+        offset = os.path.getsize(self._paths(upload_id)[0])
+        return {'upload_id': upload_id, 'filename': meta['filename'], 'size': meta['size'],
+                'offset': offset, 'complete': offset == meta['size']}
+
+    def append(self, upload_id, offset, stream, chunk_sha256=None):
+        """
+        Append a chunk, streaming it to disk
+
+        Args:
+            upload_id (str): ID returned by create
+            offset (int): Where the chunk starts; must equal the confirmed offset
+            stream (file-like): Readable binary stream with the chunk
+            chunk_sha256 (str, optional): SHA-256 hex digest of the chunk
+
+        Returns:
+            dict: Upload status after the chunk
+
+        Raises:
+            KeyError: If the upload is unknown
+            UploadOffsetError: If offset is not the confirmed offset (resume from error.offset)
+            UploadVerificationError: If the chunk runs past the declared size or its SHA-256 differs
+        """
+        with self._upload_lock(upload_id):
+            meta = self._meta(upload_id)
+            part_path = self._paths(upload_id)[0]
+            confirmed = os.path.getsize(part_path)
+            if offset != confirmed:
+                raise UploadOffsetError(f"Chunk starts at {offset} but {confirmed} bytes are confirmed", confirmed)
+            running = self._digest(upload_id, part_path, confirmed)
+            chunk_digest = hashlib.sha256()
+            written = 0
+            try:
+                with open(part_path, 'ab') as f:
+                    for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+                        if confirmed + written + len(chunk) > meta['size']:
+                            raise UploadVerificationError('Chunk runs past the declared upload size')
+                        f.write(chunk)
+                        running.update(chunk)
+                        chunk_digest.update(chunk)
+                        written += len(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if chunk_sha256 and chunk_digest.hexdigest() != chunk_sha256.lower():
+                    raise UploadVerificationError('Chunk SHA-256 does not match')
+            except Exception:
+                # Drop the partial chunk so the confirmed offset only ever covers verified data
+                with open(part_path, 'r+b') as f:
+                    f.truncate(confirmed)
+                raise
+            self._digests[upload_id] = (confirmed + written, running)
+        return self.status(upload_id)
+
+    def complete(self, upload_id, upload_store):
+        """
+        Verify a fully received upload and move it into the upload store
+
+        Returns:
+            dict: The UploadStore entry for the document, plus 'path' and 'duplicate'
+
+        Raises:
+            KeyError: If the upload is unknown
+            UploadOffsetError: If bytes are still missing (resume from error.offset)
+            UploadVerificationError: If the file does not match the declared SHA-256 (the upload is discarded)
+        """
+        with self._upload_lock(upload_id):
+            meta = self._meta(upload_id)
+            part_path = self._paths(upload_id)[0]
+            offset = os.path.getsize(part_path)
+            if offset != meta['size']:
+                raise UploadOffsetError(f"Upload is incomplete: {offset} of {meta['size']} bytes received", offset)
+            file_hash = self._digest(upload_id, part_path, offset).hexdigest()
+            if meta['sha256'] and file_hash != meta['sha256']:
+                self._discard(upload_id)
+                raise UploadVerificationError('Uploaded file does not match the declared SHA-256')
+            stored = upload_store.add_file(part_path, file_hash, offset, meta['filename'])
+            self._discard(upload_id)
+        return stored
+
+    def abort(self, upload_id):
+        """Discard an upload in progress"""
+        with self._upload_lock(upload_id):
+            self._meta(upload_id)
+            self._discard(upload_id)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _discard(self, upload_id):
+        """Remove an upload's files (lock held)"""
+        part_path, meta_path = self._paths(upload_id)
+        for path in (part_path, meta_path, f"{os.path.splitext(part_path)[0]}.lock"):
+            self._remove(path)
+        self._digests.pop(upload_id, None)
+        with self._lock:
+            self._upload_locks.pop(upload_id, None)
+
+    def sweep(self):
+        """Remove uploads that have not received a chunk for max_age_seconds"""
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        for name in os.listdir(self.root):
+            if not name.endswith('.part'):
+                continue
+            upload_id = name[:-len('.part')]
+            try:
+                if os.path.getmtime(os.path.join(self.root, name)) < cutoff:
+                    with self._upload_lock(upload_id):
+                        self._discard(upload_id)
+                    removed += 1
+            except (OSError, KeyError):
+                continue
+        if removed:
+            logger.info(f"Removed {removed} abandoned resumable uploads")
+        return removed
@@ -0,0 +1,33 @@
+import os
+from cli import Manifest, find_documents
+
+def test_find_documents_expands_directories_and_globs(tmp_path):
+    for name in ('a.pdf', 'b.DOCX', 'notes.txt', os.path.join('sub', 'c.pdf')):
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b'x')
+    assert [os.path.basename(p) for p in find_documents([str(tmp_path)])] == ['a.pdf', 'b.DOCX']
+    assert len(find_documents([str(tmp_path)], recursive=True)) == 3
+    assert find_documents([str(tmp_path / '**' / '*.pdf'), str(tmp_path / 'a.pdf')]) == sorted(
+        [str(tmp_path / 'a.pdf'), str(tmp_path / 'sub' / 'c.pdf')]
+    )
+
+def test_manifest_resumes_only_completed_documents(tmp_path):
+    csv_path = tmp_path / 'a.csv'
+    csv_path.write_text('cell_id,value\n')
+    path = str(tmp_path / 'manifest.jsonl')
+    manifest = Manifest(path)
+    manifest.append({'source': '/a.pdf', 'sha256': 'h1', 'dictionary': 'GIFI', 'status': 'done', 'csv_path': str(csv_path)})
+    manifest.append({'source': '/b.pdf', 'sha256': 'h2', 'dictionary': 'GIFI', 'status': 'failed', 'csv_path': None})
+    with open(path, 'a') as f:
+        f.write('{"source": "/c.pdf", "sha2')  # Torn write from a crash
+
+    reloaded = Manifest(path)
+    assert reloaded.is_complete('/a.pdf', 'h1', 'GIFI')
+    assert not reloaded.is_complete('/a.pdf', 'changed', 'GIFI')  # Content changed
+    assert not reloaded.is_complete('/a.pdf', 'h1', 'T2S1')  # Different dictionary
+    assert not reloaded.is_complete('/b.pdf', 'h2', 'GIFI')  # Failed, so retried
+    reloaded.append({'source': '/c.pdf', 'sha256': 'h3', 'dictionary': 'GIFI', 'status': 'done', 'csv_path': str(csv_path)})
+    assert Manifest(path).is_complete('/c.pdf', 'h3', 'GIFI')  # Not lost on the torn line
+    csv_path.unlink()
+    assert not reloaded.is_complete('/a.pdf', 'h1', 'GIFI')  # Output was deleted